@@ -88,6 +88,7 @@ class ConsoleHandler(object):
         self.add_handler('contract', self.make_contract)
         self.add_handler('orders', self._ib_manager.orders)
         self.add_handler('portfolio', self._ib_manager.portfolio)
+        self.add_handler('market_lines', self._ib_manager.market_lines)
         self.add_handler('tstart', partial(self.contract_handler,
                                            self.start_trader))
         self.add_handler('tstop', self.stop_trader)
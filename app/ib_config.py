@@ -11,6 +11,7 @@ class IbConfig(object):
     ib_ip: str = '127.0.0.1'
     ib_port: int = 4002
     client_id: int = 3
+    max_mkt_lines: int = 100
     master_qq: int = 413707375
     default_contracts: List[Dict[str, Any]] = (
         {'secType': 'CMDTY',
@@ -5,19 +5,21 @@ from app.recorder.account_recorder import AccountRecorder
 from app.recorder.market_recorder import MarketRecorder
 from app.recorder.recorder import Recorder
 from app.utils.log import Log
-from ib_insync import Contract, IB, LimitOrder, Order, Trade
+from ib_insync import Contract, IB, LimitOrder, LineManager, Order, Trade
 
 
 class IbManager(object):
     log_file = 'ib_manager'
 
-    def __init__(self, ip: str, port: int, client_id: int):
+    def __init__(
+            self, ip: str, port: int, client_id: int, max_lines: int = 100):
         self._ib = IB()
         self._ib_ip: str = ip
         self._ib_port: int = port
         self._client_id: int = client_id
         self._subscribed_mkt_contracts: List[str] = []
         self._subscribed_mkt_depth_contracts: List[str] = []
+        self._lines: LineManager = LineManager(self._ib, max_lines)
         self._log: Log = Log.create(Log.path(self.log_file))
         self._logger = self._log.get_logger('ibmanager')
         self._recorder: Recorder = Recorder(self._log)
@@ -49,9 +51,7 @@ class IbManager(object):
         self._keep_connection_task = None
 
     def _recover_subscriptions(self) -> None:
-        for contract in self._subscribed_mkt_contracts:
-            self._logger.info(f'recover subscribe {str(contract)}')
-            self._ib.reqMktData(contract)
+        # market data lines are restored by the line manager
         for contract in self._subscribed_mkt_depth_contracts:
             self._logger.info(f'recover subscribe depth {str(contract)}')
             self._ib.reqMktDepth(contract)
@@ -84,16 +84,20 @@ class IbManager(object):
         if contract in self._subscribed_mkt_contracts:
             return 'already subscribe {}'.format(str(contract))
         self._subscribed_mkt_contracts.append(contract)
-        self._ib.reqMktData(contract)
+        self._lines.subscribe(contract)
+        asyncio.create_task(self._load_market_rule(contract))
         return 'subscribe {} success'.format(str(contract))
 
     def unsub_market(self, contract: Contract) -> str:
         if contract not in self._subscribed_mkt_contracts:
             return 'not ever subscribe {}'.format(str(contract))
-        self._subscribed_mkt_contracts.append(contract)
-        self._ib.cancelMktData(contract)
+        index = self._subscribed_mkt_contracts.index(contract)
+        self._lines.unsubscribe(self._subscribed_mkt_contracts.pop(index))
         return 'unsubscribe {} success'.format(str(contract))
 
+    def market_lines(self) -> str:
+        return str(self._lines.stats())
+
     def sub_market_depth(self, contract: Contract) -> str:
         if contract in self._subscribed_mkt_depth_contracts:
             return 'already subscribe depth {}'.format(str(contract))
@@ -120,11 +124,20 @@ class IbManager(object):
         side = side.upper()
         if side not in ('SELL', 'BUY'):
             return [f'invalid order type: {side}']
-        price = float(f'{round(float(price), 3):.3f}')
+        if self._ib.marketRule(contract):
+            price = self._ib.roundToTick(contract, float(price))
+        else:
+            price = float(f'{round(float(price), 3):.3f}')
         order = LimitOrder(side, size, price, tif='GTC')
         trade = self._ib.placeOrder(contract, order)
         return trade
 
+    async def _load_market_rule(self, contract: Contract) -> None:
+        try:
+            await self._ib.reqMarketRulesAsync(contract)
+        except Exception:
+            self._logger.warning(f'load market rule {str(contract)} failed')
+
     def cancel_order(self, order_id: int) -> str:
         order_id = int(order_id)
         order = Order(orderId=order_id)
@@ -54,7 +54,8 @@ class IbServer(BaseServer):
         self._transporter = Transporter()
         self._client_id = config.client_id
         self._ib_manager: IbManager = IbManager(
-            self._config.ib_ip, self._config.ib_port, self._client_id)
+            self._config.ib_ip, self._config.ib_port, self._client_id,
+            self._config.max_mkt_lines)
 
     async def initialize(self) -> None:
         self._redis = await RedisHandler.create(
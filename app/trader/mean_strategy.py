@@ -1,3 +1,7 @@
+import math
+from collections import deque
+from typing import Deque, List
+
 from app.trader.strategy_base import MarketData, StrategyBase, TradeManagerBase
 
 
@@ -5,6 +9,8 @@ kMinIntervals = 300 * 1000
 kMeanDuration = 60 * 1000
 kDeltaThreshold = 0.01
 kOrderTimeout = 10 * 60 * 1000
+# number of data updates after which the running sum is recomputed
+kRecomputeInterval = 1000
 
 
 class MeanStrategy(StrategyBase):
@@ -15,7 +21,11 @@ class MeanStrategy(StrategyBase):
         self._pending_side = ''
         self._order_id = 0
         self._last_success_side = ''
-        self._data_list = []
+        self._data_list: Deque[List[float]] = deque()
+        self._first_data_ts = 0
+        self._total_value = 0.0
+        self._total_duration = 0
+        self._num_updates = 0
         self._last_data_ts = 0
         self._last_order_ts = 0
 
@@ -29,26 +39,39 @@ class MeanStrategy(StrategyBase):
 
     def on_market_data(self, data: MarketData) -> None:
         if len(self._data_list) > 0:
-            gap = data.ts - self._data_list[-1][0]
-            self._data_list[-1].append(gap)
+            last = self._data_list[-1]
+            gap = data.ts - last[0]
+            last.append(gap)
+            self._total_value += last[3] * gap
+            self._total_duration += gap
+        else:
+            self._first_data_ts = data.ts
         self._data_list.append(
             [data.ts, data.bids_price[0], data.asks_price[0],
              (data.bids_price[0] + data.asks_price[0]) / 2])
+        # only the data within the mean duration is needed
+        while len(self._data_list) > 2 \
+                and self._data_list[1][0] + kMeanDuration < data.ts:
+            first = self._data_list.popleft()
+            self._total_value -= first[3] * first[4]
+            self._total_duration -= first[4]
+        self._num_updates += 1
+        if self._num_updates >= kRecomputeInterval:
+            # recompute the running sum to drop the accumulated
+            # floating point error
+            self._num_updates = 0
+            self._total_value = math.fsum(
+                d[3] * d[4] for d in self._data_list if len(d) > 4)
         if self._pending:
             return
-        if data.ts < self._data_list[0][0] + kMinIntervals:
+        if data.ts < self._first_data_ts + kMinIntervals:
             return
         if data.asks_amount[0] < self._amount \
            or data.bids_amount[0] < self._amount:
             return
-        total_duration = 0
-        total_value = 0
-        for item in self._data_list[-2::-1]:
-            total_value += item[3] * item[4]
-            total_duration += item[4]
-            if item[0] + kMeanDuration < data.ts:
-                break
-        m = total_value / total_duration
+        # time weighted mean of all but the latest data, kept as running
+        # sums over the trimmed window
+        m = self._total_value / self._total_duration
         price = self._data_list[-1][3]
         if self.can_sell() and price >= m + kDeltaThreshold:
             self._pending = True
@@ -81,7 +104,11 @@ class MeanStrategy(StrategyBase):
         self._pending = False
 
     def on_reset(self) -> None:
-        self._data_list = []
+        self._data_list = deque()
+        self._first_data_ts = 0
+        self._total_value = 0.0
+        self._total_duration = 0
+        self._num_updates = 0
         self._pending = False
         self._pending_side = ''
         self._order_id = 0
@@ -21,7 +21,8 @@ from .objects import (
     MktDepthData, DOMLevel, BracketOrder, TradeLogEntry, TagValue,
     FamilyCode, SmartComponent,
     PortfolioItem, Position, Fill, OptionComputation, OptionChain, Dividends,
-    NewsArticle, HistoricalNews, NewsTick, NewsBulletin, ConnectionStats)
+    NewsArticle, HistoricalNews, NewsTick, NewsBulletin, ConnectionStats,
+    LineStats, BarDataColumns, HistoricalTickColumns)
 from .contract import (
     Contract, Stock, Option, Future, ContFuture, Forex, Index, CFD,
     Commodity, Bond, FuturesOption, MutualFund, Warrant, Bag)
@@ -37,11 +38,26 @@ from .client import Client
 from .wrapper import Wrapper
 from .flexreport import FlexReport, FlexError
 from .ibcontroller import IBC, IBController, Watchdog
+from .linemanager import LineManager
+from .barcache import BarCache
+from .downloader import HistoricalDownloader
+from .timerwheel import TimerWheel
+from .indicators import (
+    Indicator, EMA, SMA, RollingVariance, TimeWeightedMean, VWAP, ATR)
+from .optionchain import OptionChainLoader, OptionChainTable
+from .optionmodel import OptionModel
+from .volsurface import VolSurface
+from .portfolioengine import PortfolioEngine, RiskSummary
+from .latency import (
+    LatencyTracer, LatencyHistogram, OrderTimings, LatencyStats)
+from .tradearchive import TradeArchive
 
 __all__ = ['util', 'Event']
 for _m in (
         objects, contract, order, ticker, ib,
-        client, wrapper, flexreport, ibcontroller):
+        client, wrapper, flexreport, ibcontroller, linemanager,
+        barcache, downloader, timerwheel, indicators, optionchain,
+        optionmodel, volsurface, portfolioengine, latency, tradearchive):
     __all__ += _m.__all__
 
 del sys
@@ -0,0 +1,144 @@
+import datetime
+import logging
+import os
+from collections import OrderedDict
+from typing import List
+
+from ib_insync.objects import BarData
+
+__all__ = ['BarCache']
+
+
+class BarCache:
+    """
+    On-disk cache of historical bars with a size budget.
+
+    The bars are stored per
+    (conId, whatToShow, barSizeSetting, useRTH, window) key,
+    one file per window in the columnar ``.npz`` format of NumPy.
+    When the total size of the files exceeds the budget then
+    the least recently used windows are evicted.
+
+    Set as ``IB.barCache`` to cache the requests of
+    :meth:`.IB.reqHistoricalData` that are made with ``useCache=True``,
+    or give to a :class:`.HistoricalDownloader`.
+
+    Requires NumPy.
+
+    Args:
+        path: Directory of the cache files.
+        maxSize: Size budget in bytes, or 0 for no limit.
+    """
+
+    def __init__(self, path: str, maxSize: int = 1_000_000_000):
+        self.path = path
+        self.maxSize = maxSize
+        self._files = OrderedDict()  # fileName -> size, least recent first
+        self._size = 0
+        self._logger = logging.getLogger('ib_insync.barcache')
+        os.makedirs(path, exist_ok=True)
+        entries = []
+        for entry in os.scandir(path):
+            if entry.name.endswith('.tmp.npz'):
+                # leftover of an interrupted write
+                os.remove(entry.path)
+            elif entry.name.endswith('.npz'):
+                entries.append(entry)
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries:
+            self._files[entry.path] = entry.stat().st_size
+            self._size += entry.stat().st_size
+
+    def __len__(self):
+        return len(self._files)
+
+    def size(self) -> int:
+        """
+        Total size in bytes of the cached windows.
+        """
+        return self._size
+
+    def get(self, key: tuple) -> List[BarData]:
+        """
+        Get the bars of the window with the given key,
+        or None if the window is not cached.
+        """
+        import numpy as np
+        fileName = self._fileName(key)
+        if fileName not in self._files:
+            return None
+        try:
+            with np.load(fileName) as data:
+                dates = data['date'].tolist()
+                if data['isDate']:
+                    dates = [datetime.date.fromordinal(d) for d in dates]
+                else:
+                    dates = [
+                        datetime.datetime.fromtimestamp(
+                            d, datetime.timezone.utc) for d in dates]
+                bars = [
+                    BarData(*values) for values in zip(
+                        dates, *(data[name].tolist() for name in (
+                            'open', 'high', 'low', 'close', 'volume',
+                            'average', 'barCount')))]
+        except (OSError, ValueError, KeyError):
+            self._logger.exception(f'Could not load {fileName}')
+            self._remove(fileName)
+            return None
+        self._files.move_to_end(fileName)
+        os.utime(fileName)
+        return bars
+
+    def put(self, key: tuple, bars: List[BarData]):
+        """
+        Store the bars of the window with the given key and evict
+        the least recently used windows when over budget.
+
+        The bar dates must be either all datetime.date or all
+        timezone-aware datetime.datetime.
+        """
+        import numpy as np
+        isDate = bool(bars) and not isinstance(
+            bars[0].date, datetime.datetime)
+        if isDate:
+            dates = [bar.date.toordinal() for bar in bars]
+        else:
+            dates = [int(bar.date.timestamp()) for bar in bars]
+        fileName = self._fileName(key)
+        tmpName = fileName + '.tmp.npz'
+        np.savez(
+            tmpName,
+            isDate=np.bool_(isDate),
+            date=np.array(dates, 'i8'),
+            open=np.array([bar.open for bar in bars], 'f8'),
+            high=np.array([bar.high for bar in bars], 'f8'),
+            low=np.array([bar.low for bar in bars], 'f8'),
+            close=np.array([bar.close for bar in bars], 'f8'),
+            volume=np.array([bar.volume for bar in bars], 'f8'),
+            average=np.array([bar.average for bar in bars], 'f8'),
+            barCount=np.array([bar.barCount for bar in bars], 'i8'))
+        os.replace(tmpName, fileName)
+        self._size -= self._files.pop(fileName, 0)
+        self._files[fileName] = os.path.getsize(fileName)
+        self._size += self._files[fileName]
+        while self.maxSize and self._size > self.maxSize and \
+                len(self._files) > 1:
+            self._remove(next(iter(self._files)))
+
+    def clear(self):
+        """
+        Remove all cached windows.
+        """
+        for fileName in list(self._files):
+            self._remove(fileName)
+
+    def _fileName(self, key):
+        name = '-'.join(str(k).replace(' ', '') for k in key)
+        return os.path.join(self.path, name + '.npz')
+
+    def _remove(self, fileName):
+        self._size -= self._files.pop(fileName, 0)
+        try:
+            os.remove(fileName)
+        except FileNotFoundError:
+            pass
@@ -3,7 +3,9 @@ import asyncio
 import logging
 import time
 import io
+import operator
 from collections import deque
+from contextlib import contextmanager
 from typing import List
 
 from eventkit import Event
@@ -12,6 +14,7 @@ from .contract import Contract
 from .connection import Connection
 from .decoder import Decoder
 from .objects import ConnectionStats
+from .order import Order
 from .util import run, UNSET_INTEGER, UNSET_DOUBLE
 
 __all__ = ['Client']
@@ -47,6 +50,17 @@ class Client:
 
     * Automatic request throttling.
 
+    * Prepared order messages: ``placeOrder`` keeps a pre-encoded
+      message per contract, order type and server version, so that
+      a new order or modification that only differs in the order ID,
+      action, quantity or prices is sent without serializing the
+      whole order again.
+
+    * Batching of messages: The messages sent within ``client.batch()``
+      are written to the socket together, and the messages sent within
+      ``client.group()`` form an atomic group that is never split up by
+      the throttling.
+
     * Optional ``wrapper.tcpDataArrived()`` method;
       If the wrapper has this method it is invoked directly after
       a network packet has arrived.
@@ -74,9 +88,12 @@ class Client:
       * ``apiStart`` ()
       * ``apiEnd`` ()
       * ``apiError`` (errorMsg: str)
+      * ``apiWrite`` (numMsgWritten: int):
+        Emitted after messages are written to the socket, with the
+        number of messages written since the start of the connection.
     """
 
-    events = ('apiStart', 'apiEnd', 'apiError')
+    events = ('apiStart', 'apiEnd', 'apiError', 'apiWrite')
 
     MaxRequests = 45
     RequestsInterval = 1
@@ -92,6 +109,7 @@ class Client:
         self.apiStart = Event('apiStart')
         self.apiEnd = Event('apiEnd')
         self.apiError = Event('apiError')
+        self.apiWrite = Event('apiWrite')
         self._readyEvent = asyncio.Event()
         self._loop = asyncio.get_event_loop()
         self._logger = logging.getLogger('ib_insync.client')
@@ -121,6 +139,12 @@ class Client:
         self._isThrottling = False
         self._msgQ = deque()
         self._timeQ = deque()
+        self._batch = None
+        self._group = None
+        self._orderTemplates = {}
+        # number of messages given to sendMsg and written to the socket
+        self._numMsgQueued = 0
+        self._numMsgWritten = 0
 
     def serverVersion(self):
         return self._serverVersion
@@ -247,31 +271,72 @@ class Client:
 
         msg = io.StringIO()
         for field in fields:
-            typ = type(field)
-            if field in (None, UNSET_INTEGER, UNSET_DOUBLE):
-                s = ''
-            elif typ in (str, int, float):
-                s = str(field)
-            elif typ is bool:
-                s = '1' if field else '0'
-            elif typ is list:
-                # list of TagValue
-                s = ''.join(f'{v.tag}={v.value};' for v in field)
-            elif isinstance(field, Contract):
-                c = field
-                s = '\0'.join(str(f) for f in (
-                    c.conId, c.symbol, c.secType,
-                    c.lastTradeDateOrContractMonth, c.strike,
-                    c.right, c.multiplier, c.exchange,
-                    c.primaryExchange, c.currency,
-                    c.localSymbol, c.tradingClass))
-            else:
-                s = str(field)
-            msg.write(s)
+            msg.write(_encode(field))
             msg.write('\0')
         self.sendMsg(msg.getvalue())
 
+    @contextmanager
+    def batch(self):
+        """
+        Context manager that collects the messages sent within it and
+        writes them to the socket together when it exits, as far as the
+        throttling allows. If the context exits with an exception then
+        none of the messages are sent.
+
+        Usage::
+
+            with client.batch():
+                client.placeOrder(...)
+                client.placeOrder(...)
+        """
+        if self._batch is not None:
+            yield
+            return
+        self._batch = []
+        try:
+            yield
+        except BaseException:
+            self._numMsgQueued -= sum(
+                len(msg) if type(msg) is tuple else 1
+                for msg in self._batch)
+            self._batch = None
+            raise
+        msgs, self._batch = self._batch, None
+        self._msgQ.extend(msgs)
+        self.sendMsg(None)
+
+    @contextmanager
+    def group(self):
+        """
+        Context manager that makes the messages sent within it an atomic
+        group: The group is sent whole, in one write, and is never split
+        up by the throttling. If the context exits with an exception then
+        none of the messages of the group are sent.
+        """
+        if self._group is not None:
+            yield
+            return
+        self._group = []
+        try:
+            yield
+        except BaseException:
+            self._numMsgQueued -= len(self._group)
+            self._group = None
+            raise
+        msgs, self._group = self._group, None
+        if msgs:
+            self.sendMsg(tuple(msgs))
+
     def sendMsg(self, msg):
+        if msg:
+            if type(msg) is not tuple:
+                self._numMsgQueued += 1
+            if self._group is not None and type(msg) is not tuple:
+                self._group.append(msg)
+                return
+            elif self._batch is not None:
+                self._batch.append(msg)
+                return
         t = self._loop.time()
         times = self._timeQ
         msgs = self._msgQ
@@ -279,12 +344,29 @@ class Client:
             times.popleft()
         if msg:
             msgs.append(msg)
-        while msgs and (len(times) < self.MaxRequests or not self.MaxRequests):
-            msg = msgs.popleft()
-            self.conn.sendMsg(self._prefix(msg.encode()))
-            times.append(t)
-            if self._logger.isEnabledFor(logging.DEBUG):
-                self._logger.debug('>>> %s', msg[:-1].replace('\0', ','))
+        ready = []
+        while msgs:
+            # a group (tuple) of messages is sent whole or not at all
+            group = msgs[0] if type(msgs[0]) is tuple else (msgs[0],)
+            if self.MaxRequests and times and \
+                    len(times) + len(group) > self.MaxRequests:
+                break
+            msgs.popleft()
+            for msg in group:
+                # prepared messages are already encoded
+                data = msg if type(msg) is bytes else msg.encode()
+                ready.append(self._prefix(data))
+                times.append(t)
+                if self._logger.isEnabledFor(logging.DEBUG):
+                    self._logger.debug(
+                        '>>> %s', data[:-1].decode().replace('\0', ','))
+        if ready:
+            if len(ready) == 1:
+                self.conn.sendMsg(ready[0])
+            else:
+                self.conn.sendMsgs(ready)
+            self._numMsgWritten += len(ready)
+            self.apiWrite.emit(self._numMsgWritten)
         if msgs:
             if not self._isThrottling:
                 self._isThrottling = True
@@ -413,6 +495,15 @@ class Client:
 
     def placeOrder(self, orderId, contract, order):
         version = self.serverVersion()
+        key = (contract.conId, order.orderType, version)
+        state = _OrderTemplate.state(contract, order)
+        template = self._orderTemplates.get(key)
+        if template and state is not None and state == template.orderState:
+            if not self.isConnected():
+                raise ConnectionError('Not connected')
+            self.sendMsg(template.render(orderId, order))
+            return
+
         fields = [3]
         if version < 145:
             fields += [45]
@@ -607,7 +698,16 @@ class Client:
         if version >= 151:
             fields += [order.usePriceMgmtAlgo]
 
-        self.send(*fields)
+        if state is None:
+            self.send(*fields)
+        else:
+            template = _OrderTemplate(
+                state, [_encode(field) for field in fields],
+                1 if version >= 145 else 2)
+            self._orderTemplates[key] = template
+            if not self.isConnected():
+                raise ConnectionError('Not connected')
+            self.sendMsg(template.render(orderId, order))
 
     def cancelOrder(self, orderId):
         self.send(4, 1, orderId)
@@ -957,3 +1057,105 @@ class Client:
 
     def reqCompletedOrders(self, apiOnly):
         self.send(99, apiOnly)
+
+
+def _encode(field) -> str:
+    # serialize a single field of a message
+    typ = type(field)
+    if typ is str:
+        return field
+    elif field in (None, UNSET_INTEGER, UNSET_DOUBLE):
+        return ''
+    elif typ in (int, float):
+        return str(field)
+    elif typ is bool:
+        return '1' if field else '0'
+    elif typ is list:
+        # list of TagValue
+        return ''.join(f'{v.tag}={v.value};' for v in field)
+    elif isinstance(field, Contract):
+        c = field
+        return '\0'.join(str(f) for f in (
+            c.conId, c.symbol, c.secType,
+            c.lastTradeDateOrContractMonth, c.strike,
+            c.right, c.multiplier, c.exchange,
+            c.primaryExchange, c.currency,
+            c.localSymbol, c.tradingClass))
+    else:
+        return str(field)
+
+
+# order fields that are filled in on every render of a template
+_openFields = ('orderId', 'action', 'totalQuantity', 'lmtPrice', 'auxPrice')
+
+# order fields that are not part of the message
+_unsentFields = (
+    'clientId', 'permId', 'parentPermId', 'filledQuantity',
+    'autoCancelDate', 'autoCancelParent', 'basisPoints', 'basisPointsType',
+    'imbalanceOnly', 'refFuturesConId', 'routeMarketableToBbo',
+    'shareholder')
+
+
+class _OrderTemplate:
+    """
+    Pre-encoded placeOrder message with the fields that change from
+    order to order (order ID, action, quantity, limit and aux price)
+    left open, valid for as long as all other fields of the contract
+    and order keep the values of ``orderState``.
+    """
+    __slots__ = ('orderState', 'segments')
+
+    _contractValues = operator.attrgetter(
+        'conId', 'symbol', 'secType', 'lastTradeDateOrContractMonth',
+        'strike', 'right', 'multiplier', 'exchange', 'primaryExchange',
+        'currency', 'localSymbol', 'tradingClass', 'secIdType', 'secId')
+
+    # all scalar order fields, the list and object fields are
+    # compared separately
+    _orderValues = operator.attrgetter(*(
+        k for k, v in Order.defaults.items()
+        if v is not None and k not in _openFields + _unsentFields))
+
+    def __init__(self, orderState, parts, offset):
+        # offset is the index of the order ID; the open fields follow
+        # after the contract, secIdType and secId, with the order type
+        # between the quantity and limit price
+        self.orderState = orderState
+        openIndices = [offset + i for i in (0, 4, 5, 7, 8)]
+        self.segments = []
+        start = 0
+        for i in openIndices + [len(parts)]:
+            segment = ''.join(part + '\0' for part in parts[start:i])
+            if start:
+                segment = '\0' + segment
+            self.segments.append(segment)
+            start = i + 1
+
+    @classmethod
+    def state(cls, contract, order):
+        """
+        The values that the message depends on besides the open fields,
+        or None if the contract or order has nested objects that can
+        change unnoticed (combo legs, delta neutral contract, conditions).
+        """
+        if contract.secType == 'BAG' or contract.deltaNeutralContract \
+                or order.conditions:
+            return None
+        tier = order.softDollarTier
+        return (
+            cls._contractValues(contract), cls._orderValues(order),
+            tuple(order.algoParams or ()), tuple(order.orderMiscOptions or ()),
+            tier.name, tier.val)
+
+    def render(self, orderId, order) -> bytes:
+        """
+        The message with the open fields of the order filled in.
+        """
+        s = self.segments
+        return ''.join((
+            s[0], _encode(orderId),
+            s[1], _encode(order.action),
+            s[2], _encode(order.totalQuantity),
+            s[3], _encode(order.lmtPrice),
+            s[4], _encode(order.auxPrice),
+            s[5])).encode()
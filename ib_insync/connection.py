@@ -35,6 +35,20 @@ class Connection(asyncio.Protocol):
         self.numBytesSent += len(msg)
         self.numMsgSent += 1
 
+    def sendMsgs(self, msgs):
+        # coalesce the messages into one write
+        self.transport.writelines(msgs)
+        self.numBytesSent += sum(len(msg) for msg in msgs)
+        self.numMsgSent += len(msgs)
+
+    def pauseReading(self):
+        if self.transport:
+            self.transport.pause_reading()
+
+    def resumeReading(self):
+        if self.transport:
+            self.transport.resume_reading()
+
     def connection_lost(self, exc):
         if exc:
             self.hasError(str(exc))
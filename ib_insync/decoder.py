@@ -406,21 +406,30 @@ class Decoder:
 
     def historicalData(self, fields):
         _, reqId, startDateStr, endDateStr, numBars, *fields = fields
-        get = iter(fields).__next__
-
-        for _ in range(int(numBars)):
-            bar = BarData(
-                date=get(),
-                open=float(get()),
-                high=float(get()),
-                low=float(get()),
-                close=float(get()),
-                volume=int(get()),
-                average=float(get()),
-                barCount=int(get()))
-            self.wrapper.historicalData(int(reqId), bar)
+        reqId = int(reqId)
 
-        self.wrapper.historicalDataEnd(int(reqId), startDateStr, endDateStr)
+        if self.wrapper.isColumnar(reqId):
+            self.wrapper.historicalDataColumns(
+                reqId, fields[:8 * int(numBars)])
+        elif self.wrapper.isStreaming(reqId):
+            # bars are parsed lazily as the stream is consumed
+            self.wrapper.historicalDataStream(
+                reqId, fields[:8 * int(numBars)])
+        else:
+            get = iter(fields).__next__
+            for _ in range(int(numBars)):
+                bar = BarData(
+                    date=get(),
+                    open=float(get()),
+                    high=float(get()),
+                    low=float(get()),
+                    close=float(get()),
+                    volume=int(get()),
+                    average=float(get()),
+                    barCount=int(get()))
+                self.wrapper.historicalData(reqId, bar)
+
+        self.wrapper.historicalDataEnd(reqId, startDateStr, endDateStr)
 
     def historicalDataUpdate(self, fields):
         _, reqId, *fields = fields
@@ -672,10 +681,15 @@ class Decoder:
 
     def historicalTicks(self, fields):
         _, reqId, n, *fields = fields
+        reqId, n = int(reqId), int(n)
+        if self.wrapper.isColumnar(reqId):
+            self.wrapper.historicalTicksColumns(
+                reqId, fields[:4 * n], bool(int(fields[4 * n])))
+            return
         get = iter(fields).__next__
 
         ticks = []
-        for _ in range(int(n)):
+        for _ in range(n):
             time = int(get())
             get()
             price = float(get())
@@ -684,14 +698,19 @@ class Decoder:
                 HistoricalTick(time, price, size))
 
         done = bool(int(get()))
-        self.wrapper.historicalTicks(int(reqId), ticks, done)
+        self.wrapper.historicalTicks(reqId, ticks, done)
 
     def historicalTicksBidAsk(self, fields):
         _, reqId, n, *fields = fields
+        reqId, n = int(reqId), int(n)
+        if self.wrapper.isColumnar(reqId):
+            self.wrapper.historicalTicksColumns(
+                reqId, fields[:6 * n], bool(int(fields[6 * n])))
+            return
         get = iter(fields).__next__
 
         ticks = []
-        for _ in range(int(n)):
+        for _ in range(n):
             time = int(get())
             mask = int(get())
             attrib = TickAttribBidAsk(
@@ -706,14 +725,19 @@ class Decoder:
                     time, attrib, priceBid, priceAsk, sizeBid, sizeAsk))
 
         done = bool(int(get()))
-        self.wrapper.historicalTicksBidAsk(int(reqId), ticks, done)
+        self.wrapper.historicalTicksBidAsk(reqId, ticks, done)
 
     def historicalTicksLast(self, fields):
         _, reqId, n, *fields = fields
+        reqId, n = int(reqId), int(n)
+        if self.wrapper.isColumnar(reqId):
+            self.wrapper.historicalTicksColumns(
+                reqId, fields[:6 * n], bool(int(fields[6 * n])))
+            return
         get = iter(fields).__next__
 
         ticks = []
-        for _ in range(int(n)):
+        for _ in range(n):
             time = int(get())
             mask = int(get())
             attrib = TickAttribLast(
@@ -728,7 +752,7 @@ class Decoder:
                     time, attrib, price, size, exchange, specialConditions))
 
         done = bool(int(get()))
-        self.wrapper.historicalTicksLast(int(reqId), ticks, done)
+        self.wrapper.historicalTicksLast(reqId, ticks, done)
 
     def tickByTick(self, fields):
         _, reqId, tickType, time, *fields = fields
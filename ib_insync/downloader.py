@@ -0,0 +1,299 @@
+import asyncio
+import datetime
+import logging
+import math
+import time
+from collections import defaultdict, deque
+
+import ib_insync.util as util
+from ib_insync.barcache import BarCache
+from ib_insync.contract import Contract
+from ib_insync.objects import BarDataList
+
+__all__ = ['HistoricalDownloader']
+
+# bar size -> (duration of one request, grid step between requests in secs)
+# https://interactivebrokers.github.io/tws-api/historical_limitations.html
+# the step is never longer than the duration, so that windows don't leave gaps
+_windows = {
+    '1 secs': ('1800 S', 1800),
+    '5 secs': ('3600 S', 3600),
+    '10 secs': ('14400 S', 14400),
+    '15 secs': ('14400 S', 14400),
+    '30 secs': ('28800 S', 28800),
+    '1 min': ('1 D', 86400),
+    '2 mins': ('2 D', 2 * 86400),
+    '3 mins': ('1 W', 7 * 86400),
+    '5 mins': ('1 W', 7 * 86400),
+    '10 mins': ('1 W', 7 * 86400),
+    '15 mins': ('1 W', 7 * 86400),
+    '20 mins': ('1 W', 7 * 86400),
+    '30 mins': ('1 M', 28 * 86400),
+    '1 hour': ('1 M', 28 * 86400),
+    '2 hours': ('1 M', 28 * 86400),
+    '3 hours': ('1 M', 28 * 86400),
+    '4 hours': ('1 M', 28 * 86400),
+    '8 hours': ('1 M', 28 * 86400),
+    '1 day': ('1 Y', 365 * 86400),
+    '1 week': ('1 Y', 365 * 86400),
+    '1 month': ('1 Y', 365 * 86400),
+}
+
+# bar sizes that are subject to the strict pacing rules
+_smallBarSizes = {'1 secs', '5 secs', '10 secs', '15 secs', '30 secs'}
+
+# duration unit -> seconds, with calendar months and years
+_durationUnits = {
+    'S': 1, 'D': 86400, 'W': 7 * 86400, 'M': 30 * 86400, 'Y': 365 * 86400}
+
+
+class HistoricalDownloader:
+    """
+    Download historical bars over a long date range.
+
+    The range is split into the largest windows that IB allows for the
+    bar size. The windows are requested concurrently while staying within
+    the pacing rules, and the results are stitched together into one
+    deduplicated series.
+
+    With a :class:`.BarCache` every finished window is checkpointed
+    to disk, so that an interrupted download resumes where it stopped.
+    The windows are aligned to a fixed time grid, which makes the
+    checkpoints reusable for later downloads of overlapping ranges,
+    and only the windows that are missing from the cache are requested.
+
+    The pacing state is kept per downloader, so one downloader
+    should be used for all concurrent downloads of an IB instance.
+
+    https://interactivebrokers.github.io/tws-api/historical_limitations.html
+
+    Args:
+        ib: The :class:`.IB` instance to download with.
+        maxConcurrent: Maximum number of requests in flight.
+        timeout: Time in seconds to wait for a window before retrying it.
+        retries: Number of times to retry a window after a
+            pacing violation or a timeout.
+        cache: Cache for the finished windows.
+
+    Attributes:
+        PacingRequests (int): Maximum number of small bar requests per
+            ``PacingInterval`` seconds. Historical tick requests
+            (:meth:`.IB.streamHistoricalTicksAsync`) count as well.
+        PacingInterval (float): Pacing interval in seconds.
+        ContractRequests (int): Maximum number of small bar or tick
+            requests for the same contract per ``ContractInterval``
+            seconds.
+        ContractInterval (float): Pacing interval in seconds for the
+            same contract.
+        RetryDelay (float): Delay in seconds before retrying a window.
+    """
+
+    PacingRequests = 60
+    PacingInterval = 600
+    ContractRequests = 5
+    ContractInterval = 2
+    RetryDelay = 15
+
+    def __init__(
+            self, ib, maxConcurrent: int = 10, timeout: float = 60,
+            retries: int = 3, cache: BarCache = None):
+        self.ib = ib
+        self.cache = cache
+        self.timeout = timeout
+        self.retries = retries
+        self._semaphore = asyncio.Semaphore(maxConcurrent)
+        self._times = deque()
+        self._contractTimes = defaultdict(deque)
+        self._errors = {}  # reqId -> errorString
+        self._logger = logging.getLogger('ib_insync.downloader')
+
+    def download(
+            self, contract: Contract, start: datetime.datetime,
+            end: datetime.datetime, barSizeSetting: str, whatToShow: str,
+            useRTH: bool, path: str = '') -> BarDataList:
+        """
+        Download the bars between ``start`` and ``end``.
+
+        This method is blocking.
+
+        Args:
+            contract: Qualified contract of interest.
+            start: Start of the range, as datetime.date or
+                datetime.datetime. Naive datetimes are in local time.
+            end: End of the range, or '' for now.
+            barSizeSetting: Time period of one bar,
+                see :meth:`.IB.reqHistoricalData`.
+            whatToShow: Source for constructing bars,
+                see :meth:`.IB.reqHistoricalData`.
+            useRTH: If True then only show data from within Regular
+                Trading Hours, if False then show all data.
+            path: Directory for the checkpoints, or '' to use the
+                cache of the downloader.
+
+        Returns:
+            The bars in chronological order. Intraday bars have
+            timezone-aware UTC datetimes.
+        """
+        return util.run(self.downloadAsync(
+            contract, start, end, barSizeSetting, whatToShow, useRTH, path))
+
+    async def downloadAsync(
+            self, contract, start, end, barSizeSetting, whatToShow,
+            useRTH, path=''):
+        duration, step = _windows[barSizeSetting]
+        startTs = _timestamp(start)
+        endTs = _timestamp(end) if end else time.time()
+        ends = [
+            k * step for k in range(
+                math.floor(startTs / step) + 1, math.ceil(endTs / step) + 1)]
+        cache = BarCache(path, 0) if path else self.cache
+
+        self.ib.errorEvent += self._onError
+        try:
+            chunks = await asyncio.gather(*(
+                self._getChunk(
+                    contract, endTs, duration, barSizeSetting,
+                    whatToShow, useRTH, cache)
+                for endTs in ends))
+        finally:
+            self.ib.errorEvent -= self._onError
+
+        bars = BarDataList(sorted(
+            {bar.date: bar for chunk in chunks for bar in chunk}.values(),
+            key=lambda bar: bar.date))
+        bars[:] = [bar for bar in bars if _inRange(bar.date, startTs, endTs)]
+        bars.reqId = 0
+        bars.contract = contract
+        bars.endDateTime = end
+        bars.durationStr = ''
+        bars.barSizeSetting = barSizeSetting
+        bars.whatToShow = whatToShow
+        bars.useRTH = useRTH
+        bars.formatDate = 2
+        bars.keepUpToDate = False
+        bars.chartOptions = None
+        self._logger.info(
+            f'Downloaded {len(bars)} bars in {len(ends)} windows '
+            f'for {contract}')
+        return bars
+
+    async def reqHistoricalDataAsync(
+            self, contract, endDateTime, durationStr, barSizeSetting,
+            whatToShow, useRTH, formatDate=1):
+        """
+        Emulate :meth:`.IB.reqHistoricalDataAsync` by downloading the
+        time span that ends at ``endDateTime``, which lets the request
+        make use of the cache. The duration is taken as calendar time.
+        """
+        end = endDateTime or datetime.datetime.now(datetime.timezone.utc)
+        num, unit = durationStr.split()
+        start = _timestamp(end) - int(num) * _durationUnits[unit]
+        bars = await self.downloadAsync(
+            contract, datetime.datetime.fromtimestamp(start), end,
+            barSizeSetting, whatToShow, useRTH)
+        if formatDate == 1:
+            for bar in bars:
+                if isinstance(bar.date, datetime.datetime):
+                    bar.date = bar.date.astimezone().replace(tzinfo=None)
+        bars.endDateTime = endDateTime
+        bars.durationStr = durationStr
+        bars.formatDate = formatDate
+        return bars
+
+    async def _getChunk(
+            self, contract, endTs, duration, barSizeSetting,
+            whatToShow, useRTH, cache):
+        key = (
+            contract.conId or contract.symbol, whatToShow,
+            barSizeSetting, int(useRTH), endTs)
+        bars = cache.get(key) if cache is not None else None
+        if bars is not None:
+            return bars
+
+        isComplete = endTs <= time.time()
+        end = datetime.datetime.fromtimestamp(
+            endTs, datetime.timezone.utc) if isComplete else ''
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(self.RetryDelay)
+            async with self._semaphore:
+                if barSizeSetting in _smallBarSizes:
+                    await self.paceAsync((
+                        contract.conId, contract.exchange, whatToShow))
+                future = self.ib.reqHistoricalDataAsync(
+                    contract, end, duration, barSizeSetting,
+                    whatToShow, useRTH, formatDate=2, useCache=False)
+                try:
+                    bars = await asyncio.wait_for(
+                        future, self.timeout or None)
+                except asyncio.TimeoutError:
+                    # cancel the request so that it stops counting
+                    # against the pacing limits
+                    reqId = next((
+                        key for key, f in self.ib.wrapper._futures.items()
+                        if f is future), None)
+                    if reqId is not None:
+                        self.ib.client.cancelHistoricalData(reqId)
+                        self.ib.wrapper._endReq(reqId)
+                        self._errors.pop(reqId, None)
+                    self._logger.warning(f'Timeout for window ending {end}')
+                    continue
+            error = self._errors.pop(bars.reqId, '').lower()
+            if not error or 'no data' in error:
+                break
+            elif 'pacing violation' not in error:
+                # not checkpointed so that a later run tries again
+                self._logger.error(f'Window ending {end} failed: {error}')
+                return bars
+        else:
+            raise RuntimeError(
+                f'Window ending {end} failed after {self.retries} retries')
+
+        if cache is not None and isComplete:
+            cache.put(key, bars)
+        return bars
+
+    async def paceAsync(self, key):
+        """
+        Wait until one more request for the given key (such as the
+        conId, exchange and whatToShow) fits in the pacing limits.
+        """
+        contractTimes = self._contractTimes[key]
+        while True:
+            now = time.time()
+            delay = max(
+                _delay(
+                    self._times, now,
+                    self.PacingRequests, self.PacingInterval),
+                _delay(
+                    contractTimes, now,
+                    self.ContractRequests, self.ContractInterval))
+            if delay <= 0:
+                self._times.append(now)
+                contractTimes.append(now)
+                return
+            await asyncio.sleep(delay)
+
+    def _onError(self, reqId, errorCode, errorString, contract):
+        self._errors[reqId] = errorString
+
+
+def _delay(times, now, maxRequests, interval):
+    # time to wait before a new request fits in the sliding window
+    while times and now - times[0] >= interval:
+        times.popleft()
+    return times[0] + interval - now if len(times) >= maxRequests else 0
+
+
+def _timestamp(dt):
+    if not isinstance(dt, datetime.datetime):
+        dt = datetime.datetime.combine(dt, datetime.time())
+    return dt.timestamp()
+
+
+def _inRange(date, startTs, endTs):
+    if isinstance(date, datetime.datetime):
+        return startTs <= date.timestamp() <= endTs
+    return (
+        datetime.date.fromtimestamp(startTs) <= date
+        <= datetime.date.fromtimestamp(endTs))
@@ -2,19 +2,22 @@ import asyncio
 import logging
 import datetime
 import time
+from collections import deque
 from contextlib import suppress
-from typing import List, Iterator, Awaitable, Union
+from typing import List, Iterator, Awaitable, Tuple, Union
 
 from eventkit import Event
 
 import ib_insync.util as util
 from ib_insync.client import Client
-from ib_insync.wrapper import Wrapper
+from ib_insync.wrapper import Wrapper, RequestStream
 from ib_insync.contract import Contract
+from ib_insync.downloader import HistoricalDownloader
 from ib_insync.ticker import Ticker
 from ib_insync.order import Order, OrderStatus, Trade, LimitOrder, StopOrder
 from ib_insync.objects import (
-    BarList, BarDataList, RealTimeBarList,
+    BarList, BarDataList, BarDataColumns, RealTimeBarList,
+    HistoricalTickColumns,
     AccountValue, PortfolioItem, Position, Fill, Execution, BracketOrder,
     TradeLogEntry, OrderState, ExecutionFilter, TagValue, PnL, PnLSingle,
     ContractDetails, ContractDescription, OptionChain, OptionComputation,
@@ -86,6 +89,26 @@ class IB:
           blocking request to finish before raising ``asyncio.TimeoutError``.
           The default value of 0 will wait indefinitely.
           Note: This timeout is not used for the ``*Async`` methods.
+        IncrementalSync (bool): If True then the trades and fills are kept
+          over a reconnect, and on connect only the executions since the
+          latest known execution (in memory or in the :attr:`tradeArchive`)
+          are requested, instead of those of the whole day. The completed
+          orders are then only requested if an order that was open before
+          the reconnect is no longer open. When completed orders are not
+          available (read-only or older TWS) such an order is taken as
+          filled or cancelled by its fills.
+          Without a :attr:`tradeArchive` the latest known execution is
+          only kept in memory, so the first connect after a restart of
+          the program requests the executions of the whole day.
+          Default is False.
+        SyncMargin (float): Time in seconds that the incremental
+          execution request reaches back from the latest known execution.
+        barCache (:class:`.BarCache`): Optional on-disk cache for
+          historical bars, see :meth:`.reqHistoricalData`.
+        latencyTracer (:class:`.LatencyTracer`): Optional tracer of the
+          order latencies, set by :meth:`.LatencyTracer.start`.
+        tradeArchive (:class:`.TradeArchive`): Optional archive of the
+          done trades and fills, set by :meth:`.TradeArchive.start`.
 
 
     Events:
@@ -184,12 +207,18 @@ class IB:
         'errorEvent', 'timeoutEvent')
 
     RequestTimeout = 0
+    IncrementalSync = False
+    SyncMargin = 60
 
     def __init__(self):
         self._createEvents()
         self.wrapper = Wrapper(self)
         self.client = Client(self.wrapper)
         self.client.apiEnd += self.disconnectedEvent
+        self.barCache = None
+        self.latencyTracer = None
+        self.tradeArchive = None
+        self._downloader = None
         self._logger = logging.getLogger('ib_insync.ib')
 
     def _createEvents(self):
@@ -259,7 +288,8 @@ class IB:
     def disconnect(self):
         """
         Disconnect from a TWS or IB gateway application.
-        This will clear all session state.
+        This will clear all session state, except for the trades and
+        fills with :attr:`IncrementalSync`.
         """
         if not self.client.isConnected():
             return
@@ -286,6 +316,11 @@ class IB:
     timeRangeAsync = staticmethod(util.timeRangeAsync)
     waitUntil = staticmethod(util.waitUntil)
 
+    def _getDownloader(self):
+        if not self._downloader:
+            self._downloader = HistoricalDownloader(self)
+        return self._downloader
+
     def _run(self, *awaitables: List[Awaitable]):
         return util.run(*awaitables, timeout=self.RequestTimeout)
 
@@ -443,44 +478,97 @@ class IB:
                 and (not modelCode or v.modelCode == modelCode)
                 and (not conId or v.conId == conId)]
 
-    def trades(self) -> List[Trade]:
+    def trades(
+            self, contract: Contract = None, orderRef: str = None,
+            status: str = None) -> List[Trade]:
         """
-        List of all order trades from this session.
+        List of all order trades from this session, optionally only those
+        of the given contract (by conId), orderRef and order status.
+
+        The filters are served from indexes that are kept up to date
+        incrementally, so that the cost is in proportion to the result.
+        With a :attr:`tradeArchive` the archived trades come first.
+
+        Args:
+            contract: Only trades of this contract.
+            orderRef: Only trades with this order reference.
+            status: Only trades with this order status.
         """
-        return list(self.wrapper.trades.values())
+        archived = self.tradeArchive.trades(contract, orderRef, status) \
+            if self.tradeArchive else []
+        if contract is None and orderRef is None and status is None:
+            return archived + list(self.wrapper.trades.values())
+        return archived + self._selectTrades(None, contract, orderRef, status)
 
-    def openTrades(self) -> List[Trade]:
+    def openTrades(
+            self, contract: Contract = None,
+            orderRef: str = None) -> List[Trade]:
         """
-        List of all open order trades.
+        List of all open order trades, optionally only those of the
+        given contract (by conId) and orderRef.
+
+        Args:
+            contract: Only trades of this contract.
+            orderRef: Only trades with this order reference.
         """
-        return [v for v in self.wrapper.trades.values()
-                if v.orderStatus.status not in OrderStatus.DoneStates]
+        return self._selectTrades(
+            self.wrapper.openTrades, contract, orderRef, None)
 
     def orders(self) -> List[Order]:
         """
         List of all orders from this session.
         """
-        return list(
-            trade.order for trade in self.wrapper.trades.values())
+        return [trade.order for trade in self.trades()]
 
     def openOrders(self) -> List[Order]:
         """
         List of all open orders.
         """
-        return [trade.order for trade in self.wrapper.trades.values()
-                if trade.orderStatus.status not in OrderStatus.DoneStates]
+        return [trade.order for trade in self.wrapper.openTrades.values()]
 
-    def fills(self) -> List[Fill]:
-        """
-        List of all fills from this session.
+    def fills(self, contract: Contract = None) -> List[Fill]:
         """
-        return list(self.wrapper.fills.values())
+        List of all fills from this session, optionally only those of
+        the given contract (by conId).
+        With a :attr:`tradeArchive` the archived fills come first.
 
-    def executions(self) -> List[Execution]:
+        Args:
+            contract: Only fills of this contract.
         """
-        List of all executions from this session.
+        archived = self.tradeArchive.fills(contract) \
+            if self.tradeArchive else []
+        if contract is None:
+            return archived + list(self.wrapper.fills.values())
+        return archived + list(
+            self.wrapper.conId2Fills.get(contract.conId, {}).values())
+
+    def executions(self, contract: Contract = None) -> List[Execution]:
         """
-        return list(fill.execution for fill in self.wrapper.fills.values())
+        List of all executions from this session, optionally only those
+        of the given contract (by conId).
+
+        Args:
+            contract: Only executions of this contract.
+        """
+        return [fill.execution for fill in self.fills(contract)]
+
+    def _selectTrades(self, index, contract, orderRef, status):
+        # intersect the given indexes, starting from the smallest one
+        w = self.wrapper
+        indexes = [] if index is None else [index]
+        if contract is not None:
+            indexes.append(w.conId2Trades.get(contract.conId, {}))
+        if orderRef is not None:
+            indexes.append(w.orderRef2Trades.get(orderRef, {}))
+        if status is not None:
+            indexes.append(w.status2Trades.get(status, {}))
+        indexes.sort(key=len)
+        first, others = indexes[0], indexes[1:]
+        if not others:
+            return list(first.values())
+        return [
+            trade for tradeId, trade in first.items()
+            if all(tradeId in other for other in others)]
 
     def ticker(self, contract: Contract) -> Ticker:
         """
@@ -569,6 +657,12 @@ class IB:
             for o in bracket:
                 ib.placeOrder(contract, o)
 
+        or atomically with :meth:`.placeOrders`:
+
+        .. code-block:: python
+
+            ib.placeOrders([(contract, o) for o in bracket])
+
         https://interactivebrokers.github.io/tws-api/bracket_order.html
 
         Args:
@@ -638,8 +732,57 @@ class IB:
             contract: Contract to use for order.
             order: The order to be placed.
         """
+        callTime = time.perf_counter()
         orderId = order.orderId or self.client.getReqId()
         self.client.placeOrder(orderId, contract, order)
+        trade = self._trackOrder(contract, order, orderId, True)
+        if self.latencyTracer:
+            self.latencyTracer.track(trade, callTime)
+        return trade
+
+    def placeOrders(
+            self, orders: List[Tuple[Contract, Order]]) -> List[Trade]:
+        """
+        Place or modify a batch of orders, such as a basket or brackets,
+        and return their Trades in the same order.
+
+        The orders are serialized up front and written to the socket
+        together, as far as the request throttling allows. Orders that
+        belong together, by ``parentId`` (as from :meth:`.bracketOrder`)
+        or by ``ocaGroup`` (as from :meth:`.oneCancelsAll`), form an
+        atomic group: The group is serialized completely before any of
+        it is sent, is written in one go and is never split up by the
+        throttling.
+
+        Args:
+            orders: List of (contract, order) tuples.
+        """
+        callTime = time.perf_counter()
+        for _, order in orders:
+            if not order.orderId:
+                order.orderId = self.client.getReqId()
+        groups = _orderGroups(orders)
+        msgNums = {}  # orderId -> number of the message in the client
+        with self.client.batch():
+            for group in groups:
+                with self.client.group():
+                    for contract, order in group:
+                        self.client.placeOrder(
+                            order.orderId, contract, order)
+                        msgNums[order.orderId] = self.client._numMsgQueued
+        trades = [
+            self._trackOrder(contract, order, order.orderId, False)
+            for contract, order in orders]
+        if self.latencyTracer:
+            for trade in trades:
+                self.latencyTracer.track(
+                    trade, callTime, msgNum=msgNums[trade.order.orderId])
+        self._logger.info(
+            f'placeOrders: {len(orders)} orders in {len(groups)} groups')
+        return trades
+
+    def _trackOrder(self, contract, order, orderId, log):
+        # create or update the trade of a placed order
         now = datetime.datetime.now(datetime.timezone.utc)
         key = self.wrapper.orderKey(
             self.wrapper.clientId, orderId, order.permId)
@@ -649,7 +792,9 @@ class IB:
             assert trade.orderStatus.status not in OrderStatus.DoneStates
             logEntry = TradeLogEntry(now, trade.orderStatus.status, 'Modify')
             trade.log.append(logEntry)
-            self._logger.info(f'placeOrder: Modify order {trade}')
+            self.wrapper.indexTrade(trade)
+            if log:
+                self._logger.info(f'placeOrder: Modify order {trade}')
             trade.modifyEvent.emit(trade)
             self.orderModifyEvent.emit(trade)
         else:
@@ -661,7 +806,9 @@ class IB:
             trade = Trade(
                 contract, order, orderStatus, [], [logEntry])
             self.wrapper.trades[key] = trade
-            self._logger.info(f'placeOrder: New order {trade}')
+            self.wrapper.indexTrade(trade)
+            if log:
+                self._logger.info(f'placeOrder: New order {trade}')
             self.newOrderEvent.emit(trade)
         return trade
 
@@ -672,6 +819,7 @@ class IB:
         Args:
             order: The order to be canceled.
         """
+        callTime = time.perf_counter()
         self.client.cancelOrder(order.orderId)
         now = datetime.datetime.now(datetime.timezone.utc)
         key = self.wrapper.orderKey(
@@ -688,6 +836,9 @@ class IB:
                 logEntry = TradeLogEntry(now, newStatus, '')
                 trade.log.append(logEntry)
                 trade.orderStatus.status = newStatus
+                self.wrapper.indexTrade(trade)
+                if self.latencyTracer:
+                    self.latencyTracer.track(trade, callTime, 'cancel')
                 self._logger.info(f'cancelOrder: {trade}')
                 trade.cancelEvent.emit(trade)
                 trade.statusEvent.emit(trade)
@@ -961,6 +1112,66 @@ class IB:
         """
         return self._run(self.reqMarketRuleAsync(marketRuleId))
 
+    def reqMarketRules(
+            self, *contracts: List[Contract]) -> List[List[PriceIncrement]]:
+        """
+        Load the market rules of the given contracts into the
+        market rule cache and return the price increments rule
+        for each contract.
+
+        Only contracts and market rules that are not already cached
+        will cause a request. Contracts without a conId are qualified
+        in-place.
+
+        This method is blocking.
+
+        Args:
+            contracts: Contracts to load the market rules for.
+        """
+        return self._run(self.reqMarketRulesAsync(*contracts))
+
+    def marketRule(self, contract: Contract) -> List[PriceIncrement]:
+        """
+        Get the cached price increments rule that applies to the
+        exchange of the contract, or None if it has not been loaded with
+        :meth:`.reqMarketRules`.
+
+        The cache is also filled with the market rule IDs of every
+        :class:`.ContractDetails` that is received,
+        so after :meth:`.qualifyContracts` only the rule itself
+        needs to be requested.
+
+        Args:
+            contract: Contract to get the rule for.
+        """
+        ruleIds = self.wrapper.conId2MarketRuleIds.get(contract.conId)
+        if not ruleIds:
+            return None
+        ruleId = ruleIds.get(contract.exchange) or \
+            next(iter(ruleIds.values()))
+        return self.wrapper.marketRules.get(ruleId)
+
+    def roundToTick(self, contract: Contract, prices):
+        """
+        Round prices to the nearest valid price increment of the contract,
+        using the cached market rule. This needs no network request,
+        making it suitable for order preparation.
+
+        Args:
+            contract: Contract whose market rule is to be used.
+            prices: A single price or an array-like of prices, that
+                are rounded in one vectorized operation.
+
+        Returns:
+            A float for a single price or a numpy array otherwise.
+            The prices are returned unchanged if the market rule of the
+            contract has not been loaded.
+        """
+        rule = self.marketRule(contract)
+        if not rule:
+            return prices
+        return util.roundToIncrements(prices, rule)
+
     def reqRealTimeBars(
             self, contract: Contract, barSize: int,
             whatToShow: str, useRTH: bool,
@@ -1007,12 +1218,23 @@ class IB:
             durationStr: str, barSizeSetting: str,
             whatToShow: str, useRTH: bool,
             formatDate: int = 1, keepUpToDate: bool = False,
-            chartOptions: List[TagValue] = None) -> BarDataList:
+            chartOptions: List[TagValue] = None,
+            useCache: bool = False,
+            columnar: bool = False) -> Union[BarDataList, BarDataColumns]:
         """
         Request historical bar data.
 
         This method is blocking.
 
+        With ``useCache`` and a :attr:`barCache` set, the request is
+        served from the cache, with only the windows that are missing from
+        the cache requested from TWS/gateway. The duration is then taken
+        as calendar time that ends at ``endDateTime``, which is not the
+        same window as TWS gives for a duration in trading days or
+        for bars that are aligned to the trading session. Requests with
+        ``keepUpToDate``, chart options, a non-empty ``endDateTime``
+        string or an unqualified contract are not cached.
+
         https://interactivebrokers.github.io/tws-api/historical_bars.html
 
         Args:
@@ -1045,11 +1267,19 @@ class IB:
                 to keep the bars updated; ``endDateTime`` must be set
                 empty ('') then.
             chartOptions: Unknown.
+            useCache: If True then serve the request from the
+                :attr:`barCache`, if set, with the duration taken as
+                calendar time.
+            columnar: If True then parse the bars straight into NumPy arrays
+                and return them as :class:`.BarDataColumns`. This is much
+                faster for large requests and can't be combined with
+                ``keepUpToDate``. Columnar requests are not cached.
         """
         return self._run(
             self.reqHistoricalDataAsync(
                 contract, endDateTime, durationStr, barSizeSetting, whatToShow,
-                useRTH, formatDate, keepUpToDate, chartOptions))
+                useRTH, formatDate, keepUpToDate, chartOptions, useCache,
+                columnar))
 
     def cancelHistoricalData(self, bars: BarDataList):
         """
@@ -1069,7 +1299,8 @@ class IB:
             endDateTime: Union[str, datetime.date],
             numberOfTicks: int, whatToShow: str, useRth: bool,
             ignoreSize: bool = False,
-            miscOptions: List[TagValue] = None) -> List:
+            miscOptions: List[TagValue] = None,
+            columnar: bool = False) -> List:
         """
         Request historical ticks. The time resolution of the ticks
         is one second.
@@ -1094,11 +1325,13 @@ class IB:
                 Trading Hours, if False then show all data.
             ignoreSize: Ignore bid/ask ticks that only update the size.
             miscOptions: Unknown.
+            columnar: If True then parse the ticks straight into NumPy
+                arrays and return them as :class:`.HistoricalTickColumns`.
         """
         return self._run(
             self.reqHistoricalTicksAsync(
                 contract, startDateTime, endDateTime, numberOfTicks,
-                whatToShow, useRth, ignoreSize, miscOptions))
+                whatToShow, useRth, ignoreSize, miscOptions, columnar))
 
     def reqMarketDataType(self, marketDataType: int):
         """
@@ -1619,14 +1852,36 @@ class IB:
         async def connect():
             self.wrapper.clientId = clientId
             await self.client.connectAsync(host, port, clientId, timeout)
-            if not readonly and self.client.serverVersion() >= 150:
+            watermark = self.wrapper.execWatermark
+            if watermark is None and self.tradeArchive:
+                watermark = self.tradeArchive.lastFillTime()
+            incremental = self.IncrementalSync and watermark is not None
+            hasCompletedOrders = not readonly and \
+                self.client.serverVersion() >= 150
+            vanished = []
+            if self.IncrementalSync and self.wrapper.trades:
+                vanished = await self._syncOpenTradesAsync(
+                    hasCompletedOrders)
+            elif hasCompletedOrders:
                 await self.reqCompletedOrdersAsync(False)
+            execFilter = None
+            if incremental:
+                since = watermark - datetime.timedelta(seconds=self.SyncMargin)
+                execFilter = ExecutionFilter(
+                    time=since.astimezone(datetime.timezone.utc).strftime(
+                        '%Y%m%d-%H:%M:%S'))
+                self._logger.info(f'Incremental sync since {since}')
+            elif self.IncrementalSync:
+                self._logger.info(
+                    'No known execution, requesting all executions')
             accounts = self.client.getAccounts()
             await asyncio.gather(
                 self.reqAccountUpdatesAsync(accounts[0]),
                 *(self.reqAccountUpdatesMultiAsync(a) for a in accounts),
                 self.reqPositionsAsync(),
-                self.reqExecutionsAsync())
+                self.reqExecutionsAsync(execFilter))
+            if vanished:
+                self._closeVanishedTrades(vanished)
             if clientId == 0:
                 # autobind manual orders
                 self.reqAutoOpenOrders(True)
@@ -1643,6 +1898,40 @@ class IB:
             self._logger.warn('Already connected')
         return self
 
+    async def _syncOpenTradesAsync(self, hasCompletedOrders):
+        # bring the trades that were open before a reconnect up to date,
+        # requesting the completed orders only if some have completed;
+        # return the trades that are no longer open but not yet done
+        openOrders = await self.reqAllOpenOrdersAsync()
+        permIds = {order.permId for order in openOrders}
+        vanished = [
+            trade for trade in self.wrapper.openTrades.values()
+            if trade.order.permId not in permIds]
+        if vanished and hasCompletedOrders:
+            await self.reqCompletedOrdersAsync(False)
+            vanished = [trade for trade in vanished if not trade.isDone()]
+        return vanished
+
+    def _closeVanishedTrades(self, trades):
+        # without the completed orders, the final status of the trades
+        # that completed while disconnected is taken from their fills
+        for trade in trades:
+            if trade.isDone():
+                continue
+            filled = trade.filled()
+            status = OrderStatus.Filled \
+                if filled >= trade.order.totalQuantity \
+                else OrderStatus.Cancelled
+            st = trade.orderStatus
+            self._logger.info(
+                f'Trade {trade.order.permId} is no longer open, '
+                f'taken as {status}')
+            self.wrapper.orderStatus(
+                trade.order.orderId, status, filled,
+                trade.order.totalQuantity - filled, st.avgFillPrice,
+                trade.order.permId, st.parentId, st.lastFillPrice,
+                trade.order.clientId, st.whyHeld)
+
     async def qualifyContractsAsync(self, *contracts):
         detailsLists = await asyncio.gather(
             *(self.reqContractDetailsAsync(c) for c in contracts))
@@ -1685,6 +1974,101 @@ class IB:
             self.wrapper.endTicker(ticker, 'snapshot')
         return tickers
 
+    async def streamTickersAsync(
+            self, *contracts, windowSize=50, retries=2, timeout=11,
+            regulatorySnapshot=False):
+        """
+        Request snapshot tickers with at most ``windowSize`` snapshots in
+        flight at any time and yield the tickers as they become ready,
+        in order of completion.
+        This keeps large universes within the market data line limit.
+
+        Snapshots that fail with an error or that time out are retried
+        up to ``retries`` times; a ticker whose retries are exhausted is
+        yielded anyway (possibly empty), just like :meth:`.reqTickers`
+        returns the tickers of failed requests. The throughput in
+        snapshots/sec is logged when done.
+
+        Usage::
+
+            async for ticker in ib.streamTickersAsync(*contracts):
+                print(ticker)
+
+        Args:
+            contracts: Contracts to get tickers for.
+            windowSize: Maximum number of concurrent snapshots.
+            retries: Number of times to retry a failed snapshot.
+            timeout: Time in seconds after which a snapshot that has not
+                finished is canceled and counted as failed.
+            regulatorySnapshot: Request NBBO snapshots (may incur a fee).
+        """
+        queue = deque((contract, 0) for contract in contracts)
+        pending = {}  # task -> (reqId, ticker, attempt)
+        reqIds = set()
+        failedReqIds = set()
+
+        def onError(reqId, *_):
+            # the request has already ended if it was an error and not a
+            # warning
+            if reqId in reqIds and reqId not in self.wrapper._futures:
+                failedReqIds.add(reqId)
+
+        t0 = time.time()
+        numDone = numFailed = 0
+        self.errorEvent += onError
+        try:
+            while queue or pending:
+                while queue and len(pending) < windowSize:
+                    contract, attempt = queue.popleft()
+                    reqId = self.client.getReqId()
+                    reqIds.add(reqId)
+                    future = self.wrapper.startReq(reqId, contract)
+                    ticker = self.wrapper.startTicker(
+                        reqId, contract, 'snapshot')
+                    self.client.reqMktData(
+                        reqId, contract, '', True, regulatorySnapshot, [])
+                    task = asyncio.ensure_future(
+                        asyncio.wait_for(future, timeout or None))
+                    pending[task] = (reqId, ticker, attempt)
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    reqId, ticker, attempt = pending.pop(task)
+                    reqIds.discard(reqId)
+                    self.wrapper.endTicker(ticker, 'snapshot')
+                    exc = task.exception()
+                    if isinstance(exc, asyncio.TimeoutError):
+                        self.client.cancelMktData(reqId)
+                        self.wrapper._endReq(reqId)
+                    elif exc:
+                        raise exc
+                    if exc or reqId in failedReqIds:
+                        failedReqIds.discard(reqId)
+                        if attempt < retries:
+                            queue.append((ticker.contract, attempt + 1))
+                            continue
+                        numFailed += 1
+                        self._logger.error(
+                            'streamTickersAsync: Snapshot failed for '
+                            f'{ticker.contract}')
+                    numDone += 1
+                    yield ticker
+        finally:
+            self.errorEvent -= onError
+            for task, (reqId, ticker, _) in pending.items():
+                # release the requests that are left in flight when the
+                # consumer stops early or an exception is raised
+                task.cancel()
+                self.wrapper.endTicker(ticker, 'snapshot')
+                self.wrapper._endReq(reqId)
+                if self.client.isReady():
+                    self.client.cancelMktData(reqId)
+            secs = time.time() - t0
+            self._logger.info(
+                f'streamTickersAsync: {numDone} snapshots '
+                f'({numFailed} failed) in {secs:.1f}s, '
+                f'{numDone / (secs or 1):.1f} snapshots/sec')
+
     def whatIfOrderAsync(self, contract, order):
         whatIfOrder = Order(**order.dict()).update(whatIf=True)
         reqId = self.client.getReqId()
@@ -1776,12 +2160,38 @@ class IB:
         except asyncio.TimeoutError:
             self._logger.error('reqMarketRuleAsync: Timeout')
 
+    async def reqMarketRulesAsync(self, *contracts):
+        ruleIds = self.wrapper.conId2MarketRuleIds
+        unknown = [c for c in contracts if c.conId not in ruleIds]
+        if unknown:
+            await self.qualifyContractsAsync(*unknown)
+        missing = {
+            ruleId for c in contracts
+            for ruleId in ruleIds.get(c.conId, {}).values()
+            if ruleId not in self.wrapper.marketRules}
+        await asyncio.gather(
+            *(self.reqMarketRuleAsync(ruleId) for ruleId in missing))
+        return [self.marketRule(c) for c in contracts]
+
     def reqHistoricalDataAsync(
             self, contract, endDateTime,
             durationStr, barSizeSetting, whatToShow, useRTH,
-            formatDate=1, keepUpToDate=False, chartOptions=None):
+            formatDate=1, keepUpToDate=False, chartOptions=None,
+            useCache=False, columnar=False):
+        if columnar and keepUpToDate:
+            raise ValueError('columnar bars can not be kept up to date')
+        if (useCache and self.barCache is not None and not keepUpToDate
+                and not columnar
+                and not chartOptions and contract.conId
+                and not (endDateTime and isinstance(endDateTime, str))):
+            downloader = self._getDownloader()
+            downloader.cache = self.barCache
+            return asyncio.ensure_future(
+                downloader.reqHistoricalDataAsync(
+                    contract, endDateTime, durationStr, barSizeSetting,
+                    whatToShow, useRTH, formatDate))
         reqId = self.client.getReqId()
-        bars = BarDataList()
+        bars = BarDataColumns() if columnar else BarDataList()
         bars.reqId = reqId
         bars.contract = contract
         bars.endDateTime = endDateTime
@@ -1790,7 +2200,8 @@ class IB:
         bars.whatToShow = whatToShow
         bars.useRTH = useRTH
         bars.formatDate = formatDate
-        bars.keepUpToDate = keepUpToDate
+        if not columnar:
+            bars.keepUpToDate = keepUpToDate
         bars.chartOptions = chartOptions
         future = self.wrapper.startReq(reqId, contract, container=bars)
         if keepUpToDate:
@@ -1804,9 +2215,14 @@ class IB:
     def reqHistoricalTicksAsync(
             self, contract, startDateTime, endDateTime,
             numberOfTicks, whatToShow, useRth,
-            ignoreSize=False, miscOptions=None):
+            ignoreSize=False, miscOptions=None, columnar=False):
         reqId = self.client.getReqId()
-        future = self.wrapper.startReq(reqId, contract)
+        ticks = None
+        if columnar:
+            ticks = HistoricalTickColumns(whatToShow)
+            ticks.reqId = reqId
+            ticks.contract = contract
+        future = self.wrapper.startReq(reqId, contract, container=ticks)
         start = util.formatIBDatetime(startDateTime)
         end = util.formatIBDatetime(endDateTime)
         self.client.reqHistoricalTicks(
@@ -1814,6 +2230,166 @@ class IB:
             ignoreSize, miscOptions or [])
         return future
 
+    async def streamHistoricalTicksAsync(
+            self, contract, startDateTime, endDateTime, whatToShow,
+            useRth, ignoreSize=False, numberOfTicks=1000):
+        """
+        Stream the historical ticks from ``startDateTime`` up to
+        ``endDateTime`` by paging forward in time, yielding every page as
+        :class:`.HistoricalTickColumns`. The ticks of the second where two
+        pages overlap are yielded only once. Memory use does not depend
+        on the length of the range.
+
+        Historical tick requests fall under the same pacing limits as
+        the requests for small bars, so the pages are paced together
+        with the downloads of the :class:`.HistoricalDownloader` of this
+        instance. Closing the stream stops the paging.
+
+        Usage::
+
+            async for ticks in ib.streamHistoricalTicksAsync(
+                    contract, start, '', 'TRADES', useRth=False):
+                print(len(ticks), ticks['price'].mean())
+
+        Args:
+            contract: Contract to query.
+            startDateTime: Start of the range, as datetime.date for
+                midnight of that day or as datetime.datetime.
+            endDateTime: End of the range, as datetime.date or
+                datetime.datetime, or '' for now.
+            whatToShow: One of 'Bid_Ask', 'Midpoint' or 'Trades'.
+            useRTH: If True then only show data from within Regular
+                Trading Hours, if False then show all data.
+            ignoreSize: Ignore bid/ask ticks that only update the size.
+            numberOfTicks: Number of ticks per page (1000 max).
+        """
+        if isinstance(endDateTime, datetime.datetime):
+            endTs = endDateTime.timestamp()
+        elif endDateTime:
+            endTs = datetime.datetime.combine(
+                endDateTime, datetime.time(23, 59, 59)).timestamp()
+        else:
+            endTs = float('inf')
+        if not isinstance(startDateTime, datetime.datetime):
+            # a date starts at midnight, not at the end of the day
+            startDateTime = datetime.datetime.combine(
+                startDateTime, datetime.time())
+        downloader = self._getDownloader()
+        cursor = startDateTime
+        lastTime = None
+        lastCount = 0  # number of ticks that are yielded for lastTime
+        while True:
+            await downloader.paceAsync(
+                (contract.conId, contract.exchange, whatToShow))
+            ticks = await self.reqHistoricalTicksAsync(
+                contract, cursor, '', numberOfTicks, whatToShow, useRth,
+                ignoreSize, columnar=True)
+            times = ticks['time']
+            if not len(times):
+                break
+            numDupes = int((times == lastTime).sum()) if lastTime else 0
+            start = min(numDupes, lastCount)
+            stop = int(times.searchsorted(endTs, 'right'))
+            if start < stop:
+                yield ticks.slice(start, stop)
+            last = int(times[-1])
+            if stop < len(times) or len(times) < numberOfTicks:
+                break
+            if last == lastTime and start == len(times):
+                # a full page within one second: skip to the next second
+                self._logger.warning(
+                    f'streamHistoricalTicksAsync: More than {len(times)} '
+                    f'ticks at {last} for {contract}, some may be skipped')
+                last += 1
+                lastCount = 0
+            else:
+                lastCount = int((times == last).sum())
+            lastTime = last
+            cursor = datetime.datetime.fromtimestamp(
+                last, datetime.timezone.utc)
+
+    async def streamHistoricalDataAsync(
+            self, contract, endDateTime, durationStr, barSizeSetting,
+            whatToShow, useRTH, formatDate=1, chunkSize=1000,
+            maxBuffer=100000):
+        """
+        Request historical bar data and yield the bars in lists of up to
+        ``chunkSize`` bars as they become available. The bars are only
+        created as the chunks are consumed, which lowers the time to
+        the first result and the peak memory use for large requests.
+
+        Usage::
+
+            async for bars in ib.streamHistoricalDataAsync(
+                    contract, '', '1 Y', '1 min', 'TRADES', True):
+                process(bars)
+
+        The arguments are as for :meth:`.reqHistoricalData`, with:
+
+        Args:
+            chunkSize: Maximum number of bars per chunk.
+            maxBuffer: Maximum number of buffered bars. Reading from the
+                socket is paused while the buffer is full, which holds
+                up all other incoming data as well.
+
+        Raises ConnectionError if the connection is lost before the
+        stream is complete, after the buffered chunks are yielded.
+        """
+        reqId = self.client.getReqId()
+        stream = RequestStream(self.client.conn, maxBuffer)
+        future = self.wrapper.startReq(reqId, contract, container=stream)
+        end = util.formatIBDatetime(endDateTime)
+        self.client.reqHistoricalData(
+            reqId, contract, end, durationStr, barSizeSetting,
+            whatToShow, useRTH, formatDate, False, None)
+        async for chunk in self._streamAsync(reqId, future, stream, chunkSize):
+            yield chunk
+
+    async def streamExecutionsAsync(
+            self, execFilter=None, chunkSize=100, maxBuffer=10000):
+        """
+        Request executions and yield the fills in lists of up to
+        ``chunkSize`` fills as they arrive, instead of all at the end
+        like :meth:`.reqExecutions`.
+
+        Args:
+            execFilter: If specified, yield executions that match
+                the filter.
+            chunkSize: Maximum number of fills per chunk.
+            maxBuffer: Maximum number of buffered fills. Reading from the
+                socket is paused while the buffer is full, which holds
+                up all other incoming data as well.
+
+        Raises ConnectionError if the connection is lost before the
+        stream is complete, after the buffered chunks are yielded.
+        """
+        execFilter = execFilter or ExecutionFilter()
+        reqId = self.client.getReqId()
+        stream = RequestStream(self.client.conn, maxBuffer)
+        future = self.wrapper.startReq(reqId, container=stream)
+        self.client.reqExecutions(reqId, execFilter)
+        async for chunk in self._streamAsync(reqId, future, stream, chunkSize):
+            yield chunk
+
+    async def _streamAsync(self, reqId, future, stream, chunkSize):
+        future.add_done_callback(lambda _: stream.event.set())
+        try:
+            while True:
+                chunk = stream.take(chunkSize)
+                if chunk:
+                    yield chunk
+                elif future.done():
+                    # raises the ConnectionError of a disconnect
+                    future.result()
+                    break
+                else:
+                    await stream.event.wait()
+        finally:
+            stream.close()
+            if not future.done():
+                # abandoned by the consumer
+                self.wrapper._endReq(reqId)
+
     def reqHeadTimeStampAsync(
             self, contract, whatToShow, useRTH, formatDate):
         reqId = self.client.getReqId()
@@ -1936,6 +2512,29 @@ class IB:
             self._logger.error('requestFAAsync: Timeout')
 
 
+def _orderGroups(orders):
+    # group the (contract, order) tuples that are linked by parentId or
+    # ocaGroup, keeping the given order within and among the groups
+    roots = {}
+
+    def find(key):
+        while roots.setdefault(key, key) != key:
+            key = roots[key]
+        return key
+
+    for _, order in orders:
+        key = find(('id', order.orderId))
+        if order.parentId:
+            roots[key] = key = find(('id', order.parentId))
+        if order.ocaGroup:
+            roots[key] = find(('oca', order.ocaGroup))
+    groups = {}
+    for contract, order in orders:
+        groups.setdefault(find(('id', order.orderId)), []).append(
+            (contract, order))
+    return list(groups.values())
+
+
 if __name__ == '__main__':
     asyncio.get_event_loop().set_debug(True)
     util.logToConsole(logging.DEBUG)
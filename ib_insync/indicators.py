@@ -0,0 +1,339 @@
+import abc
+import datetime
+import math
+from array import array
+
+from eventkit import Op
+
+from ib_insync.objects import BarList
+from ib_insync.util import barTuple, isNan
+
+__all__ = [
+    'Indicator', 'EMA', 'SMA', 'RollingVariance', 'TimeWeightedMean',
+    'VWAP', 'ATR']
+
+nan = float('nan')
+
+
+class Indicator(Op, metaclass=abc.ABCMeta):
+    """
+    Base class for indicators that update in O(1) per bar or tick,
+    with their state in fixed-size arrays.
+
+    The source is either a bar list, such as a :class:`.BarDataList`
+    with keepUpToDate, a :class:`.RealTimeBarList` or the ``bars`` of
+    the tick aggregators, or a :class:`.Tickfilter` that emits
+    (time, price, size) or chunks of ticks. For bars the high, low,
+    close and volume are used and for ticks the price and size.
+
+    The last bar of a bar list is taken as still in progress: it is
+    folded into the state only once a newer bar arrives, so that an
+    in-place update of the last bar gives a new value from the same
+    state. Empty bars and ticks, with a NaN close or price, are skipped.
+
+    Subclasses implement :meth:`step`.
+
+    Emits (time, value) on every update, or once per chunk of ticks,
+    with the latest value also in ``value``.
+
+    Args:
+        source: The bar list or tick filter to attach to.
+    """
+    __slots__ = ('value', 'time', '_state', '_numCommitted')
+
+    # initial values of the state array
+    initState = ()
+
+    def __init__(self, source=None):
+        Op.__init__(self)
+        self.value = nan
+        self.time = None
+        self._state = array('d', self.initState)
+        self._numCommitted = 0
+        if source is not None:
+            self.set_source(source)
+
+    def set_source(self, source):
+        bars = getattr(source, 'bars', None)
+        if isinstance(bars, BarList):
+            source = bars
+        if isinstance(source, BarList):
+            self._numCommitted = source.numEvicted
+            if source:
+                self.on_source(source, True)
+            source = source.updateEvent
+        Op.set_source(self, source)
+
+    def reset(self):
+        """
+        Start over from the next bar or tick, for example at the
+        start of a new session.
+        """
+        self._state[:] = array('d', self.initState)
+        self.value = nan
+
+    def on_source(self, *args):
+        if isinstance(args[0], BarList):
+            bars = args[0]
+            if not bars:
+                return
+            while self._numCommitted < bars.numBars() - 1:
+                t, _, h, l, c, v, _ = barTuple(bars.at(self._numCommitted))
+                if not isNan(c):
+                    self.step(self._state, t, h, l, c, v, True)
+                self._numCommitted += 1
+            t, _, h, l, c, v, _ = barTuple(bars[-1])
+            if isNan(c):
+                return
+            value = self.step(self._state, t, h, l, c, v, False)
+        elif isinstance(args[1], array):
+            # chunk of ticks
+            times, prices, sizes = args
+            state, step = self._state, self.step
+            value = nan
+            for t, price, size in zip(times, prices, sizes):
+                if not isNan(price):
+                    value = step(state, t, price, price, price, size, True)
+            if isNan(value):
+                return
+        else:
+            t, price = args[0], args[1]
+            if isNan(price):
+                return
+            size = args[2] if len(args) > 2 else 0
+            value = self.step(
+                self._state, t, price, price, price, size, True)
+        self.time = t
+        self.value = value
+        self.emit(t, value)
+
+    @abc.abstractmethod
+    def step(self, state, time, high, low, close, volume, commit) -> float:
+        """
+        Get the value with one more bar or tick, for a tick with the
+        price as high, low and close. The state array (and any other
+        state of the indicator) must only be updated if ``commit``
+        is True, so that the last bar can be stepped again after an
+        in-place update. Must be O(1).
+        """
+
+
+class EMA(Indicator):
+    """
+    Exponential moving average of the close or price.
+
+    Args:
+        period: Number of bars or ticks, with a smoothing factor
+            of 2 / (period + 1).
+        source: See :class:`Indicator`.
+    """
+    __slots__ = ('_alpha',)
+
+    initState = (nan,)
+
+    def __init__(self, period: int, source=None):
+        self._alpha = 2 / (period + 1)
+        Indicator.__init__(self, source)
+
+    def step(self, state, time, high, low, close, volume, commit):
+        ema = state[0]
+        ema = close if isNan(ema) else ema + self._alpha * (close - ema)
+        if commit:
+            state[0] = ema
+        return ema
+
+
+class SMA(Indicator):
+    """
+    Simple moving average of the close or price over a window
+    that is kept in a ring buffer. During warm-up the average is over
+    the available bars or ticks. The running sum is re-summed exactly
+    once per window.
+
+    Args:
+        period: Number of bars or ticks in the window.
+        source: See :class:`Indicator`.
+    """
+    __slots__ = ('_period', '_window')
+
+    # sum, number of values, index of the oldest value
+    initState = (0.0, 0.0, 0.0)
+
+    def __init__(self, period: int, source=None):
+        self._period = period
+        self._window = array('d', [0.0] * period)
+        Indicator.__init__(self, source)
+
+    def step(self, state, time, high, low, close, volume, commit):
+        total, n, i = state[0], int(state[1]), int(state[2])
+        if n == self._period:
+            total -= self._window[i]
+        else:
+            n += 1
+        total += close
+        if commit:
+            self._window[i] = close
+            i = (i + 1) % self._period
+            if not i:
+                # re-sum once per window to drop the accumulated
+                # floating point error of the running sum
+                total = math.fsum(self._window[:n])
+            state[0] = total
+            state[1] = n
+            state[2] = i
+        return total / n
+
+
+class RollingVariance(Indicator):
+    """
+    Sample variance of the close or price over a window that is kept
+    in a ring buffer, updated with Welford's method and recomputed
+    exactly once per window. The standard deviation is given by
+    :meth:`std`.
+
+    Args:
+        period: Number of bars or ticks in the window.
+        source: See :class:`Indicator`.
+    """
+    __slots__ = ('_period', '_window')
+
+    # mean, sum of squared deviations, number of values, index of oldest
+    initState = (0.0, 0.0, 0.0, 0.0)
+
+    def __init__(self, period: int, source=None):
+        self._period = period
+        self._window = array('d', [0.0] * period)
+        Indicator.__init__(self, source)
+
+    def step(self, state, time, high, low, close, volume, commit):
+        mean, m2, n, i = state[0], state[1], int(state[2]), int(state[3])
+        if n == self._period:
+            old = self._window[i]
+            newMean = mean + (close - old) / n
+            m2 += (close - old) * (close - newMean + old - mean)
+        else:
+            n += 1
+            newMean = mean + (close - mean) / n
+            m2 += (close - mean) * (close - newMean)
+        m2 = max(m2, 0.0)
+        if commit:
+            self._window[i] = close
+            i = (i + 1) % self._period
+            if not i:
+                # recompute once per window to drop the accumulated
+                # floating point error of the running sums
+                window = self._window[:n]
+                newMean = math.fsum(window) / n
+                m2 = math.fsum((x - newMean) ** 2 for x in window)
+            state[0] = newMean
+            state[1] = m2
+            state[2] = n
+            state[3] = i
+        return m2 / (n - 1) if n > 1 else nan
+
+    def std(self) -> float:
+        """
+        Standard deviation of the latest value.
+        """
+        return math.sqrt(self.value) if self.value >= 0 else nan
+
+
+class TimeWeightedMean(Indicator):
+    """
+    Mean of the close or price weighted by the time that it was in
+    effect, up to the latest bar or tick.
+
+    Args:
+        halfLife: Half-life in seconds with which older prices decay,
+            or 0 for the mean since the start (or :meth:`reset`).
+        source: See :class:`Indicator`.
+    """
+    __slots__ = ('_halfLife',)
+
+    # weighted sum, sum of weights, previous time, previous price
+    initState = (0.0, 0.0, nan, nan)
+
+    def __init__(self, halfLife: float = 0, source=None):
+        self._halfLife = halfLife
+        Indicator.__init__(self, source)
+
+    def step(self, state, time, high, low, close, volume, commit):
+        t = _seconds(time)
+        total, weight, prevTime = state[0], state[1], state[2]
+        if not isNan(prevTime):
+            dt = max(t - prevTime, 0.0)
+            if self._halfLife:
+                decay = 0.5 ** (dt / self._halfLife)
+                total *= decay
+                weight *= decay
+            total += state[3] * dt
+            weight += dt
+        if commit:
+            state[0] = total
+            state[1] = weight
+            state[2] = t
+            state[3] = close
+        return total / weight if weight else close
+
+
+class VWAP(Indicator):
+    """
+    Volume-weighted average price since the start (or :meth:`reset`),
+    using the typical price (high + low + close) / 3 of bars.
+
+    Args:
+        source: See :class:`Indicator`.
+    """
+    __slots__ = ()
+
+    # sum of price times volume, sum of volume
+    initState = (0.0, 0.0)
+
+    def step(self, state, time, high, low, close, volume, commit):
+        price = (high + low + close) / 3
+        pv = state[0] + price * volume
+        v = state[1] + volume
+        if commit:
+            state[0] = pv
+            state[1] = v
+        return pv / v if v else nan
+
+
+class ATR(Indicator):
+    """
+    Average true range with Wilder's smoothing. During warm-up the
+    average is over the available bars.
+
+    Args:
+        period: Number of bars.
+        source: See :class:`Indicator`.
+    """
+    __slots__ = ('_period',)
+
+    # average, previous close, number of bars
+    initState = (0.0, nan, 0.0)
+
+    def __init__(self, period: int = 14, source=None):
+        self._period = period
+        Indicator.__init__(self, source)
+
+    def step(self, state, time, high, low, close, volume, commit):
+        atr, prevClose, n = state[0], state[1], state[2]
+        tr = high - low
+        if not isNan(prevClose):
+            tr = max(tr, abs(high - prevClose), abs(low - prevClose))
+        n = min(n + 1, self._period)
+        atr += (tr - atr) / n
+        if commit:
+            state[0] = atr
+            state[1] = close
+            state[2] = n
+        return atr
+
+
+def _seconds(t):
+    if isinstance(t, datetime.datetime):
+        return t.timestamp()
+    elif isinstance(t, datetime.date):
+        return t.toordinal() * 86400.0
+    return float(t)
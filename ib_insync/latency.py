@@ -0,0 +1,307 @@
+import heapq
+import math
+import time
+from array import array
+from collections import namedtuple
+from typing import List
+
+from ib_insync.objects import Object
+from ib_insync.order import OrderStatus, Trade
+from ib_insync.util import isNan
+
+__all__ = [
+    'LatencyTracer', 'LatencyHistogram', 'OrderTimings', 'LatencyStats']
+
+nan = float('nan')
+
+LatencyStats = namedtuple(
+    'LatencyStats',
+    'symbol exchange action stage count mean p50 p99 max')
+
+
+class OrderTimings(Object):
+    """
+    Timestamps of one place, modify or cancel action on an order, in
+    seconds of the monotonic high-resolution ``time.perf_counter``
+    clock. A stage that has not been seen (yet) is NaN.
+
+    * ``call``: The call of placeOrder or cancelOrder;
+    * ``write``: The write of the message to the socket, which can be
+      later than the call when the requests are throttled;
+    * ``openOrder``: The receipt of the open order;
+    * ``status``: The order status that acknowledges the action, such
+      as Submitted for a new order or Cancelled for a cancel;
+    * ``execDetails``: The receipt of the first fill;
+    * ``commissionReport``: The receipt of the first commission report.
+    """
+    defaults = dict(
+        action='',
+        symbol='',
+        exchange='',
+        call=nan,
+        write=nan,
+        openOrder=nan,
+        status=nan,
+        execDetails=nan,
+        commissionReport=nan)
+    __slots__ = defaults.keys()
+
+    stages = (
+        'write', 'openOrder', 'status', 'execDetails', 'commissionReport')
+
+    def latencies(self) -> dict:
+        """
+        Latency in seconds from the call to every stage that has been seen.
+        """
+        return {
+            stage: getattr(self, stage) - self.call
+            for stage in self.stages if not isNan(getattr(self, stage))}
+
+
+class LatencyHistogram:
+    """
+    Histogram of latencies with logarithmic bins, from one microsecond
+    to 100 seconds with a resolution of about 12%.
+    """
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    minLatency = 1e-6
+    binsPerDecade = 20
+    numBins = 8 * binsPerDecade + 1
+
+    def __init__(self):
+        self.counts = array('l', [0] * self.numBins)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def __repr__(self):
+        return (
+            f'LatencyHistogram(count={self.count}, '
+            f'p50={self.quantile(0.5):.6f}, p99={self.quantile(0.99):.6f})')
+
+    def add(self, latency: float):
+        """
+        Add a latency in seconds.
+        """
+        if latency <= self.minLatency:
+            i = 0
+        else:
+            i = min(
+                int(math.log10(latency / self.minLatency)
+                    * self.binsPerDecade) + 1,
+                self.numBins - 1)
+        self.counts[i] += 1
+        self.count += 1
+        self.total += latency
+        if latency > self.max:
+            self.max = latency
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else nan
+
+    def quantile(self, q: float) -> float:
+        """
+        The latency of the given quantile (0 <= q <= 1), taken as the
+        middle of its bin, or NaN if empty.
+        """
+        if not self.count:
+            return nan
+        rank = max(math.ceil(q * self.count), 1)
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            cumulative += n
+            if cumulative >= rank:
+                break
+        if i == 0:
+            return min(self.minLatency, self.max)
+        latency = self.minLatency * 10 ** ((i - 0.5) / self.binsPerDecade)
+        return min(latency, self.max)
+
+
+class LatencyTracer:
+    """
+    Trace the latency of the order life cycle.
+
+    Every place, modify and cancel action gets its :class:`.OrderTimings`
+    with monotonic timestamps of the call, the socket write and the
+    responses from TWS. The latencies from the call to every stage are
+    aggregated in a :class:`.LatencyHistogram` per
+    (symbol, exchange, action, stage), where the symbol and exchange are
+    the local symbol and exchange of the order contract.
+
+    Usage::
+
+        tracer = LatencyTracer(ib)
+        tracer.start()
+        ...
+        print(tracer.df())
+
+    Args:
+        ib: The :class:`.IB` instance to trace.
+        maxTrades: Maximum number of trades to keep the timings of;
+            the histograms are not affected by this limit.
+    """
+
+    def __init__(self, ib, maxTrades: int = 10000):
+        self.ib = ib
+        self.maxTrades = maxTrades
+        # (symbol, exchange, action, stage) -> LatencyHistogram
+        self.histograms = {}
+        self._timings = {}  # order key -> list of OrderTimings
+        self._unwritten = []  # heap of (message number, id, timings)
+        self._lastWriteTime = nan
+        self._numMsgWritten = 0
+
+    def start(self):
+        """
+        Start tracing the orders of the IB instance.
+        """
+        ib = self.ib
+        ib.latencyTracer = self
+        ib.client.apiWrite += self._onWrite
+        ib.openOrderEvent += self._onOpenOrder
+        ib.orderStatusEvent += self._onOrderStatus
+        ib.execDetailsEvent += self._onExecDetails
+        ib.commissionReportEvent += self._onCommissionReport
+
+    def stop(self):
+        """
+        Stop tracing.
+        """
+        ib = self.ib
+        if ib.latencyTracer is self:
+            ib.latencyTracer = None
+        ib.client.apiWrite -= self._onWrite
+        ib.openOrderEvent -= self._onOpenOrder
+        ib.orderStatusEvent -= self._onOrderStatus
+        ib.execDetailsEvent -= self._onExecDetails
+        ib.commissionReportEvent -= self._onCommissionReport
+
+    def clear(self):
+        """
+        Clear the histograms and timings.
+        """
+        self.histograms.clear()
+        self._timings.clear()
+        self._unwritten.clear()
+
+    def track(
+            self, trade: Trade, callTime: float, action: str = '',
+            msgNum: int = 0) -> OrderTimings:
+        """
+        Start the timings of a new action on the trade. This is
+        called by the :class:`.IB` order methods.
+
+        Args:
+            trade: The trade that the action is on.
+            callTime: ``time.perf_counter()`` at the start of the call.
+            action: 'place', 'modify' or 'cancel', or '' to tell place
+                and modify apart by the trade log.
+            msgNum: Number of the order message in the client,
+                or 0 for the last message sent.
+        """
+        if not action:
+            action = 'modify' if trade.log and \
+                trade.log[-1].message == 'Modify' else 'place'
+        contract = trade.contract
+        timings = OrderTimings(
+            action, contract.localSymbol or contract.symbol,
+            contract.exchange, callTime)
+        key = self._key(trade)
+        timingsList = self._timings.pop(key, None) or []
+        timingsList.append(timings)
+        # re-insert to keep the most recently used trades last
+        self._timings[key] = timingsList
+        if len(self._timings) > self.maxTrades:
+            del self._timings[next(iter(self._timings))]
+
+        client = self.ib.client
+        msgNum = msgNum or client._numMsgQueued
+        if msgNum <= client._numMsgWritten:
+            # written during the call
+            self._record(timings, 'write', self._lastWriteTime)
+        else:
+            heapq.heappush(self._unwritten, (msgNum, id(timings), timings))
+        return timings
+
+    def timings(self, trade: Trade) -> List[OrderTimings]:
+        """
+        The timings of all actions on the trade, oldest first.
+        """
+        return list(self._timings.get(self._key(trade), []))
+
+    def stats(self) -> List[LatencyStats]:
+        """
+        The count, mean, median, 99th percentile and maximum in seconds
+        of every histogram.
+        """
+        return [
+            LatencyStats(
+                *key, h.count, h.mean(), h.quantile(0.5), h.quantile(0.99),
+                h.max)
+            for key, h in sorted(self.histograms.items())]
+
+    def df(self):
+        """
+        The statistics as a pandas DataFrame.
+        """
+        import pandas as pd
+        return pd.DataFrame(self.stats(), columns=LatencyStats._fields)
+
+    def _key(self, trade):
+        order = trade.order
+        return self.ib.wrapper.orderKey(
+            order.clientId, order.orderId, order.permId)
+
+    def _latest(self, trade):
+        timingsList = self._timings.get(self._key(trade))
+        return timingsList[-1] if timingsList else None
+
+    def _record(self, timings, stage, t):
+        if timings is None or not isNan(getattr(timings, stage)) \
+                or isNan(t):
+            return
+        setattr(timings, stage, t)
+        key = (timings.symbol, timings.exchange, timings.action, stage)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram()
+        histogram.add(t - timings.call)
+
+    def _onWrite(self, numMsgWritten):
+        t = self._lastWriteTime = time.perf_counter()
+        unwritten = self._unwritten
+        if numMsgWritten < self._numMsgWritten:
+            # the count restarts with a new connection and the messages
+            # of the old connection are never written
+            unwritten.clear()
+        self._numMsgWritten = numMsgWritten
+        while unwritten and unwritten[0][0] <= numMsgWritten:
+            _, _, timings = heapq.heappop(unwritten)
+            self._record(timings, 'write', t)
+
+    def _onOpenOrder(self, trade):
+        self._record(self._latest(trade), 'openOrder', time.perf_counter())
+
+    def _onOrderStatus(self, trade):
+        t = time.perf_counter()
+        timings = self._latest(trade)
+        if timings is None:
+            return
+        status = trade.orderStatus.status
+        if timings.action == 'cancel':
+            isAck = status in (OrderStatus.Cancelled, OrderStatus.ApiCancelled)
+        else:
+            isAck = status not in (
+                OrderStatus.PendingSubmit, OrderStatus.PendingCancel,
+                OrderStatus.ApiPending)
+        if isAck:
+            self._record(timings, 'status', t)
+
+    def _onExecDetails(self, trade, fill):
+        self._record(self._latest(trade), 'execDetails', time.perf_counter())
+
+    def _onCommissionReport(self, trade, fill, report):
+        self._record(
+            self._latest(trade), 'commissionReport', time.perf_counter())
@@ -0,0 +1,258 @@
+import asyncio
+import logging
+from collections import OrderedDict
+
+from eventkit import Event
+
+from ib_insync.objects import Object, LineStats
+from ib_insync.ticker import Ticker
+
+__all__ = ['LineManager']
+
+
+class MktDataLine(Object):
+    defaults = dict(
+        contract=None,
+        ticker=None,
+        refCount=0,
+        priority=0,
+        pinned=False)
+    __slots__ = defaults
+
+
+class LineManager:
+    """
+    Keep the number of concurrent market data lines within the limit
+    of the account and share lines among consumers.
+
+    * Subscriptions are reference counted per conId: Consumers that
+      subscribe to the same contract share one line and one ticker;
+    * When all lines are in use, the least recently used line of the
+      lowest priority is suspended to make room for a subscription of
+      equal or higher priority. Pinned lines are never suspended;
+    * Suspended lines are resumed as soon as a line becomes available,
+      highest priority first. With a ``rotationInterval`` the suspended
+      lines also take turns with the active lines of the same or lower
+      priority;
+    * A suspended line keeps its ticker, which is updated again once
+      the line is resumed. Active lines are re-requested after a
+      reconnect.
+
+    Args:
+        ib: The :class:`.IB` instance to request the lines from.
+        maxLines: Maximum number of concurrent lines to use.
+        genericTickList: Generic tick list to use for the lines,
+            see :meth:`.IB.reqMktData`.
+        rotationInterval: Interval in seconds for rotating suspended
+            lines with active lines, or 0 to not rotate.
+
+    Events:
+        * ``suspendEvent`` (ticker: :class:`.Ticker`):
+          The line of the ticker has been suspended.
+        * ``resumeEvent`` (ticker: :class:`.Ticker`):
+          The line of the ticker has been resumed.
+    """
+
+    events = ('suspendEvent', 'resumeEvent')
+
+    def __init__(
+            self, ib, maxLines: int = 100, genericTickList: str = '',
+            rotationInterval: float = 0):
+        self.ib = ib
+        self.maxLines = maxLines
+        self.genericTickList = genericTickList
+        self.rotationInterval = rotationInterval
+        self.suspendEvent = Event('suspendEvent')
+        self.resumeEvent = Event('resumeEvent')
+        self._active = OrderedDict()  # key -> line, least recently used first
+        self._suspended = OrderedDict()  # key -> line, longest waiting first
+        self._numShared = 0
+        self._numRotations = 0
+        self._logger = logging.getLogger('ib_insync.linemanager')
+        self.ib.connectedEvent += self.restore
+        if rotationInterval:
+            loop = asyncio.get_event_loop()
+            loop.call_later(rotationInterval, self._onRotationTimer)
+
+    def subscribe(
+            self, contract, priority: int = 0,
+            pinned: bool = False) -> Ticker:
+        """
+        Subscribe to market data and return the ticker of the line.
+        If there is already a line for the contract then it is shared.
+
+        Args:
+            contract: Contract of interest.
+            priority: Lines of lower priority are suspended first
+                when the line limit is reached.
+            pinned: If True then the line is never suspended.
+        """
+        key, line = self._find(contract)
+        if line:
+            line.refCount += 1
+            line.priority = max(line.priority, priority)
+            line.pinned = line.pinned or pinned
+            self._numShared += 1
+            if key in self._active:
+                self._active.move_to_end(key)
+            else:
+                self._admit(key, line)
+        else:
+            ticker = self.ib.ticker(contract) or Ticker(
+                contract=contract, ticks=[], tickByTicks=[],
+                domBids=[], domAsks=[], domTicks=[])
+            line = MktDataLine(contract, ticker, 1, priority, pinned)
+            self._suspended[key] = line
+            self._admit(key, line, False)
+        return line.ticker
+
+    def unsubscribe(self, contract):
+        """
+        Release the subscription of one consumer. The line is canceled
+        when it has no consumers left, which makes room for a
+        suspended line.
+
+        Args:
+            contract: Contract that was used to subscribe with.
+        """
+        key, line = self._find(contract)
+        if not line:
+            self._logger.error(f'unsubscribe: No line for {contract}')
+            return
+        line.refCount -= 1
+        if line.refCount > 0:
+            return
+        if self._active.pop(key, None):
+            if self.ib.isConnected():
+                self.ib.cancelMktData(line.contract)
+            self._fill()
+        else:
+            self._suspended.pop(key)
+
+    def touch(self, contract):
+        """
+        Mark the line of the contract as recently used, so that
+        it will be among the last to be suspended.
+        """
+        key, _ = self._find(contract)
+        if key in self._active:
+            self._active.move_to_end(key)
+
+    def ticker(self, contract) -> Ticker:
+        """
+        Get the ticker of the line for the contract, or None if
+        there is no line.
+        """
+        _, line = self._find(contract)
+        return line.ticker if line else None
+
+    def isActive(self, contract) -> bool:
+        """
+        Is the line of the contract active (not suspended)?
+        """
+        key, _ = self._find(contract)
+        return key in self._active
+
+    def stats(self) -> LineStats:
+        """
+        Get statistics about the line usage.
+        """
+        lines = list(self._active.values()) + list(self._suspended.values())
+        return LineStats(
+            self.maxLines, len(self._active), len(self._suspended),
+            sum(line.pinned for line in lines),
+            sum(line.refCount for line in lines),
+            self._numShared, self._numRotations)
+
+    def rotate(self):
+        """
+        Give each suspended line a turn by swapping it with the least
+        recently used active line of the same or lower priority.
+        """
+        rotatedIn = set()
+        for key, line in list(self._suspended.items()):
+            if len(self._active) >= self.maxLines:
+                victim = self._victim(line.priority, rotatedIn)
+                if not victim:
+                    continue
+                self._suspend(*victim)
+                self._numRotations += 1
+            self._activate(key, line)
+            rotatedIn.add(key)
+
+    def restore(self):
+        """
+        Request all active lines again, for use after a reconnect.
+        This is done automatically on ``IB.connectedEvent``.
+        """
+        for line in self._active.values():
+            self._request(line)
+
+    def _key(self, contract):
+        return contract.conId if contract.isHashable() else id(contract)
+
+    def _find(self, contract):
+        # key and line (or None) of the contract; an unqualified
+        # contract that is qualified after subscribing is found by its
+        # id, which stays unique as long as its line refers to it
+        for key in (self._key(contract), id(contract)):
+            line = self._active.get(key) or self._suspended.get(key)
+            if line:
+                return key, line
+        return self._key(contract), None
+
+    def _admit(self, key, line, resume=True):
+        if len(self._active) >= self.maxLines:
+            victim = self._victim(line.priority, ())
+            if not victim and not line.pinned:
+                return
+            if victim:
+                self._suspend(*victim)
+            else:
+                self._logger.warning(
+                    f'Pinned line for {line.contract} exceeds the limit '
+                    f'of {self.maxLines} lines')
+        self._activate(key, line, resume)
+
+    def _victim(self, priority, exclude):
+        # least recently used line of the lowest priority
+        victim = None
+        for key, line in self._active.items():
+            if (not line.pinned and line.priority <= priority
+                    and key not in exclude
+                    and (not victim or line.priority < victim[1].priority)):
+                victim = (key, line)
+        return victim
+
+    def _fill(self):
+        while self._suspended and len(self._active) < self.maxLines:
+            key, line = max(
+                self._suspended.items(),
+                key=lambda item: item[1].priority)
+            self._activate(key, line)
+
+    def _activate(self, key, line, resume=True):
+        self._suspended.pop(key, None)
+        self._active[key] = line
+        self._request(line)
+        if resume:
+            self.resumeEvent.emit(line.ticker)
+
+    def _suspend(self, key, line):
+        self._active.pop(key)
+        self._suspended[key] = line
+        if self.ib.isConnected():
+            self.ib.cancelMktData(line.contract)
+        self.suspendEvent.emit(line.ticker)
+
+    def _request(self, line):
+        if not self.ib.isConnected():
+            return
+        # make the line (re)use its own ticker
+        self.ib.wrapper.tickers.setdefault(id(line.contract), line.ticker)
+        self.ib.reqMktData(line.contract, self.genericTickList)
+
+    def _onRotationTimer(self):
+        self.rotate()
+        loop = asyncio.get_event_loop()
+        loop.call_later(self.rotationInterval, self._onRotationTimer)
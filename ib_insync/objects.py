@@ -1,3 +1,7 @@
+import array
+import datetime
+import os
+import struct
 from collections import namedtuple
 
 from .util import UNSET_DOUBLE, UNSET_INTEGER
@@ -18,7 +22,8 @@ __all__ = (
     'MktDepthData DOMLevel BracketOrder TradeLogEntry TagValue '
     'FamilyCode SmartComponent '
     'PortfolioItem Position Fill OptionComputation OptionChain Dividends '
-    'NewsArticle HistoricalNews NewsTick NewsBulletin ConnectionStats'
+    'NewsArticle HistoricalNews NewsTick NewsBulletin ConnectionStats '
+    'LineStats BarDataColumns HistoricalTickColumns'
 ).split()
 
 nan = float('nan')
@@ -402,14 +407,23 @@ class FundamentalRatios(DynamicObject):
 class BarList(list):
     """
     Base class for bar lists.
+
+    A bar list can be bounded with :meth:`setMaxLength` for use in
+    long-running processes. The oldest bars are then evicted from memory,
+    optionally to a spill file on disk, and :meth:`at` and :meth:`atTime`
+    give access to the bars across memory and disk.
     """
     events = ('updateEvent',)
 
-    __slots__ = events + ('__weakref__',)
+    __slots__ = events + (
+        'maxLength', 'numEvicted', '_spill', '__weakref__')
 
     def __init__(self, *args):
         list.__init__(self, *args)
         self.updateEvent = Event('updateEvent')
+        self.maxLength = 0
+        self.numEvicted = 0
+        self._spill = None
 
     def __eq__(self, other):
         return self is other
@@ -417,6 +431,189 @@ class BarList(list):
     def __hash__(self):
         return id(self)
 
+    def setMaxLength(self, maxLength: int, spillPath: str = '') -> 'BarList':
+        """
+        Keep at most ``maxLength`` bars in memory, or set to 0 for no limit.
+        The oldest bars are evicted in batches of an eighth of the length.
+
+        Args:
+            maxLength: Maximum number of bars to keep in memory.
+            spillPath: Directory of the spill file to append the evicted
+                bars to, with one file of doubles per bar field.
+                If not given then the evicted bars are dropped.
+        """
+        self.maxLength = maxLength
+        self._spill = _BarSpill(spillPath, self.numEvicted) \
+            if spillPath else None
+        if maxLength and len(self) > maxLength:
+            self._evict()
+        return self
+
+    def append(self, bar):
+        list.append(self, bar)
+        if self.maxLength and len(self) > self.maxLength:
+            self._evict()
+
+    def numBars(self) -> int:
+        """
+        Number of bars including the evicted ones.
+        """
+        return self.numEvicted + len(self)
+
+    def at(self, index: int):
+        """
+        Get the bar with the given index among all bars including the
+        evicted ones, with negative indices counting from the end.
+        Raises IndexError for evicted bars that were not spilled.
+        """
+        if index < 0:
+            index += self.numBars()
+        if index >= self.numEvicted:
+            return self[index - self.numEvicted]
+        if self._spill is None or not \
+                0 <= index - self._spill.start < len(self._spill):
+            raise IndexError(f'Bar {index} is not available')
+        return self._spill.get(index - self._spill.start)
+
+    def atTime(self, time):
+        """
+        Get the last bar with a time (or date) at or before the given time,
+        including the evicted bars that were spilled. Returns None if there
+        is no such bar.
+        """
+        if self and _barTime(self[0]) <= time:
+            lo, hi = 0, len(self)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if _barTime(self[mid]) <= time:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            return self[lo - 1]
+        elif self._spill is not None:
+            return self._spill.find(time)
+        return None
+
+    def cascade(
+            self, timeframes, sessionStart=datetime.time(), tzinfo=None):
+        """
+        Derive the bars of higher timeframes from these bars,
+        see :class:`.CascadeBars`.
+        """
+        from .ticker import CascadeBars
+        return CascadeBars(self, timeframes, sessionStart, tzinfo)
+
+    def _evict(self):
+        n = max(len(self) - self.maxLength, self.maxLength // 8)
+        if self._spill is not None:
+            self._spill.append(self[:n])
+        del self[:n]
+        self.numEvicted += n
+
+
+def _barTime(bar):
+    # the time or date is the first field of all bar types
+    return getattr(bar, next(iter(bar.defaults)))
+
+
+class _BarSpill:
+    """
+    Append-only columnar spill file of bars, stored as one file
+    of doubles per bar field. The files are only open during an
+    append or read, so that many bounded bar lists don't use up
+    the file descriptors.
+    """
+
+    def __init__(self, path, start):
+        self.path = path
+        self.start = start  # index of the first spilled bar
+        self._len = 0
+        self._cls = None
+        self._fields = None
+        self._kinds = None
+        self._paths = None
+        os.makedirs(path, exist_ok=True)
+
+    def __len__(self):
+        return self._len
+
+    def append(self, bars):
+        if not bars:
+            return
+        if self._cls is None:
+            self._cls = type(bars[0])
+            self._fields = list(self._cls.defaults)
+            self._kinds = [
+                _spillKind(getattr(bars[0], field))
+                for field in self._fields]
+            self._paths = [
+                os.path.join(self.path, field + '.f8')
+                for field in self._fields]
+            for path in self._paths:
+                # truncate what is left of an earlier spill
+                open(path, 'wb').close()
+        for path, field, kind in zip(self._paths, self._fields, self._kinds):
+            with open(path, 'ab') as f:
+                array.array('d', (
+                    _spillEncode(getattr(bar, field), kind)
+                    for bar in bars)).tofile(f)
+        self._len += len(bars)
+
+    def get(self, i):
+        values = []
+        for path, kind in zip(self._paths, self._kinds):
+            with open(path, 'rb') as f:
+                values.append(_spillDecode(self._read(f, i), kind))
+        return self._cls(*values)
+
+    def find(self, time):
+        if not self._len:
+            return None
+        t = _spillEncode(time, self._kinds[0])
+        lo, hi = 0, self._len
+        with open(self._paths[0], 'rb') as f:
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._read(f, mid) <= t:
+                    lo = mid + 1
+                else:
+                    hi = mid
+        return self.get(lo - 1) if lo else None
+
+    @staticmethod
+    def _read(f, i):
+        f.seek(8 * i)
+        return struct.unpack('d', f.read(8))[0]
+
+
+def _spillKind(v):
+    if isinstance(v, datetime.datetime):
+        return 'utc' if v.tzinfo else 'naive'
+    elif isinstance(v, datetime.date):
+        return 'date'
+    return 'int' if isinstance(v, int) else 'float'
+
+
+def _spillEncode(v, kind):
+    if kind == 'utc':
+        return v.timestamp()
+    elif kind == 'naive':
+        return v.replace(tzinfo=datetime.timezone.utc).timestamp()
+    elif kind == 'date':
+        return v.toordinal()
+    return v
+
+
+def _spillDecode(x, kind):
+    if kind == 'utc':
+        return datetime.datetime.fromtimestamp(x, datetime.timezone.utc)
+    elif kind == 'naive':
+        return datetime.datetime.fromtimestamp(
+            x, datetime.timezone.utc).replace(tzinfo=None)
+    elif kind == 'date':
+        return datetime.date.fromordinal(int(x))
+    return int(x) if kind == 'int' else x
+
 
 class BarDataList(BarList):
     """
@@ -433,6 +630,130 @@ class BarDataList(BarList):
         'keepUpToDate', 'chartOptions')
 
 
+class BarDataColumns:
+    """
+    Historical bars in columnar form, with every bar field as a NumPy
+    array, that also stores all request parameters.
+
+    The ``date`` column holds int64 seconds since the epoch. These are
+    UTC for ``formatDate=2`` and otherwise the wall clock time of the
+    TWS login timezone, with dates as midnight. The prices and averages are
+    float64, the volumes and bar counts int64.
+    """
+    columns = (
+        'date', 'open', 'high', 'low', 'close', 'volume',
+        'average', 'barCount')
+
+    __slots__ = columns + (
+        'reqId', 'contract', 'endDateTime', 'durationStr',
+        'barSizeSetting', 'whatToShow', 'useRTH', 'formatDate',
+        'chartOptions', '__weakref__')
+
+    def __init__(self):
+        import numpy as np
+        for col in self.columns:
+            setattr(self, col, np.empty(0, 'f8' if col in (
+                'open', 'high', 'low', 'close', 'average') else 'i8'))
+
+    def __len__(self):
+        return len(self.date)
+
+    def __repr__(self):
+        return f'BarDataColumns(contract={self.contract!r}, ' \
+            f'bars={len(self)})'
+
+    __str__ = __repr__
+
+    def df(self):
+        """
+        Create pandas DataFrame that shares the arrays of the columns,
+        with the date column as datetime64.
+        """
+        import pandas as pd
+        data = {col: getattr(self, col) for col in self.columns}
+        data['date'] = self.date.view('datetime64[s]')
+        return pd.DataFrame(data, copy=False)
+
+
+class HistoricalTickColumns:
+    """
+    Historical ticks in columnar form, with every tick field as a NumPy
+    array that is accessed by name, such as ``ticks['price']``.
+
+    The ``time`` column holds int64 UTC seconds since the epoch.
+    The other columns depend on ``whatToShow``:
+
+    * 'MIDPOINT': price, size;
+    * 'BID_ASK': mask, priceBid, priceAsk, sizeBid, sizeAsk;
+    * 'TRADES': mask, price, size, exchange, specialConditions.
+
+    The mask holds the bits of the tick attributes, with
+    askPastHigh=1, bidPastLow=2 for bid/ask ticks and
+    pastLimit=1, unreported=2 for trade ticks.
+    """
+    layouts = {
+        'MIDPOINT': ('time', '', 'price', 'size'),
+        'BID_ASK': (
+            'time', 'mask', 'priceBid', 'priceAsk', 'sizeBid', 'sizeAsk'),
+        'TRADES': (
+            'time', 'mask', 'price', 'size', 'exchange',
+            'specialConditions')}
+
+    dtypes = dict(
+        time='i8', mask='i8', price='f8', size='i8',
+        priceBid='f8', priceAsk='f8', sizeBid='i8', sizeAsk='i8',
+        exchange=None, specialConditions=None)
+
+    __slots__ = ('reqId', 'contract', 'whatToShow', 'data', '__weakref__')
+
+    def __init__(self, whatToShow='TRADES'):
+        import numpy as np
+        self.whatToShow = whatToShow.upper()
+        self.data = {
+            col: np.empty(0, self.dtypes[col] or 'U')
+            for col in self.layouts[self.whatToShow] if col}
+
+    def __getitem__(self, col):
+        return self.data[col]
+
+    def __len__(self):
+        return len(self.data['time'])
+
+    def __repr__(self):
+        return f'HistoricalTickColumns(contract={self.contract!r}, ' \
+            f'whatToShow={self.whatToShow!r}, ticks={len(self)})'
+
+    __str__ = __repr__
+
+    def columns(self):
+        """
+        Names of the columns.
+        """
+        return list(self.data)
+
+    def slice(self, start=None, stop=None) -> 'HistoricalTickColumns':
+        """
+        Get the ticks from index ``start`` up to ``stop`` as views.
+        """
+        ticks = HistoricalTickColumns.__new__(HistoricalTickColumns)
+        ticks.reqId = self.reqId
+        ticks.contract = self.contract
+        ticks.whatToShow = self.whatToShow
+        ticks.data = {
+            col: arr[start:stop] for col, arr in self.data.items()}
+        return ticks
+
+    def df(self):
+        """
+        Create pandas DataFrame that shares the arrays of the columns,
+        with the time column as datetime64.
+        """
+        import pandas as pd
+        data = dict(self.data)
+        data['time'] = data['time'].view('datetime64[s]')
+        return pd.DataFrame(data, copy=False)
+
+
 class RealTimeBarList(BarList):
     """
     List of :class:`.RealTimeBar` that also stores all request parameters.
@@ -583,3 +904,8 @@ SmartComponent = namedtuple(
 ConnectionStats = namedtuple(
     'ConnectionStats',
     'startTime duration numBytesRecv numBytesSent numMsgRecv numMsgSent')
+
+LineStats = namedtuple(
+    'LineStats',
+    'maxLines numActive numSuspended numPinned numSubscriptions '
+    'numShared numRotations')
@@ -0,0 +1,315 @@
+import asyncio
+import json
+import logging
+import os
+from typing import List, Tuple
+
+from eventkit import Event
+
+import ib_insync.util as util
+from ib_insync.contract import Contract, FuturesOption, Option
+from ib_insync.objects import OptionChain
+from ib_insync.ticker import Ticker
+
+__all__ = ['OptionChainLoader', 'OptionChainTable']
+
+nan = float('nan')
+
+
+class OptionChainTable:
+    """
+    Columnar table of an option chain with one row per option,
+    sorted by expiry, right and strike.
+
+    The columns are NumPy arrays in ``data``, or by name as
+    ``table['strike']``:
+
+    * ``conId``, ``expiry`` (as datetime64[D]), ``strike``, ``right``;
+    * The quote columns ``bid``, ``ask``, ``bidSize``, ``askSize``,
+      ``last`` and ``close``;
+    * The greeks columns ``impliedVol``, ``delta``, ``optPrice``,
+      ``pvDividend``, ``gamma``, ``vega``, ``theta`` and ``undPrice``
+      from the model greeks of the tickers.
+
+    The rows of updated tickers are refreshed by :meth:`update`, which
+    then emits the ``updateEvent`` (table, rows) with the array of
+    refreshed row indices.
+
+    Requires NumPy.
+
+    Args:
+        contracts: The qualified option contracts.
+    """
+
+    events = ('updateEvent',)
+
+    quoteColumns = ('bid', 'ask', 'bidSize', 'askSize', 'last', 'close')
+    # in the order of OptionComputation
+    greeksColumns = (
+        'impliedVol', 'delta', 'optPrice', 'pvDividend', 'gamma', 'vega',
+        'theta', 'undPrice')
+    _noGreeks = (nan,) * len(greeksColumns)
+
+    def __init__(self, contracts: List[Contract]):
+        import numpy as np
+        self.contracts = sorted(contracts, key=lambda c: (
+            c.lastTradeDateOrContractMonth, c.right, c.strike))
+        self.tickers: List[Ticker] = [None] * len(self.contracts)
+        self._rows = {c.conId: i for i, c in enumerate(self.contracts)}
+        expiries = [c.lastTradeDateOrContractMonth for c in self.contracts]
+        self.data = {
+            'conId': np.array([c.conId for c in self.contracts], 'i8'),
+            'expiry': np.array(
+                [f'{e[:4]}-{e[4:6]}-{e[6:8]}' for e in expiries],
+                'datetime64[D]'),
+            'strike': np.array([c.strike for c in self.contracts], 'f8'),
+            'right': np.array(
+                [c.right[:1] for c in self.contracts], 'U1')}
+        for col in self.quoteColumns + self.greeksColumns:
+            self.data[col] = np.full(len(self.contracts), nan)
+        self.updateEvent = Event('updateEvent')
+
+    def __len__(self):
+        return len(self.contracts)
+
+    def __getitem__(self, column):
+        return self.data[column]
+
+    def __repr__(self):
+        return f'OptionChainTable(<{len(self)} options>)'
+
+    def row(self, contract: Contract) -> int:
+        """
+        Row index of the contract, or None if not in the table.
+        """
+        return self._rows.get(contract.conId)
+
+    def update(self, tickers: List[Ticker]):
+        """
+        Refresh the rows of the given tickers. Tickers of other contracts
+        are ignored, so that this can be connected directly to
+        ``ib.pendingTickersEvent``.
+        """
+        import numpy as np
+        rows = []
+        values = []
+        for ticker in tickers:
+            i = self._rows.get(ticker.contract.conId)
+            if i is None:
+                continue
+            self.tickers[i] = ticker
+            rows.append(i)
+            greeks = ticker.modelGreeks
+            values.append(
+                [getattr(ticker, col) for col in self.quoteColumns]
+                + list(greeks or self._noGreeks))
+        if not rows:
+            return
+        rows = np.array(rows)
+        # None values become NaN
+        matrix = np.array(values, 'f8')
+        for k, col in enumerate(self.quoteColumns + self.greeksColumns):
+            self.data[col][rows] = matrix[:, k]
+        self.updateEvent.emit(self, rows)
+
+    def df(self):
+        """
+        The table as a pandas DataFrame.
+        """
+        import pandas as pd
+        return pd.DataFrame(self.data)
+
+
+class OptionChainLoader:
+    """
+    Load option chains in bulk into a columnar :class:`OptionChainTable`.
+
+    * The expiries and trading classes are discovered with one
+      ``reqSecDefOptParams`` request;
+    * The options are qualified with one ``reqContractDetails`` request
+      per expiry and trading class, instead of one per option, and the
+      qualified contracts are cached in memory and optionally on disk;
+    * The market data is loaded with windowed snapshots, or streamed
+      with one line per option and refreshed as the ticks (including
+      ``tickOptionComputation``) arrive.
+
+    Usage::
+
+        loader = OptionChainLoader(ib)
+        table = loader.load(spx, strikeRange=(3000, 3500))
+        loader.stream(table)
+
+    Args:
+        ib: The :class:`.IB` instance to load with.
+        maxConcurrent: Maximum number of contract details requests
+            in flight.
+        path: JSON file to persist the qualified contracts in,
+            or '' for an in-memory cache only.
+    """
+
+    def __init__(self, ib, maxConcurrent: int = 10, path: str = ''):
+        self.ib = ib
+        self.path = path
+        self._semaphore = asyncio.Semaphore(maxConcurrent)
+        # (underlying conId, exchange, tradingClass, expiry) -> contracts
+        self._contracts = {}
+        self._lineManagers = {}  # id(table) -> LineManager or None
+        self._logger = logging.getLogger('ib_insync.optionchain')
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for key, dicts in json.load(f).items():
+                    conId, exchange, tradingClass, expiry = key.split('|')
+                    self._contracts[int(conId), exchange, tradingClass,
+                                    expiry] = [
+                        Contract.create(**d) for d in dicts]
+
+    def load(
+            self, underlying: Contract, exchange: str = 'SMART',
+            tradingClass: str = '', expirations: List[str] = None,
+            strikeRange: Tuple[float, float] = None, rights: str = 'CP',
+            snapshot: bool = True, windowSize: int = 50
+    ) -> OptionChainTable:
+        """
+        Load the option chain of the underlying.
+
+        This method is blocking.
+
+        Args:
+            underlying: Qualified underlying contract.
+            exchange: Exchange of the options.
+            tradingClass: Trading class of the options,
+                or '' for all trading classes on the exchange.
+            expirations: Expiries as 'YYYYMMDD' to load,
+                or None for all.
+            strikeRange: (low, high) range of strikes to load,
+                or None for all.
+            rights: The rights to load, 'C', 'P' or 'CP'.
+            snapshot: If True then fill the table with snapshots,
+                otherwise only the contracts are loaded.
+            windowSize: Maximum number of concurrent snapshots.
+        """
+        return util.run(self.loadAsync(
+            underlying, exchange, tradingClass, expirations, strikeRange,
+            rights, snapshot, windowSize))
+
+    async def loadAsync(
+            self, underlying, exchange='SMART', tradingClass='',
+            expirations=None, strikeRange=None, rights='CP',
+            snapshot=True, windowSize=50):
+        chains = await self.reqChainsAsync(underlying, exchange, tradingClass)
+        contracts = await self.qualifyAsync(underlying, chains, expirations)
+        contracts = [
+            c for c in contracts if c.right[:1] in rights and (
+                not strikeRange
+                or strikeRange[0] <= c.strike <= strikeRange[1])]
+        table = OptionChainTable(contracts)
+        self._logger.info(
+            f'Loaded {len(table)} options of {len(chains)} chains '
+            f'for {underlying.symbol}')
+        if snapshot:
+            async for ticker in self.ib.streamTickersAsync(
+                    *table.contracts, windowSize=windowSize):
+                table.update([ticker])
+        return table
+
+    async def reqChainsAsync(
+            self, underlying, exchange='SMART',
+            tradingClass='') -> List[OptionChain]:
+        """
+        Get the option chains of the underlying on the exchange, with
+        one chain per trading class.
+        """
+        futFopExchange = underlying.exchange \
+            if underlying.secType == 'FUT' else ''
+        chains = await self.ib.reqSecDefOptParamsAsync(
+            underlying.symbol, futFopExchange, underlying.secType,
+            underlying.conId)
+        return [
+            chain for chain in chains if chain.exchange == exchange
+            and (not tradingClass or chain.tradingClass == tradingClass)]
+
+    async def qualifyAsync(
+            self, underlying, chains, expirations=None) -> List[Contract]:
+        """
+        Get the qualified contracts of all strikes and rights of the
+        given chains and expiries, using the cache where possible.
+        """
+        keys = [
+            (underlying.conId, chain.exchange, chain.tradingClass, expiry,
+                chain.multiplier)
+            for chain in chains for expiry in sorted(chain.expirations)
+            if expirations is None or expiry in expirations]
+        missing = [key for key in keys if key[:4] not in self._contracts]
+        results = await asyncio.gather(*(
+            self._qualifyExpiry(underlying, *key) for key in missing))
+        for key, contracts in zip(missing, results):
+            if contracts:
+                self._contracts[key[:4]] = contracts
+        if self.path and any(results):
+            self._save()
+        return [c for key in keys for c in self._contracts.get(key[:4], [])]
+
+    async def _qualifyExpiry(
+            self, underlying, conId, exchange, tradingClass, expiry,
+            multiplier):
+        cls = FuturesOption if underlying.secType == 'FUT' else Option
+        template = cls(
+            underlying.symbol, expiry, exchange=exchange,
+            multiplier=multiplier, currency=underlying.currency,
+            tradingClass=tradingClass)
+        async with self._semaphore:
+            detailsList = await self.ib.reqContractDetailsAsync(template)
+        contracts = []
+        for details in detailsList or []:
+            c = details.contract
+            # remove the time and timezone part of the expiry
+            c.lastTradeDateOrContractMonth = \
+                c.lastTradeDateOrContractMonth.split()[0]
+            c.exchange = exchange
+            contracts.append(c)
+        if not contracts:
+            self._logger.error(
+                f'No options for {underlying.symbol} {tradingClass} '
+                f'{expiry} on {exchange}')
+        return contracts
+
+    def stream(
+            self, table: OptionChainTable, genericTickList: str = '',
+            lineManager=None):
+        """
+        Subscribe to streaming market data for all options of the table,
+        refreshing the rows of the changed tickers on every update.
+
+        Args:
+            table: Table to stream.
+            genericTickList: See :meth:`.IB.reqMktData`.
+            lineManager: Optional :class:`.LineManager` to subscribe with,
+                to stay within the line limit.
+        """
+        for i, contract in enumerate(table.contracts):
+            table.tickers[i] = lineManager.subscribe(contract) \
+                if lineManager else self.ib.reqMktData(
+                    contract, genericTickList)
+        self._lineManagers[id(table)] = lineManager
+        self.ib.pendingTickersEvent += table.update
+
+    def cancel(self, table: OptionChainTable):
+        """
+        Stop streaming the table.
+        """
+        self.ib.pendingTickersEvent -= table.update
+        lineManager = self._lineManagers.pop(id(table), None)
+        for contract in table.contracts:
+            if lineManager:
+                lineManager.unsubscribe(contract)
+            else:
+                self.ib.cancelMktData(contract)
+
+    def _save(self):
+        data = {
+            '|'.join(str(k) for k in key): [c.dict() for c in contracts]
+            for key, contracts in self._contracts.items()}
+        tmpName = self.path + '.tmp'
+        with open(tmpName, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmpName, self.path)
@@ -0,0 +1,297 @@
+import datetime
+import math
+import weakref
+from typing import List, Union
+
+from ib_insync.objects import OptionComputation
+from ib_insync.ticker import Ticker
+
+__all__ = ['OptionModel']
+
+nan = float('nan')
+
+
+class OptionModel:
+    """
+    Local, vectorized option pricing with the Black-Scholes-Merton
+    model for options on spot, or the Black-76 model for options on
+    futures. Prices, greeks and implied volatilities of a whole chain
+    are computed in one call on NumPy arrays, without a round trip to
+    the gateway for every option.
+
+    All methods broadcast their arguments, where ``und`` is the price of
+    the underlying (spot or futures), ``strike`` the strike, ``t`` the
+    time to expiry in years, ``vol`` the volatility and ``isCall``
+    True for calls and False for puts (or an array of 'C'/'P' rights).
+
+    The greeks follow the conventions of IB: vega is per volatility
+    point (0.01) and theta is per calendar day.
+
+    Uses SciPy for the normal distribution if available.
+    Requires NumPy.
+
+    Args:
+        rate: Continuously compounded risk-free rate.
+        dividendYield: Continuous dividend yield, for the
+            Black-Scholes-Merton model.
+        black76: If True then use Black-76 with ``und`` as the
+            futures price, otherwise Black-Scholes-Merton with ``und``
+            as the spot price.
+    """
+
+    def __init__(
+            self, rate: float = 0.0, dividendYield: float = 0.0,
+            black76: bool = False):
+        self.rate = rate
+        self.dividendYield = dividendYield
+        self.black76 = black76
+        # ticker -> the model greeks that were computed for it here
+        self._computed = weakref.WeakKeyDictionary()
+
+    def price(self, und, strike, t, vol, isCall):
+        """
+        Option prices.
+        """
+        return self._compute(und, strike, t, vol, isCall, False)[0]
+
+    def greeks(self, und, strike, t, vol, isCall) -> dict:
+        """
+        Option prices and greeks, as a dict of arrays with keys
+        ``price``, ``delta``, ``gamma``, ``vega``, ``theta`` and
+        ``pvDividend``.
+        """
+        price, delta, gamma, vega, theta, pvDividend = self._compute(
+            und, strike, t, vol, isCall, True)
+        return dict(
+            price=price, delta=delta, gamma=gamma, vega=vega,
+            theta=theta, pvDividend=pvDividend)
+
+    def impliedVol(
+            self, price, und, strike, t, isCall,
+            tol: float = 1e-8, maxIter: int = 100):
+        """
+        Implied volatilities of the given option prices.
+
+        Newton's method is safeguarded by a bisection bracket, so that
+        every option converges; the iterations run on the options that
+        have not converged yet. Prices outside of the no-arbitrage
+        bounds give NaN.
+
+        Args:
+            price: Option prices.
+            tol: Tolerance in price.
+            maxIter: Maximum number of iterations.
+        """
+        import numpy as np
+        price, und, strike, t, isCall = np.broadcast_arrays(
+            np.asarray(price, 'f8'), np.asarray(und, 'f8'),
+            np.asarray(strike, 'f8'), np.asarray(t, 'f8'), _isCall(isCall))
+        q = self.rate if self.black76 else self.dividendYield
+        dfUnd = und * np.exp(-q * t)
+        dfStrike = strike * np.exp(-self.rate * t)
+        lower = np.where(
+            isCall, np.maximum(dfUnd - dfStrike, 0),
+            np.maximum(dfStrike - dfUnd, 0))
+        upper = np.where(isCall, dfUnd, dfStrike)
+        vol = np.full(price.shape, nan)
+        active = np.flatnonzero(
+            (price > lower) & (price < upper) & (t > 0))
+        if not len(active):
+            return vol
+        p, u, k, tt, c = (
+            a[active] for a in (price, und, strike, t, isCall))
+        lo = np.full(len(active), 1e-6)
+        hi = np.full(len(active), 10.0)
+        # Brenner-Subrahmanyam guess, valid near the money
+        sigma = np.clip(
+            np.sqrt(2 * np.pi / tt) * p / dfUnd[active], 0.01, 3.0)
+        for _ in range(maxIter):
+            model, _, _, vega, _, _ = self._compute(
+                u, k, tt, sigma, c, True)
+            diff = model - p
+            done = np.abs(diff) < tol
+            vol[active[done]] = sigma[done]
+            keep = ~done
+            if not keep.any():
+                break
+            active, p, u, k, tt, c, sigma, diff, vega, lo, hi = (
+                a[keep] for a in (
+                    active, p, u, k, tt, c, sigma, diff, vega, lo, hi))
+            hi = np.where(diff > 0, sigma, hi)
+            lo = np.where(diff > 0, lo, sigma)
+            with np.errstate(all='ignore'):
+                # vega is per volatility point
+                newton = sigma - diff / (vega * 100)
+            sigma = np.where(
+                (newton > lo) & (newton < hi), newton, (lo + hi) / 2)
+        else:
+            vol[active] = sigma
+        return vol
+
+    def updateTickers(
+            self, tickers: List[Ticker], undPrice: Union[float, Ticker],
+            now: datetime.datetime = None,
+            overwrite: bool = False) -> List[Ticker]:
+        """
+        Compute the model greeks of option tickers locally from their
+        midpoint and store them as ``ticker.modelGreeks``, for the
+        options that IB does not stream greeks for.
+
+        Args:
+            tickers: Option tickers.
+            undPrice: Price of the underlying, or the ticker of the
+                underlying to take the market price of.
+            now: Time to measure the time to expiry from,
+                or None for now.
+            overwrite: If True then also replace the model greeks
+                from IB, otherwise only fill in missing greeks and
+                refresh the greeks that were computed by this model.
+
+        Returns:
+            The updated tickers.
+
+        Raises ValueError if the underlying price is not available.
+        """
+        import numpy as np
+        if isinstance(undPrice, Ticker):
+            undPrice = undPrice.marketPrice()
+        if math.isnan(undPrice):
+            raise ValueError('No price of the underlying')
+        computed = self._computed
+        tickers = [
+            t for t in tickers
+            if overwrite or t.modelGreeks is None
+            or computed.get(t) is t.modelGreeks]
+        if not tickers:
+            return []
+        contracts = [t.contract for t in tickers]
+        und = np.full(len(tickers), undPrice, 'f8')
+        strike = np.array([c.strike for c in contracts], 'f8')
+        isCall = np.array([c.right[:1] == 'C' for c in contracts])
+        tte = self.timeToExpiry(
+            [c.lastTradeDateOrContractMonth for c in contracts], now)
+        mid = np.array([t.midpoint() for t in tickers], 'f8')
+        vol = self.impliedVol(mid, und, strike, tte, isCall)
+        g = self.greeks(und, strike, tte, vol, isCall)
+        for ticker, *values in zip(tickers, *(a.tolist() for a in (
+                vol, g['delta'], g['price'], g['pvDividend'], g['gamma'],
+                g['vega'], g['theta'], und))):
+            ticker.modelGreeks = computed[ticker] = OptionComputation(*values)
+        return tickers
+
+    def updateTable(
+            self, table, undPrice: float, rows=None,
+            now: datetime.datetime = None):
+        """
+        Compute the implied volatilities and greeks of the rows of an
+        :class:`.OptionChainTable` from the quote midpoints. Can be
+        connected to the ``updateEvent`` of the table to follow its
+        refreshes.
+
+        Args:
+            table: The option chain table.
+            undPrice: Price of the underlying.
+            rows: Indices of the rows to update, or None for all rows.
+            now: Time to measure the time to expiry from,
+                or None for now.
+        """
+        import numpy as np
+        data = table.data
+        if rows is None:
+            rows = np.arange(len(table))
+        strike = data['strike'][rows]
+        isCall = data['right'][rows] == 'C'
+        t = self.timeToExpiry(data['expiry'][rows], now)
+        mid = (data['bid'][rows] + data['ask'][rows]) / 2
+        vol = self.impliedVol(mid, undPrice, strike, t, isCall)
+        g = self.greeks(undPrice, strike, t, vol, isCall)
+        data['impliedVol'][rows] = vol
+        data['optPrice'][rows] = g['price']
+        for col in ('delta', 'gamma', 'vega', 'theta', 'pvDividend'):
+            data[col][rows] = g[col]
+        data['undPrice'][rows] = undPrice
+
+    @staticmethod
+    def timeToExpiry(expiries, now: datetime.datetime = None):
+        """
+        Time to expiry in years of the given expiries, as
+        'YYYYMMDD' strings or datetime64 dates. The moment of expiry
+        is taken as 21:00 UTC of the expiry date (the close in New York
+        during standard time).
+
+        Args:
+            expiries: The expiries.
+            now: Time to measure from, or None for now.
+        """
+        import numpy as np
+        expiries = np.asarray(expiries)
+        if expiries.dtype.kind in 'US':
+            expiries = np.array(
+                [f'{e[:4]}-{e[4:6]}-{e[6:8]}' for e in expiries.tolist()],
+                'datetime64[D]')
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        if now.tzinfo:
+            now = now.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        secs = (
+            expiries.astype('datetime64[s]') + np.timedelta64(21, 'h')
+            - np.datetime64(now, 's')).astype('f8')
+        return np.maximum(secs, 0) / (365 * 86400)
+
+    def _compute(self, und, strike, t, vol, isCall, withGreeks):
+        import numpy as np
+        und, strike, t, vol, isCall = np.broadcast_arrays(
+            np.asarray(und, 'f8'), np.asarray(strike, 'f8'),
+            np.asarray(t, 'f8'), np.asarray(vol, 'f8'), _isCall(isCall))
+        r = self.rate
+        # Black-76 is Black-Scholes-Merton with the carry equal to the rate
+        q = r if self.black76 else self.dividendYield
+        dq = np.exp(-q * t)
+        dr = np.exp(-r * t)
+        sqrtT = np.sqrt(t)
+        volT = vol * sqrtT
+        with np.errstate(divide='ignore', invalid='ignore'):
+            d1 = (np.log(und / strike) + (r - q) * t) / volT + volT / 2
+        d2 = d1 - volT
+        sign = np.where(isCall, 1.0, -1.0)
+        nd1 = _normCdf(sign * d1)
+        nd2 = _normCdf(sign * d2)
+        price = sign * (und * dq * nd1 - strike * dr * nd2)
+        if not withGreeks:
+            return price, None, None, None, None, None
+        pdf = np.exp(-d1 * d1 / 2) / math.sqrt(2 * math.pi)
+        delta = sign * dq * nd1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            gamma = dq * pdf / (und * volT)
+        vega = und * dq * pdf * sqrtT / 100
+        with np.errstate(divide='ignore', invalid='ignore'):
+            theta = (
+                -und * dq * pdf * vol / (2 * sqrtT)
+                - sign * r * strike * dr * nd2
+                + sign * q * und * dq * nd1) / 365
+        pvDividend = np.zeros_like(und) if self.black76 else und * (1 - dq)
+        return price, delta, gamma, vega, theta, pvDividend
+
+
+def _isCall(isCall):
+    import numpy as np
+    isCall = np.asarray(isCall)
+    if isCall.dtype.kind in 'US':
+        isCall = np.char.startswith(isCall.astype('U'), 'C')
+    return isCall.astype(bool)
+
+
+def _normCdf(x):
+    global _ndtr
+    if _ndtr is None:
+        try:
+            from scipy.special import ndtr as _ndtr
+        except ImportError:
+            import numpy as np
+            erfc = np.frompyfunc(math.erfc, 1, 1)
+
+            def _ndtr(x):
+                return 0.5 * np.asarray(erfc(-x / math.sqrt(2)), 'f8')
+    return _ndtr(x)
+
+
+_ndtr = None
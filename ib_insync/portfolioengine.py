@@ -0,0 +1,247 @@
+import logging
+from collections import namedtuple
+from typing import Dict
+
+from eventkit import Event
+
+from ib_insync.contract import Contract
+from ib_insync.objects import Position
+
+__all__ = ['PortfolioEngine', 'RiskSummary']
+
+nan = float('nan')
+
+RiskSummary = namedtuple(
+    'RiskSummary',
+    'marketValue unrealizedPnL dailyPnL delta vega')
+
+
+class PortfolioEngine:
+    """
+    Local real-time PnL and greeks of all positions, as an alternative
+    to a ``reqPnLSingle`` subscription per position.
+
+    The positions of :meth:`.IB.positions` are kept in NumPy arrays
+    and marked with the prices of their tickers. On every
+    ``pendingTickersEvent`` only the rows of the changed tickers are
+    re-marked, after which the PnL, delta and vega of all positions and
+    their totals per account and per strategy are recomputed in a few
+    vectorized operations. Position changes are followed through the
+    ``positionEvent``.
+
+    * The unrealized PnL is relative to the average cost and the daily
+      PnL relative to the close of the previous day, which ignores the
+      trades of today;
+    * Delta and vega are in units of the underlying (the greek times
+      the position times the multiplier), with a delta of one for
+      positions that are not options. The greeks of options are taken
+      from ``ticker.modelGreeks``, which can be filled in locally by
+      :meth:`.OptionModel.updateTickers`.
+
+    The ``updateEvent`` (engine) is emitted after every recomputation.
+
+    Requires NumPy.
+
+    Args:
+        ib: The :class:`.IB` instance with the positions.
+        lineManager: Optional :class:`.LineManager` to subscribe to the
+            market data with, otherwise :meth:`.IB.reqMktData` is used.
+    """
+
+    events = ('updateEvent',)
+
+    def __init__(self, ib, lineManager=None):
+        self.ib = ib
+        self.lineManager = lineManager
+        self.updateEvent = Event('updateEvent')
+        self.positions = []
+        self.accounts = []
+        self.strategies = ['']
+        self._strategyOf = {}  # conId -> strategy name
+        self._tickers = {}  # conId -> ticker
+        self._rows = {}  # conId -> list of row indices
+        self._arrays = {}
+        self._logger = logging.getLogger('ib_insync.portfolioengine')
+
+    def __getitem__(self, column):
+        return self._arrays[column]
+
+    def start(self):
+        """
+        Load the current positions, subscribe to their market data and
+        start following the updates.
+        """
+        self._rebuild()
+        self.ib.positionEvent += self._onPosition
+        self.ib.pendingTickersEvent += self._onPendingTickers
+
+    def stop(self):
+        """
+        Stop following the updates and cancel the market data.
+        """
+        self.ib.positionEvent -= self._onPosition
+        self.ib.pendingTickersEvent -= self._onPendingTickers
+        for conId in list(self._tickers):
+            self._unsubscribe(conId)
+
+    def setStrategy(self, contract: Contract, strategy: str):
+        """
+        Assign the positions of the contract to the named strategy.
+        Positions without a strategy belong to the strategy ''.
+        """
+        self._strategyOf[contract.conId] = strategy
+        if strategy not in self.strategies:
+            self.strategies.append(strategy)
+        if self._arrays:
+            self._arrays['strategy'][self._rows.get(contract.conId, [])] = \
+                self.strategies.index(strategy)
+            self._recompute()
+
+    def total(self) -> RiskSummary:
+        """
+        Totals of all positions.
+        """
+        a = self._arrays
+        if not self.positions:
+            return RiskSummary(0.0, 0.0, 0.0, 0.0, 0.0)
+        return RiskSummary(*(
+            float(a[col].sum()) for col in RiskSummary._fields))
+
+    def byAccount(self) -> Dict[str, RiskSummary]:
+        """
+        Totals per account.
+        """
+        return self._groupBy('account', self.accounts)
+
+    def byStrategy(self) -> Dict[str, RiskSummary]:
+        """
+        Totals per strategy.
+        """
+        return self._groupBy('strategy', self.strategies)
+
+    def _groupBy(self, column, names):
+        import numpy as np
+        if not self.positions:
+            return {}
+        a = self._arrays
+        sums = [
+            np.bincount(a[column], a[col], len(names)).tolist()
+            for col in RiskSummary._fields]
+        used = set(a[column].tolist())
+        return {
+            names[i]: RiskSummary(*values)
+            for i, values in enumerate(zip(*sums)) if i in used}
+
+    def _rebuild(self):
+        import numpy as np
+        self.positions = self.ib.positions()
+        self.accounts = sorted({p.account for p in self.positions})
+        self._rows = {}
+        for i, p in enumerate(self.positions):
+            self._rows.setdefault(p.contract.conId, []).append(i)
+        for p in self.positions:
+            conId = p.contract.conId
+            strategy = self._strategyOf.get(conId, '')
+            if strategy not in self.strategies:
+                self.strategies.append(strategy)
+            if conId not in self._tickers:
+                self._subscribe(p.contract)
+        for conId in list(self._tickers):
+            if conId not in self._rows:
+                self._unsubscribe(conId)
+
+        multipliers = [
+            float(p.contract.multiplier or 1) for p in self.positions]
+        n = len(self.positions)
+        a = self._arrays = {
+            'account': np.array(
+                [self.accounts.index(p.account) for p in self.positions],
+                'i8'),
+            'strategy': np.array([
+                self.strategies.index(
+                    self._strategyOf.get(p.contract.conId, ''))
+                for p in self.positions], 'i8'),
+            'isOption': np.array([
+                p.contract.secType in ('OPT', 'FOP')
+                for p in self.positions], bool),
+            'position': np.array(
+                [p.position for p in self.positions], 'f8'),
+            'multiplier': np.array(multipliers, 'f8'),
+            'avgPrice': np.array([
+                p.avgCost / m for p, m in zip(self.positions, multipliers)],
+                'f8'),
+            'mark': np.full(n, nan),
+            'close': np.full(n, nan),
+            'greekDelta': np.ones(n),
+            'greekVega': np.zeros(n)}
+        a['greekDelta'][a['isOption']] = nan
+        a['greekVega'][a['isOption']] = nan
+        self._mark([t for t in self._tickers.values() if t is not None])
+        self._recompute()
+
+    def _subscribe(self, contract):
+        contract = Contract.create(**contract.dict())
+        if not contract.exchange:
+            contract.exchange = contract.primaryExchange or 'SMART'
+        self._tickers[contract.conId] = \
+            self.lineManager.subscribe(contract) if self.lineManager \
+            else self.ib.reqMktData(contract)
+
+    def _unsubscribe(self, conId):
+        ticker = self._tickers.pop(conId)
+        if self.lineManager:
+            self.lineManager.unsubscribe(ticker.contract)
+        elif self.ib.isConnected():
+            self.ib.cancelMktData(ticker.contract)
+
+    def _mark(self, tickers):
+        # write the prices and greeks of the tickers into their rows
+        import numpy as np
+        rows = []
+        values = []
+        for ticker in tickers:
+            for i in self._rows.get(ticker.contract.conId, ()):
+                greeks = ticker.modelGreeks
+                rows.append(i)
+                values.append((
+                    ticker.marketPrice(), ticker.close,
+                    greeks.delta if greeks else nan,
+                    greeks.vega if greeks else nan))
+        if not rows:
+            return False
+        a = self._arrays
+        matrix = np.array(values, 'f8')
+        a['mark'][rows] = matrix[:, 0]
+        a['close'][rows] = matrix[:, 1]
+        options = np.array(rows)[a['isOption'][rows]]
+        if len(options):
+            optionValues = matrix[a['isOption'][rows]]
+            a['greekDelta'][options] = optionValues[:, 2]
+            a['greekVega'][options] = optionValues[:, 3]
+        return True
+
+    def _recompute(self):
+        import numpy as np
+        a = self._arrays
+        if not a:
+            return
+        size = a['position'] * a['multiplier']
+        # NaN marks contribute nothing until a price is known
+        mark = np.nan_to_num(a['mark'])
+        known = ~np.isnan(a['mark'])
+        a['marketValue'] = mark * size
+        a['unrealizedPnL'] = np.where(
+            known, (mark - a['avgPrice']) * size, 0.0)
+        a['dailyPnL'] = np.where(
+            known & ~np.isnan(a['close']),
+            (mark - np.nan_to_num(a['close'])) * size, 0.0)
+        a['delta'] = np.nan_to_num(a['greekDelta']) * size
+        a['vega'] = np.nan_to_num(a['greekVega']) * size
+        self.updateEvent.emit(self)
+
+    def _onPosition(self, position: Position):
+        self._rebuild()
+
+    def _onPendingTickers(self, tickers):
+        if self._arrays and self._mark(tickers):
+            self._recompute()
@@ -1,11 +1,18 @@
+import abc
+import datetime
+from array import array
+from typing import Union
+
 from eventkit import Event, Op
 
 from ib_insync.objects import Object, BarList
-from ib_insync.util import isNan
+from ib_insync.timerwheel import timerWheel
+from ib_insync.util import barTuple, isNan
 
 __all__ = ['Ticker']
 
 nan = float('nan')
+inf = float('inf')
 
 
 class Ticker(Object):
@@ -142,63 +149,83 @@ class Ticker(Object):
 class TickerUpdateEvent(Event):
     __slots__ = ()
 
-    def trades(self) -> "Tickfilter":
+    def trades(self, batched: bool = False) -> "Tickfilter":
         """
         Emit trade ticks.
         """
-        return Tickfilter((4, 5, 48, 68, 71), self)
+        return Tickfilter((4, 5, 48, 68, 71), self, batched)
 
-    def bids(self) -> "Tickfilter":
+    def bids(self, batched: bool = False) -> "Tickfilter":
         """
         Emit bid ticks.
         """
-        return Tickfilter((0, 1, 66, 69), self)
+        return Tickfilter((0, 1, 66, 69), self, batched)
 
-    def asks(self) -> "Tickfilter":
+    def asks(self, batched: bool = False) -> "Tickfilter":
         """
         Emit ask ticks.
         """
-        return Tickfilter((2, 3, 67, 70), self)
+        return Tickfilter((2, 3, 67, 70), self, batched)
 
-    def bidasks(self) -> "Tickfilter":
+    def bidasks(self, batched: bool = False) -> "Tickfilter":
         """
         Emit bid and ask ticks.
         """
-        return Tickfilter((0, 1, 66, 69, 2, 3, 67, 70), self)
+        return Tickfilter((0, 1, 66, 69, 2, 3, 67, 70), self, batched)
 
-    def midpoints(self) -> "Tickfilter":
+    def midpoints(self, batched: bool = False) -> "Tickfilter":
         """
         Emit midpoint ticks.
         """
-        return Midpoints((), self)
+        return Midpoints((), self, batched)
 
 
 class Tickfilter(Op):
     """
     Tick filtering event operators that ``emit(time, price, size)``.
+
+    A batched filter instead emits the ticks of one ticker update as
+    one chunk ``emit(times, prices, sizes)``, with a list of times and
+    ``array('d')`` prices and sizes. The bar aggregators and the
+    indicators accept chunks as well, which saves the event dispatch
+    per tick on busy instruments.
     """
-    __slots__ = ('_tickTypes',)
+    __slots__ = ('_tickTypes', '_batched')
 
-    def __init__(self, tickTypes, source=None):
+    def __init__(self, tickTypes, source=None, batched=False):
         Op.__init__(self, source)
         self._tickTypes = set(tickTypes)
+        self._batched = batched
 
     def on_source(self, ticker):
-        for t in ticker.ticks:
-            if t.tickType in self._tickTypes:
-                self.emit(t.time, t.price, t.size)
+        if self._batched:
+            tickTypes = self._tickTypes
+            ticks = [t for t in ticker.ticks if t.tickType in tickTypes]
+            if ticks:
+                self.emit(
+                    [t.time for t in ticks],
+                    array('d', [t.price for t in ticks]),
+                    array('d', [t.size for t in ticks]))
+        else:
+            for t in ticker.ticks:
+                if t.tickType in self._tickTypes:
+                    self.emit(t.time, t.price, t.size)
 
-    def timebars(self, timer: Event) -> "TimeBars":
+    def timebars(self, timer: Union[Event, float]) -> "TimeBars":
         """
         Aggregate ticks into time bars, where the timing of new bars
         is derived from a timer event.
         Emits a completed :class:`Bar`.
 
         This event stores a :class:`BarList` of all created bars in the
-        ``bars`` property.
+        ``bars`` property, which can be bounded with
+        :meth:`.BarList.setMaxLength`.
 
         Args:
-            timer: Event for timing when a new bar starts.
+            timer: Event for timing when a new bar starts, or the bar
+                size in seconds to use the shared timer of the
+                :class:`.TimerWheel`, which starts the bars of all
+                symbols at the same aligned wall-clock times.
         """
         return TimeBars(timer, self)
 
@@ -208,20 +235,90 @@ class Tickfilter(Op):
         Emits a completed :class:`Bar`.
 
         This event stores a :class:`BarList` of all created bars in the
-        ``bars`` property.
+        ``bars`` property, which can be bounded with
+        :meth:`.BarList.setMaxLength`.
 
         Args:
             count: Number of ticks to use to form one bar.
         """
         return TickBars(count, self)
 
+    def volumebars(self, volume: float, updates: bool = False) -> "VolumeBars":
+        """
+        Aggregate ticks into bars that have (at least) the same volume.
+        Emits a completed :class:`Bar`.
+
+        This event stores a :class:`BarList` of all created bars in the
+        ``bars`` property.
+
+        Args:
+            volume: Volume of one bar.
+            updates: If True then the ongoing bar is also kept in the
+                bar list and ``bars.updateEvent`` is emitted on every tick,
+                otherwise only on bar completion.
+        """
+        return VolumeBars(volume, updates, self)
+
+    def dollarbars(self, value: float, updates: bool = False) -> "DollarBars":
+        """
+        Aggregate ticks into bars that have (at least) the same traded
+        value, as the sum of price times size.
+        Emits a completed :class:`Bar`.
+
+        This event stores a :class:`BarList` of all created bars in the
+        ``bars`` property.
+
+        Args:
+            value: Traded value of one bar.
+            updates: See :meth:`volumebars`.
+        """
+        return DollarBars(value, updates, self)
+
+    def rangebars(self, range: float, updates: bool = False) -> "RangeBars":
+        """
+        Aggregate ticks into bars that have the same price range,
+        where a bar completes once its high minus its low reaches the
+        range. Emits a completed :class:`Bar`.
+
+        This event stores a :class:`BarList` of all created bars in the
+        ``bars`` property.
+
+        Args:
+            range: Price range of one bar.
+            updates: See :meth:`volumebars`.
+        """
+        return RangeBars(range, updates, self)
+
+    def imbalancebars(
+            self, threshold: float, updates: bool = False) -> "ImbalanceBars":
+        """
+        Aggregate ticks into tick-imbalance bars. Every tick is signed
+        by the tick rule (+1 for an uptick, -1 for a downtick and the
+        previous sign for an unchanged price) and a bar completes once
+        the absolute sum of the signs reaches the threshold.
+        Emits a completed :class:`Bar`.
+
+        This event stores a :class:`BarList` of all created bars in the
+        ``bars`` property.
+
+        Args:
+            threshold: Tick imbalance of one bar.
+            updates: See :meth:`volumebars`.
+        """
+        return ImbalanceBars(threshold, updates, self)
+
 
 class Midpoints(Tickfilter):
     __slots__ = ()
 
     def on_source(self, ticker):
         if ticker.ticks:
-            self.emit(ticker.time, ticker.midpoint(), 0)
+            if self._batched:
+                self.emit(
+                    [ticker.time], array('d', [ticker.midpoint()]),
+                    array('d', [0]))
+            else:
+                self.emit(ticker.time, ticker.midpoint(), 0)
 
 
 class Bar(Object):
@@ -243,6 +340,8 @@ class TimeBars(Op):
 
     def __init__(self, timer, source=None):
         Op.__init__(self, source)
+        if not isinstance(timer, Event):
+            timer = timerWheel.periodic(timer)
         self._timer = timer
         self._timer.connect(self._on_timer, None, self._on_timer_done)
         self.bars: BarList = BarList()
@@ -251,13 +350,25 @@ class TimeBars(Op):
         if not self.bars:
             return
         bar = self.bars[-1]
-        if isNan(bar.open):
-            bar.open = bar.high = bar.low = price
-        bar.high = max(bar.high, price)
-        bar.low = min(bar.low, price)
-        bar.close = price
-        bar.volume += size
-        bar.count += 1
+        if isinstance(price, array):
+            # chunk of ticks
+            if not price:
+                return
+            if isNan(bar.open):
+                bar.open = bar.high = bar.low = price[0]
+            bar.high = max(bar.high, max(price))
+            bar.low = min(bar.low, min(price))
+            bar.close = price[-1]
+            bar.volume += sum(size)
+            bar.count += len(price)
+        else:
+            if isNan(bar.open):
+                bar.open = bar.high = bar.low = price
+            bar.high = max(bar.high, price)
+            bar.low = min(bar.low, price)
+            bar.close = price
+            bar.volume += size
+            bar.count += 1
         self.bars.updateEvent.emit(self.bars, False)
 
     def _on_timer(self, time):
@@ -285,6 +396,25 @@ class TickBars(Op):
         self.bars: BarList = BarList()
 
     def on_source(self, time, price, size):
+        if isinstance(price, array):
+            # chunk of ticks, aggregated per slice that fits in a bar
+            i = 0
+            while i < len(price):
+                if not self.bars or self.bars[-1].count == self._count:
+                    self.bars.append(Bar(time[i], price[i], -inf, inf))
+                bar = self.bars[-1]
+                j = min(len(price), i + self._count - bar.count)
+                prices = price[i:j]
+                bar.high = max(bar.high, max(prices))
+                bar.low = min(bar.low, min(prices))
+                bar.close = prices[-1]
+                bar.volume += sum(size[i:j])
+                bar.count += j - i
+                if bar.count == self._count:
+                    self.bars.updateEvent.emit(self.bars, True)
+                    self.emit(self.bars)
+                i = j
+            return
         if not self.bars or self.bars[-1].count == self._count:
             bar = Bar(time, price, price, price, price, size, 1)
             self.bars.append(bar)
@@ -298,3 +428,287 @@ class TickBars(Op):
         if bar.count == self._count:
             self.bars.updateEvent.emit(self.bars, True)
             self.emit(self.bars)
+
+
+class AggregateBars(Op, metaclass=abc.ABCMeta):
+    """
+    Base class for the bars that complete on a condition of their ticks.
+    The ongoing bar is kept in a preallocated array, so that a tick
+    is aggregated in O(1) without creating objects.
+
+    Subclasses implement :meth:`isComplete` and can add their own
+    fields to the state with :meth:`aggregate` and :meth:`reset`.
+    """
+    __slots__ = ('bars', '_state', '_time', '_updates')
+
+    # indices into the state array, subclasses append their own fields
+    OPEN, HIGH, LOW, CLOSE, VOLUME, COUNT = range(6)
+    numFields = 6
+
+    def __init__(self, updates=False, source=None):
+        Op.__init__(self, source)
+        self.bars: BarList = BarList()
+        self._state = array('d', [0.0] * self.numFields)
+        self._time = None
+        self._updates = updates
+
+    def on_source(self, time, price, size):
+        if isinstance(price, array):
+            for t, p, v in zip(time, price, size):
+                self.on_source(t, p, v)
+            return
+        s = self._state
+        if not s[5]:
+            self._time = time
+            s[0] = s[1] = s[2] = price
+        elif price > s[1]:
+            s[1] = price
+        elif price < s[2]:
+            s[2] = price
+        s[3] = price
+        s[4] += size
+        s[5] += 1
+        self.aggregate(s, price, size)
+        isComplete = self.isComplete(s)
+        if self._updates or isComplete:
+            if self._updates and s[5] > 1:
+                bar = self.bars[-1]
+                bar.high, bar.low, bar.close, bar.volume, bar.count = \
+                    s[1], s[2], s[3], s[4], int(s[5])
+            else:
+                bar = Bar(self._time, s[0], s[1], s[2], s[3], s[4], int(s[5]))
+                self.bars.append(bar)
+            if isComplete:
+                self.reset(s)
+            self.bars.updateEvent.emit(self.bars, isComplete)
+            if isComplete:
+                self.emit(bar)
+
+    def aggregate(self, state, price, size):
+        """
+        Aggregate the tick into the subclass fields of the state.
+        """
+
+    @abc.abstractmethod
+    def isComplete(self, state) -> bool:
+        """
+        Is the bar with the given state complete? This is called after
+        every tick is aggregated and must be O(1).
+        """
+
+    def reset(self, state):
+        """
+        Reset the state for a new bar.
+        """
+        for i in range(6):
+            state[i] = 0.0
+
+
+class VolumeBars(AggregateBars):
+    __slots__ = ('_volume',)
+    __doc__ = Tickfilter.volumebars.__doc__
+
+    def __init__(self, volume, updates=False, source=None):
+        AggregateBars.__init__(self, updates, source)
+        self._volume = volume
+
+    def isComplete(self, state):
+        return state[4] >= self._volume
+
+
+class DollarBars(AggregateBars):
+    __slots__ = ('_dollars',)
+    __doc__ = Tickfilter.dollarbars.__doc__
+    numFields = 7
+
+    def __init__(self, value, updates=False, source=None):
+        AggregateBars.__init__(self, updates, source)
+        self._dollars = value
+
+    def aggregate(self, state, price, size):
+        state[6] += price * size
+
+    def isComplete(self, state):
+        return state[6] >= self._dollars
+
+    def reset(self, state):
+        AggregateBars.reset(self, state)
+        state[6] = 0.0
+
+
+class RangeBars(AggregateBars):
+    __slots__ = ('_range',)
+    __doc__ = Tickfilter.rangebars.__doc__
+
+    def __init__(self, range, updates=False, source=None):
+        AggregateBars.__init__(self, updates, source)
+        self._range = range
+
+    def isComplete(self, state):
+        return state[1] - state[2] >= self._range
+
+
+class ImbalanceBars(AggregateBars):
+    __slots__ = ('_threshold',)
+    __doc__ = Tickfilter.imbalancebars.__doc__
+
+    # extra fields: imbalance, previous price, previous sign
+    numFields = 9
+
+    def __init__(self, threshold, updates=False, source=None):
+        AggregateBars.__init__(self, updates, source)
+        self._threshold = threshold
+        self._state[7] = nan
+
+    def aggregate(self, state, price, size):
+        prevPrice = state[7]
+        if price > prevPrice:
+            state[8] = 1.0
+        elif price < prevPrice:
+            state[8] = -1.0
+        state[6] += state[8]
+        state[7] = price
+
+    def isComplete(self, state):
+        return abs(state[6]) >= self._threshold
+
+    def reset(self, state):
+        # the previous price and sign carry over to the next bar
+        AggregateBars.reset(self, state)
+        state[6] = 0.0
+
+
+class CascadeBars(Op):
+    """
+    Derive the bars of higher timeframes incrementally from a stream of
+    finer bars, without extra requests. The source is the bar list of
+    :class:`.RealTimeBarList`, :class:`.BarDataList` (with keepUpToDate)
+    or :class:`TimeBars`, and an in-place update of the last fine bar
+    updates the higher bars as well.
+
+    Each timeframe has its own :class:`BarList` in ``bars[seconds]``, with
+    an ``updateEvent`` (bars, hasNewBar) just like the source. A higher bar
+    completes when the first fine bar of the next period arrives, and
+    then ``emit(seconds, bar)`` is called with the completed :class:`Bar`.
+    The bars that are already in the source are cascaded as well, and
+    empty fine bars (with a NaN close, such as from a :class:`TimeBars`
+    period without ticks) are skipped.
+
+    Args:
+        source: The fine bar list or :class:`TimeBars`.
+        timeframes: Timeframes in seconds, such as ``(60, 300, 3600)``.
+            Timeframes of a day or longer must be whole days and are
+            counted in days from a Monday, so that ``7 * 86400`` gives
+            weeks that start on Monday at the session start.
+            For date bars all timeframes are taken as whole days.
+        sessionStart: Time of day that the periods are aligned to.
+        tzinfo: Timezone in which the session start is given, for bars
+            with timezone-aware datetimes.
+    """
+    __slots__ = (
+        'bars', '_timeframes', '_sessionStart', '_tzinfo',
+        '_periods', '_accs', '_numCommitted')
+
+    def __init__(
+            self, source, timeframes, sessionStart=datetime.time(),
+            tzinfo=None):
+        source = getattr(source, 'bars', source)
+        Op.__init__(self)
+        for secs in timeframes:
+            if secs >= 86400 and secs % 86400:
+                raise ValueError(
+                    f'Timeframe of {secs} seconds is not a whole '
+                    'number of days')
+        self._timeframes = list(timeframes)
+        self._sessionStart = sessionStart
+        self._tzinfo = tzinfo
+        self.bars = {secs: BarList() for secs in self._timeframes}
+        self._periods = dict.fromkeys(self._timeframes)
+        self._accs = dict.fromkeys(self._timeframes)
+        self._numCommitted = source.numEvicted
+        if source:
+            self.on_source(source, True)
+        self.set_source(source.updateEvent)
+
+    def on_source(self, bars, hasNewBar):
+        if not bars:
+            return
+        while self._numCommitted < bars.numBars() - 1:
+            fine = barTuple(bars.at(self._numCommitted))
+            for secs in self._timeframes:
+                self._roll(secs, fine[0])
+                self._accs[secs] = _merge(self._accs[secs], fine)
+            self._numCommitted += 1
+        partial = barTuple(bars[-1])
+        for secs in self._timeframes:
+            self._roll(secs, partial[0])
+            values = _merge(self._accs[secs], partial)
+            if values is not None:
+                self._update(secs, values)
+
+    def _roll(self, secs, time):
+        # start a new period if the time is past the current period,
+        # completing the higher bar of the current period
+        start = self._periodStart(time, secs)
+        period = self._periods[secs]
+        if period is not None and start > period:
+            acc = self._accs[secs]
+            if acc is not None:
+                self.emit(secs, self._update(secs, acc))
+            self._accs[secs] = None
+        if period is None or start > period:
+            self._periods[secs] = start
+
+    def _update(self, secs, values):
+        # set the higher bar of the current period to the given values,
+        # appending it if it is new
+        _, o, h, l, c, v, n = values
+        higherBars = self.bars[secs]
+        period = self._periods[secs]
+        if higherBars and higherBars[-1].time == period:
+            bar = higherBars[-1]
+            new = (o, h, l, c, v, n)
+            if new != (
+                    bar.open, bar.high, bar.low, bar.close, bar.volume,
+                    bar.count):
+                # the open changes with a revision of the first fine bar
+                bar.open, bar.high, bar.low, bar.close, bar.volume, \
+                    bar.count = new
+                higherBars.updateEvent.emit(higherBars, False)
+        else:
+            bar = Bar(period, o, h, l, c, v, n)
+            higherBars.append(bar)
+            higherBars.updateEvent.emit(higherBars, True)
+        return bar
+
+    def _periodStart(self, t, secs):
+        if not isinstance(t, datetime.datetime):
+            # date: align whole days to the first Monday
+            days = max(1, secs // 86400)
+            return datetime.date.fromordinal(
+                (t.toordinal() - 1) // days * days + 1)
+        if self._tzinfo and t.tzinfo:
+            t = t.astimezone(self._tzinfo)
+        s = self._sessionStart
+        anchor = t.replace(
+            hour=s.hour, minute=s.minute, second=s.second, microsecond=0)
+        if t < anchor:
+            anchor -= datetime.timedelta(days=1)
+        if secs >= 86400:
+            # align the days to the same grid as for date bars
+            days = secs // 86400
+            return anchor - datetime.timedelta(
+                days=(anchor.toordinal() - 1) % days)
+        n = (t - anchor).total_seconds() // secs
+        return anchor + datetime.timedelta(seconds=n * secs)
+
+
+def _merge(acc, bar):
+    # an empty bar (of a time bar period without ticks) is skipped
+    if isNan(bar[4]):
+        return acc
+    if acc is None:
+        return bar
+    return (
+        acc[0], acc[1], max(acc[2], bar[2]), min(acc[3], bar[3]), bar[4],
+        acc[5] + bar[5], acc[6] + bar[6])
@@ -0,0 +1,119 @@
+import asyncio
+import datetime
+import heapq
+import logging
+import math
+import time
+
+from eventkit import Event
+
+__all__ = ['TimerWheel']
+
+
+class TimerWheel:
+    """
+    Central timer service for periodic events at aligned wall-clock times.
+
+    All periodic timers are scheduled off one heap with only one pending
+    wakeup of the event loop. The timers that are due on the same
+    boundary, such as all one-minute and five-minute timers on the full
+    five minutes, are fired together from that one wakeup.
+
+    The timers are shared: asking for the same period twice gives
+    the same event. There is a module-wide instance in ``timerWheel``
+    that :meth:`.Tickfilter.timebars` uses when given a bar size in
+    seconds.
+
+    Args:
+        tzinfo: Timezone of the emitted datetimes, or None for naive
+            datetimes in local time.
+    """
+
+    def __init__(self, tzinfo: datetime.tzinfo = None):
+        self.tzinfo = tzinfo
+        self._timers = {}  # (step, offset) -> Event
+        self._heap = []  # (due, step, offset)
+        self._handle = None
+        self._due = 0
+        self._logger = logging.getLogger('ib_insync.timerwheel')
+
+    def __len__(self):
+        return len(self._timers)
+
+    def periodic(self, step: float, offset: float = 0) -> Event:
+        """
+        Get the event that emits the boundary time at every wall-clock
+        time that is a multiple of ``step`` seconds, plus ``offset``,
+        since the epoch. A step that divides a day gives boundaries
+        aligned to midnight UTC; use the offset for other alignments.
+        Raises ValueError if the step is not positive.
+
+        Args:
+            step: Period in seconds.
+            offset: Offset in seconds of the boundaries.
+        """
+        if not step > 0:
+            raise ValueError(f'Step must be positive, not {step}')
+        key = (step, offset % step)
+        event = self._timers.get(key)
+        if event is None:
+            event = Event(f'timer{step}')
+            self._timers[key] = event
+            heapq.heappush(self._heap, (_nextDue(time.time(), *key), *key))
+            self._reschedule()
+        return event
+
+    def stop(self, step: float, offset: float = 0):
+        """
+        Stop the periodic timer and set its event done.
+        """
+        key = (step, offset % step)
+        event = self._timers.pop(key, None)
+        if event is not None:
+            self._heap = [entry for entry in self._heap if entry[1:] != key]
+            heapq.heapify(self._heap)
+            self._reschedule()
+            event.set_done()
+
+    def _reschedule(self):
+        # wake up for the earliest boundary
+        if not self._heap:
+            if self._handle:
+                self._handle.cancel()
+                self._handle = None
+            return
+        due = self._heap[0][0]
+        if self._handle and due == self._due:
+            return
+        if self._handle:
+            self._handle.cancel()
+        self._due = due
+        loop = asyncio.get_event_loop()
+        self._handle = loop.call_later(
+            max(due - time.time(), 0), self._onWakeup)
+
+    def _onWakeup(self):
+        self._handle = None
+        now = time.time()
+        heap = self._heap
+        due = []
+        # the loop clock may wake up a fraction early
+        while heap and heap[0][0] <= now + 0.001:
+            t, step, offset = heapq.heappop(heap)
+            # after a stall only the latest boundary is fired
+            t = max(t, _nextDue(now, step, offset) - step)
+            due.append((t, step, offset))
+            heapq.heappush(heap, (t + step, step, offset))
+        for t, step, offset in due:
+            event = self._timers.get((step, offset))
+            if event is not None:
+                event.emit(datetime.datetime.fromtimestamp(t, self.tzinfo))
+        self._reschedule()
+
+
+def _nextDue(now, step, offset):
+    # first boundary after now
+    return (math.floor((now - offset) / step) + 1) * step + offset
+
+
+timerWheel = TimerWheel()
@@ -0,0 +1,284 @@
+import datetime
+import logging
+import pickle
+import sqlite3
+from typing import List, Tuple
+
+from ib_insync.contract import Contract
+from ib_insync.objects import CommissionReport, Execution, Fill, TradeLogEntry
+from ib_insync.order import Order, OrderStatus, Trade
+from ib_insync.timerwheel import timerWheel
+
+__all__ = ['TradeArchive']
+
+
+class TradeArchive:
+    """
+    Retention policy for the trades and fills of an :class:`.IB`
+    instance, which otherwise keep growing for the life of the
+    connection.
+
+    Done trades (filled or cancelled) that are older than the retention
+    time are moved to an append-only SQLite archive, together with their
+    fills, and are evicted from memory. Fills of other clients
+    older than the retention time are archived too, as are the
+    completed orders that are loaded at connect, which have no log
+    and are taken as old.
+
+    The archived trades and fills stay available through
+    :meth:`.IB.trades`, :meth:`.IB.orders`, :meth:`.IB.fills` and
+    :meth:`.IB.executions`, which load them from the archive on demand,
+    using the indexes of the archive for the filters.
+
+    Usage::
+
+        archive = TradeArchive(ib, 'trades.db', retention=3600)
+        archive.start()
+
+    Args:
+        ib: The :class:`.IB` instance to archive the trades of.
+        path: SQLite database file, or ':memory:' for a temporary
+            archive.
+        retention: Time in seconds that done trades and fills are kept
+            in memory.
+        interval: Time in seconds between the archival runs.
+        maxLogEntries: Maximum number of log entries to keep per trade in
+            memory, or 0 for no limit. The oldest entries are discarded.
+    """
+
+    def __init__(
+            self, ib, path: str, retention: float = 3600,
+            interval: float = 60, maxLogEntries: int = 0):
+        self.ib = ib
+        self.path = path
+        self.retention = retention
+        self.interval = interval
+        self.maxLogEntries = maxLogEntries
+        self._logger = logging.getLogger('ib_insync.tradearchive')
+        self._db = sqlite3.connect(path)
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS trades (
+                permId INTEGER, conId INTEGER, orderRef TEXT,
+                status TEXT, time TEXT, data BLOB);
+            CREATE INDEX IF NOT EXISTS trades_permId ON trades(permId);
+            CREATE INDEX IF NOT EXISTS trades_conId ON trades(conId);
+            CREATE INDEX IF NOT EXISTS trades_orderRef ON trades(orderRef);
+            CREATE INDEX IF NOT EXISTS trades_status ON trades(status);
+            CREATE TABLE IF NOT EXISTS fills (
+                execId TEXT PRIMARY KEY, permId INTEGER, conId INTEGER,
+                time TEXT, data BLOB);
+            CREATE INDEX IF NOT EXISTS fills_permId ON fills(permId);
+            CREATE INDEX IF NOT EXISTS fills_conId ON fills(conId);
+        ''')
+
+    def __repr__(self):
+        return f'TradeArchive({self.path!r})'
+
+    def start(self):
+        """
+        Start serving the archived trades through the IB instance and
+        archive periodically and after every connect.
+        """
+        self.ib.tradeArchive = self
+        self._timer = timerWheel.periodic(self.interval)
+        self._timer += self._onTimer
+        self.ib.connectedEvent += self.archive
+
+    def stop(self):
+        """
+        Stop archiving and close the archive.
+        """
+        if self.ib.tradeArchive is self:
+            self.ib.tradeArchive = None
+        self._timer -= self._onTimer
+        self.ib.connectedEvent -= self.archive
+        self._db.close()
+
+    def archive(self, now: datetime.datetime = None) -> Tuple[int, int]:
+        """
+        Move the done trades and the fills that are older than the
+        retention time from memory to the archive.
+
+        Args:
+            now: Time to measure the age from, or None for now.
+
+        Returns:
+            The number of archived trades and fills.
+        """
+        w = self.ib.wrapper
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        cutoff = now - datetime.timedelta(seconds=self.retention)
+        trades = {}  # id(trade) -> trade
+        for key, trade in list(w.trades.items()):
+            if trade.orderStatus.status not in OrderStatus.DoneStates:
+                continue
+            doneTime = trade.log[-1].time if trade.log else None
+            if doneTime is None or doneTime < cutoff:
+                del w.trades[key]
+                trades[id(trade)] = trade
+        fills = {}  # execId -> fill
+        for trade in trades.values():
+            permId = _permId(trade)
+            if w.permId2Trade.get(permId) is trade:
+                del w.permId2Trade[permId]
+            w.unindexTrade(trade)
+            for fill in trade.fills:
+                fills[fill.execution.execId] = fill
+        for execId, fill in w.fills.items():
+            if fill.time and fill.time < cutoff \
+                    and fill.execution.permId not in w.permId2Trade:
+                fills[execId] = fill
+        for execId, fill in fills.items():
+            if w.fills.pop(execId, None):
+                bucket = w.conId2Fills[fill.contract.conId]
+                bucket.pop(execId, None)
+                if not bucket:
+                    del w.conId2Fills[fill.contract.conId]
+
+        with self._db:
+            self._db.executemany(
+                'INSERT INTO trades VALUES (?, ?, ?, ?, ?, ?)', (
+                    (_permId(t), t.contract.conId, t.order.orderRef,
+                        t.orderStatus.status,
+                        t.log[-1].time.isoformat() if t.log else None,
+                        _dumpTrade(t))
+                    for t in trades.values()))
+            self._db.executemany(
+                'INSERT OR IGNORE INTO fills VALUES (?, ?, ?, ?, ?)', (
+                    (execId, f.execution.permId, f.contract.conId,
+                        f.time.isoformat() if f.time else None,
+                        _dumpFill(f))
+                    for execId, f in fills.items()))
+
+        if self.maxLogEntries:
+            for trade in w.trades.values():
+                if len(trade.log) > self.maxLogEntries:
+                    del trade.log[:-self.maxLogEntries]
+        if trades or fills:
+            self._logger.info(
+                f'Archived {len(trades)} trades and {len(fills)} fills')
+        return len(trades), len(fills)
+
+    def trades(
+            self, contract: Contract = None, orderRef: str = None,
+            status: str = None) -> List[Trade]:
+        """
+        Load the archived trades, in the order of archival, optionally
+        only those of the given contract (by conId), orderRef and status.
+        """
+        where, params = _where(
+            conId=contract.conId if contract is not None else None,
+            orderRef=orderRef, status=status)
+        fills = {}  # permId -> list of fills
+        for permId, data in self._db.execute(
+                'SELECT permId, data FROM fills WHERE permId IN '
+                f'(SELECT permId FROM trades {where}) AND permId != 0 '
+                'ORDER BY rowid', params):
+            fills.setdefault(permId, []).append(_loadFill(data))
+        return [
+            _loadTrade(data, fills.get(permId, []))
+            for permId, data in self._db.execute(
+                f'SELECT permId, data FROM trades {where} ORDER BY rowid',
+                params)]
+
+    def fills(self, contract: Contract = None) -> List[Fill]:
+        """
+        Load the archived fills, in the order of archival, optionally
+        only those of the given contract (by conId).
+        """
+        where, params = _where(
+            conId=contract.conId if contract is not None else None)
+        return [
+            _loadFill(data) for data, in self._db.execute(
+                f'SELECT data FROM fills {where} ORDER BY rowid', params)]
+
+    def hasTrade(self, permId: int) -> bool:
+        """
+        Is the trade with the given permId archived?
+        """
+        return permId != 0 and self._db.execute(
+            'SELECT 1 FROM trades WHERE permId = ?',
+            (permId,)).fetchone() is not None
+
+    def hasFill(self, execId: str) -> bool:
+        """
+        Is the fill with the given execId archived?
+        """
+        return self._db.execute(
+            'SELECT 1 FROM fills WHERE execId = ?',
+            (execId,)).fetchone() is not None
+
+    def updateCommissionReport(self, report: CommissionReport) -> bool:
+        """
+        Update the commission report of an archived fill, for the reports
+        that arrive after their fill is archived, such as those that
+        are replayed on reconnect.
+
+        Returns:
+            True if the fill is archived, False otherwise.
+        """
+        row = self._db.execute(
+            'SELECT data FROM fills WHERE execId = ?',
+            (report.execId,)).fetchone()
+        if row is None:
+            return False
+        fill = _loadFill(row[0])
+        fill.commissionReport.update(**report.dict())
+        with self._db:
+            self._db.execute(
+                'UPDATE fills SET data = ? WHERE execId = ?',
+                (_dumpFill(fill), report.execId))
+        return True
+
+    def lastFillTime(self) -> datetime.datetime:
+        """
+        Time of the latest archived fill, or None if there are none.
+        """
+        time, = self._db.execute('SELECT MAX(time) FROM fills').fetchone()
+        return datetime.datetime.fromisoformat(time) if time else None
+
+    def _onTimer(self, time):
+        self.archive()
+
+
+def _permId(trade):
+    # the permId of the order is only set by openOrder
+    return trade.order.permId or trade.orderStatus.permId
+
+
+def _where(**conditions):
+    # WHERE clause and its parameters for the conditions that are not None
+    items = [(k, v) for k, v in conditions.items() if v is not None]
+    if not items:
+        return '', ()
+    where = 'WHERE ' + ' AND '.join(f'{k} = ?' for k, _ in items)
+    return where, tuple(v for _, v in items)
+
+
+def _dumpTrade(trade):
+    return pickle.dumps((
+        trade.contract.nonDefaults(), trade.order.nonDefaults(),
+        trade.orderStatus.nonDefaults(), [tuple(e) for e in trade.log]),
+        pickle.HIGHEST_PROTOCOL)
+
+
+def _loadTrade(data, fills):
+    contract, order, orderStatus, log = pickle.loads(data)
+    return Trade(
+        Contract.create(**contract), Order(**order),
+        OrderStatus(**orderStatus), fills,
+        [TradeLogEntry(*e) for e in log])
+
+
+def _dumpFill(fill):
+    return pickle.dumps((
+        fill.contract.nonDefaults(), fill.execution.nonDefaults(),
+        fill.commissionReport.nonDefaults(), fill.time),
+        pickle.HIGHEST_PROTOCOL)
+
+
+def _loadFill(data):
+    contract, execution, commissionReport, time = pickle.loads(data)
+    return Fill(
+        Contract.create(**contract), Execution(**execution),
+        CommissionReport(**commissionReport), time)
@@ -1,4 +1,5 @@
 import datetime
+import functools
 import logging
 import math
 import sys
@@ -125,6 +126,24 @@ def barplot(bars, title='', upColor='blue', downColor='red'):
     return fig
 
 
+def barTuple(bar) -> tuple:
+    """
+    The (time, open, high, low, close, volume, count) of a bar of any
+    type: :class:`.Bar`, :class:`.BarData` or :class:`.RealTimeBar`.
+    """
+    if hasattr(bar, 'open_'):
+        return (
+            bar.time, bar.open_, bar.high, bar.low, bar.close,
+            bar.volume, bar.count)
+    elif hasattr(bar, 'barCount'):
+        return (
+            bar.date, bar.open, bar.high, bar.low, bar.close,
+            bar.volume, bar.barCount)
+    return (
+        bar.time, bar.open, bar.high, bar.low, bar.close,
+        bar.volume, bar.count)
+
+
 def allowCtrlC():
     """
     Allow Control-C to end program.
@@ -468,13 +487,110 @@ def parseIBDatetime(s):
     """
     if len(s) == 8:
         # YYYYmmdd
-        y = int(s[0:4])
-        m = int(s[4:6])
-        d = int(s[6:8])
-        dt = datetime.date(y, m, d)
+        dt = _parseIBDate(s)
     elif s.isdigit():
         dt = datetime.datetime.fromtimestamp(
             int(s), datetime.timezone.utc)
+    elif len(s) == 18 and s[12] == s[15] == ':':
+        # YYYYmmdd  HH:MM:SS, with the date part cached
+        dt = _parseIBMidnight(s[:8]) + datetime.timedelta(
+            seconds=int(s[10:12]) * 3600 + int(s[13:15]) * 60 + int(s[16:]))
     else:
         dt = datetime.datetime.strptime(s, '%Y%m%d  %H:%M:%S')
     return dt
+
+
+@functools.lru_cache(maxsize=4096)
+def _parseIBDate(s):
+    return datetime.date(int(s[0:4]), int(s[4:6]), int(s[6:8]))
+
+
+@functools.lru_cache(maxsize=4096)
+def _parseIBMidnight(s):
+    return datetime.datetime(int(s[0:4]), int(s[4:6]), int(s[6:8]))
+
+
+def parseIBDatetimes(strings):
+    """
+    Parse a sequence of strings in the same IB date or datetime format
+    to a NumPy array of datetime64[s], in one vectorized operation.
+    Dates become midnight, epoch seconds are UTC and datetimes keep
+    their wall clock time, with any timezone suffix ignored.
+
+    Raises ValueError if the strings are not all in one of these formats.
+    """
+    import numpy as np
+    a = np.asarray(strings, 'S')
+    if not len(a):
+        return np.empty(0, 'datetime64[s]')
+    dt = _parseIBDatetimes(a)
+    if dt is None:
+        # bring other layouts, such as with a single space or with a
+        # timezone suffix, to the fixed 'YYYYmmdd  HH:MM:SS' layout
+        a = np.array([b'  '.join(s.split()[:2]) for s in a], 'S')
+        dt = _parseIBDatetimes(a)
+        if dt is None:
+            raise ValueError(
+                'Strings are not all in the same IB date or datetime format')
+    return dt
+
+
+def _parseIBDatetimes(a):
+    # parse the byte strings of a fixed layout at fixed offsets,
+    # or return None if the layout is not exactly the same for all
+    import numpy as np
+    size = a.dtype.itemsize
+    b = a.view('u1').reshape(len(a), -1)
+    digits = b.astype('i8') - ord('0')
+    isDigit = (digits >= 0) & (digits <= 9)
+    if size == 8:
+        if not isDigit.all():
+            return None
+    elif isDigit[:, 0].all() and np.char.isdigit(a).all():
+        # epoch seconds, of any width
+        return a.astype('i8').view('datetime64[s]')
+    elif size != 18 or not (
+            isDigit[:, [0, 1, 2, 3, 4, 5, 6, 7, 10, 11, 13, 14, 16, 17]]
+            .all()
+            and (b[:, 8:10] == ord(' ')).all()
+            and (b[:, [12, 15]] == ord(':')).all()):
+        return None
+
+    def num(start, end):
+        n = digits[:, start]
+        for i in range(start + 1, end):
+            n = n * 10 + digits[:, i]
+        return n
+
+    months = (num(0, 4) - 1970) * 12 + num(4, 6) - 1
+    days = months.astype('datetime64[M]').astype('datetime64[D]') \
+        + (num(6, 8) - 1)
+    dt = days.astype('datetime64[s]')
+    if size == 18:
+        dt += num(10, 12) * 3600 + num(13, 15) * 60 + num(16, 18)
+    return dt
+
+
+def roundToIncrements(prices, increments):
+    """
+    Round prices to the nearest multiple of the price increment that
+    applies to the price band of each price.
+
+    Args:
+        prices: A single price or an array-like of prices.
+        increments: List of :class:`.PriceIncrement` that defines the
+            increment per price band, as obtained from a market rule.
+
+    Returns:
+        A float for a single price or a numpy array otherwise.
+    """
+    import numpy as np
+    increments = sorted(increments)
+    edges = np.array([pi.lowEdge for pi in increments], dtype=float)
+    steps = np.array([pi.increment for pi in increments], dtype=float)
+    p = np.asarray(prices, dtype=float)
+    band = np.searchsorted(edges, np.abs(p), side='right') - 1
+    step = steps[np.clip(band, 0, len(steps) - 1)]
+    # second rounding removes the floating point noise of the multiplication
+    rounded = np.round(np.round(p / step) * step, 10)
+    return float(rounded) if rounded.ndim == 0 else rounded
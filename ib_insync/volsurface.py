@@ -0,0 +1,136 @@
+import datetime
+
+from eventkit import Event
+
+from ib_insync.optionmodel import OptionModel
+
+__all__ = ['VolSurface']
+
+nan = float('nan')
+
+
+class VolSurface:
+    """
+    Implied volatility surface on the strike × expiry grid of an
+    :class:`.OptionChainTable`, kept up to date incrementally.
+
+    The surface follows the ``updateEvent`` of the table, so it is fed by
+    the model greeks of ``tickOptionComputation`` (or by the local
+    :class:`.OptionModel`). An update only writes the cells of the
+    refreshed rows and marks their expiries as changed, and only the
+    changed expiry slices are refitted, on the next lookup or
+    :meth:`refit`. A slice is fitted by interpolating the observed
+    volatilities across the strikes, where a strike with both a call and
+    a put quote takes the average of the two.
+
+    The ``updateEvent`` (surface, expiryIndices) is emitted after a refit.
+
+    Requires NumPy.
+
+    Args:
+        table: The option chain table to follow.
+    """
+
+    events = ('updateEvent',)
+
+    def __init__(self, table):
+        import numpy as np
+        self.table = table
+        self.expiries, expiryIndex = np.unique(
+            table['expiry'], return_inverse=True)
+        self.strikes, strikeIndex = np.unique(
+            table['strike'], return_inverse=True)
+        shape = (len(self.expiries), len(self.strikes))
+        self.callVols = np.full(shape, nan)
+        self.putVols = np.full(shape, nan)
+        self.vols = np.full(shape, nan)
+        self._cells = expiryIndex * len(self.strikes) + strikeIndex
+        self._isCall = table['right'] == 'C'
+        self._changed = np.zeros(len(self.expiries), bool)
+        self.updateEvent = Event('updateEvent')
+        self.onTableUpdate(table, np.arange(len(table)))
+        table.updateEvent += self.onTableUpdate
+
+    def __repr__(self):
+        return (
+            f'VolSurface(<{len(self.expiries)} expiries × '
+            f'{len(self.strikes)} strikes>)')
+
+    def close(self):
+        """
+        Stop following the table.
+        """
+        self.table.updateEvent -= self.onTableUpdate
+
+    def onTableUpdate(self, table, rows):
+        """
+        Write the implied volatilities of the refreshed rows into the grid.
+        """
+        cells = self._cells[rows]
+        vols = table['impliedVol'][rows]
+        isCall = self._isCall[rows]
+        self.callVols.flat[cells[isCall]] = vols[isCall]
+        self.putVols.flat[cells[~isCall]] = vols[~isCall]
+        self._changed[cells // len(self.strikes)] = True
+
+    def refit(self):
+        """
+        Refit the expiry slices that have changed since the last fit.
+        """
+        import numpy as np
+        changed = np.flatnonzero(self._changed)
+        if not len(changed):
+            return
+        calls = self.callVols[changed]
+        puts = self.putVols[changed]
+        with np.errstate(invalid='ignore'):
+            observed = np.where(
+                np.isnan(calls), puts,
+                np.where(np.isnan(puts), calls, (calls + puts) / 2))
+            observed[~(observed > 0)] = nan
+        for i, e in enumerate(changed):
+            valid = ~np.isnan(observed[i])
+            self.vols[e] = np.interp(
+                self.strikes, self.strikes[valid], observed[i][valid]) \
+                if valid.any() else nan
+        self._changed[changed] = False
+        self.updateEvent.emit(self, changed)
+
+    def vol(self, strike, t, now: datetime.datetime = None):
+        """
+        Interpolated volatilities, linear across the strikes and linear
+        in total variance across the expiries, and flat beyond the
+        edges of the grid. The arguments are broadcast.
+
+        Args:
+            strike: The strikes.
+            t: The times to expiry in years.
+            now: Time that the times to expiry of the grid are measured
+                from, or None for now.
+        """
+        import numpy as np
+        if self._changed.any():
+            self.refit()
+        strike, t = np.broadcast_arrays(
+            np.asarray(strike, 'f8'), np.asarray(t, 'f8'))
+        ts = OptionModel.timeToExpiry(self.expiries, now)
+        j0, j1, ws = _bracket(self.strikes, strike)
+        i0, i1, wt = _bracket(ts, t)
+        vols = self.vols
+        v0 = vols[i0, j0] * (1 - ws) + vols[i0, j1] * ws
+        v1 = vols[i1, j0] * (1 - ws) + vols[i1, j1] * ws
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = (1 - wt) * v0 * v0 * ts[i0] + wt * v1 * v1 * ts[i1]
+            inner = np.sqrt(variance / t)
+        return np.where(wt <= 0, v0, np.where(wt >= 1, v1, inner))
+
+
+def _bracket(grid, x):
+    # indices of the grid points around x and the weight of the upper one
+    import numpy as np
+    i0 = np.clip(np.searchsorted(grid, x, 'right') - 1, 0, len(grid) - 1)
+    i1 = np.minimum(i0 + 1, len(grid) - 1)
+    span = grid[i1] - grid[i0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w = np.where(span > 0, np.clip((x - grid[i0]) / span, 0, 1), 0.0)
+    return i0, i1, w
@@ -1,7 +1,7 @@
 import asyncio
 import logging
 import datetime
-from collections import defaultdict
+from collections import defaultdict, deque
 from contextlib import suppress
 
 from ib_insync.contract import Contract
@@ -13,13 +13,96 @@ from ib_insync.objects import (
     NewsTick, NewsArticle, NewsBulletin, NewsProvider, HistoricalNews,
     TickData, HistoricalTick, HistoricalTickBidAsk, HistoricalTickLast,
     TickByTickAllLast, TickByTickBidAsk, TickByTickMidPoint, FundamentalRatios,
-    MktDepthData, DOMLevel, OptionComputation, ScanData, HistogramData)
+    MktDepthData, DOMLevel, OptionComputation, ScanData, HistogramData,
+    BarData, BarDataColumns, HistoricalTickColumns)
 import ib_insync.util as util
 from .util import UNSET_DOUBLE, UNSET_INTEGER
 
 __all__ = ['Wrapper']
 
 
+class RequestStream:
+    """
+    Bounded buffer for the results of a streaming request.
+
+    The wrapper appends the results (or for historical bars the raw
+    runs of bar fields) and the consumer takes them in chunks.
+    Reading from the socket is paused while the buffer is full and
+    resumed once it is half empty.
+    """
+
+    def __init__(self, conn, maxSize: int):
+        self.conn = conn
+        self.maxSize = maxSize
+        self.event = asyncio.Event()
+        self._items = deque()
+        self._runs = deque()  # runs of bar fields, 8 per bar
+        self._offset = 0  # offset of the next bar in the first run
+        self._size = 0
+        self._isPaused = False
+
+    def __len__(self):
+        return self._size
+
+    def append(self, item):
+        self._items.append(item)
+        self._added(1)
+
+    def appendBarFields(self, fields):
+        if fields:
+            self._runs.append(fields)
+            self._added(len(fields) // 8)
+
+    def take(self, n: int) -> list:
+        """
+        Take up to ``n`` of the buffered results.
+        """
+        chunk = []
+        while self._items and len(chunk) < n:
+            chunk.append(self._items.popleft())
+        while self._runs and len(chunk) < n:
+            run = self._runs[0]
+            end = min(len(run), self._offset + 8 * (n - len(chunk)))
+            chunk += [_parseBar(run, i) for i in range(self._offset, end, 8)]
+            self._offset = end
+            if end == len(run):
+                self._runs.popleft()
+                self._offset = 0
+        self._size -= len(chunk)
+        if self._isPaused and self._size <= self.maxSize // 2:
+            self.close()
+        if not self._size:
+            self.event.clear()
+        return chunk
+
+    def close(self):
+        """
+        Resume reading from the socket if it was paused.
+        """
+        if self._isPaused:
+            self._isPaused = False
+            self.conn.resumeReading()
+
+    def _added(self, num):
+        self._size += num
+        self.event.set()
+        if self._size >= self.maxSize and not self._isPaused:
+            self._isPaused = True
+            self.conn.pauseReading()
+
+
+def _parseBar(fields, i):
+    return BarData(
+        date=util.parseIBDatetime(fields[i]),
+        open=float(fields[i + 1]),
+        high=float(fields[i + 2]),
+        low=float(fields[i + 3]),
+        close=float(fields[i + 4]),
+        volume=int(fields[i + 5]),
+        average=float(fields[i + 6]),
+        barCount=int(fields[i + 7]))
+
+
 class Wrapper:
     """
     Wrapper implementation for use with the IB class.
@@ -28,16 +111,19 @@ class Wrapper:
         self.ib = ib
         self._logger = logging.getLogger('ib_insync.wrapper')
         self._timeoutHandle = None
+        # market rules are static and survive reconnects
+        self.marketRules = {}  # marketRuleId -> list of PriceIncrement
+        self.conId2MarketRuleIds = {}  # conId -> exchange -> marketRuleId
+        self.clearTrades()
         self.reset()
 
     def reset(self):
+        if not self.ib.IncrementalSync:
+            self.clearTrades()
         self.accountValues = {}  # (acc, tag, curr, modelCode) -> AccountValue
         self.acctSummary = {}  # (account, tag, currency) -> AccountValue
         self.portfolio = defaultdict(dict)  # account -> conId -> PortfolioItem
         self.positions = defaultdict(dict)  # account -> conId -> Position
-        self.trades = {}  # (client, orderId) or permId -> Trade
-        self.permId2Trade = {}  # permId -> Trade
-        self.fills = {}  # execId -> Fill
         self.newsTicks = []  # list of NewsTick
         self.newsBulletins = {}  # msgId -> NewsBulletin
 
@@ -138,6 +224,74 @@ class Wrapper:
         self._reqId2Contract.pop(subscriber.reqId, None)
         self.reqId2Subscriber.pop(subscriber.reqId, None)
 
+    def clearTrades(self):
+        """
+        Clear the trades and fills. With ``IB.IncrementalSync`` they are
+        kept over a reconnect and only cleared by this method.
+        """
+        self.trades = {}  # (client, orderId) or permId -> Trade
+        self.permId2Trade = {}  # permId -> Trade
+        self.fills = {}  # execId -> Fill
+        # indexes of the trades and fills that are kept up to date
+        # incrementally, see indexTrade
+        self.openTrades = {}  # id(trade) -> Trade that is not done
+        self.conId2Trades = defaultdict(dict)  # conId -> id(trade) -> Trade
+        self.orderRef2Trades = defaultdict(dict)  # orderRef -> id -> Trade
+        self.status2Trades = defaultdict(dict)  # status -> id(trade) -> Trade
+        self.conId2Fills = defaultdict(dict)  # conId -> execId -> Fill
+        self._tradeIndexKeys = {}  # id(trade) -> (status, orderRef)
+        # time of the latest execution, to sync from after a reconnect
+        self.execWatermark = None
+
+    def indexTrade(self, trade: Trade):
+        """
+        Add the trade to the indexes, or move it in the indexes after a
+        change of its status or orderRef. This is O(1) and must be called
+        after every such change.
+        """
+        tradeId = id(trade)
+        status = trade.orderStatus.status
+        orderRef = trade.order.orderRef
+        keys = self._tradeIndexKeys.get(tradeId)
+        if keys == (status, orderRef):
+            return
+        if keys is None:
+            self.conId2Trades[trade.contract.conId][tradeId] = trade
+        else:
+            oldStatus, oldOrderRef = keys
+            for index, key in (
+                    (self.status2Trades, oldStatus),
+                    (self.orderRef2Trades, oldOrderRef)):
+                bucket = index[key]
+                del bucket[tradeId]
+                if not bucket:
+                    del index[key]
+        self._tradeIndexKeys[tradeId] = (status, orderRef)
+        self.status2Trades[status][tradeId] = trade
+        self.orderRef2Trades[orderRef][tradeId] = trade
+        if status in OrderStatus.DoneStates:
+            self.openTrades.pop(tradeId, None)
+        else:
+            self.openTrades[tradeId] = trade
+
+    def unindexTrade(self, trade: Trade):
+        """
+        Remove the trade from the indexes.
+        """
+        tradeId = id(trade)
+        keys = self._tradeIndexKeys.pop(tradeId, None)
+        if keys is None:
+            return
+        self.openTrades.pop(tradeId, None)
+        for index, key in (
+                (self.conId2Trades, trade.contract.conId),
+                (self.status2Trades, keys[0]),
+                (self.orderRef2Trades, keys[1])):
+            bucket = index[key]
+            del bucket[tradeId]
+            if not bucket:
+                del index[key]
+
     def orderKey(self, clientId, orderId, permId):
         if orderId <= 0:
             # order is placed manually from TWS
@@ -293,6 +447,7 @@ class Wrapper:
                 trade = Trade(contract, order, orderStatus, [], [])
                 self.trades[key] = trade
                 self._logger.info(f'openOrder: {trade}')
+            self.indexTrade(trade)
             self.permId2Trade.setdefault(order.permId, trade)
             results = self._results.get('openOrders')
             if results is None:
@@ -309,9 +464,24 @@ class Wrapper:
         orderStatus = OrderStatus(status=orderState.status)
         trade = Trade(contract, order, orderStatus, [], [])
         self._results['completedOrders'].append(trade)
-        if order.permId not in self.permId2Trade:
+        archive = self.ib.tradeArchive
+        known = self.permId2Trade.get(order.permId)
+        if known:
+            if not known.isDone() and orderState.status != \
+                    known.orderStatus.status:
+                # the order completed while disconnected
+                st = known.orderStatus
+                filled = st.filled if order.filledQuantity == UNSET_DOUBLE \
+                    else order.filledQuantity
+                self.orderStatus(
+                    known.order.orderId, orderState.status, filled,
+                    order.totalQuantity - filled, st.avgFillPrice,
+                    order.permId, st.parentId, st.lastFillPrice,
+                    known.order.clientId, st.whyHeld)
+        elif not (archive and archive.hasTrade(order.permId)):
             self.trades[order.permId] = trade
             self.permId2Trade[order.permId] = trade
+            self.indexTrade(trade)
 
     def completedOrdersEnd(self):
         self._endReq('completedOrders')
@@ -335,6 +505,7 @@ class Wrapper:
             isChanged = curr != {**curr, **new}
             if isChanged:
                 trade.orderStatus.update(**new)
+                self.indexTrade(trade)
                 msg = ''
             elif (status == 'Submitted' and trade.log
                     and trade.log[-1].message == 'Modify'):
@@ -377,12 +548,17 @@ class Wrapper:
         execId = execution.execId
         execution.time = util.parseIBDatetime(execution.time). \
             astimezone(datetime.timezone.utc)
+        if self.execWatermark is None or execution.time > self.execWatermark:
+            self.execWatermark = execution.time
         isLive = reqId not in self._futures
         time = self.lastTime if isLive else execution.time
         fill = Fill(contract, execution, CommissionReport(), time)
-        if execId not in self.fills:
+        archive = self.ib.tradeArchive
+        if execId not in self.fills and not (
+                archive and archive.hasFill(execId)):
             # first time we see this execution so add it
             self.fills[execId] = fill
+            self.conId2Fills[contract.conId][execId] = fill
             if trade:
                 trade.fills.append(fill)
                 logEntry = TradeLogEntry(
@@ -418,6 +594,10 @@ class Wrapper:
                 # this is not a live execution and the order was filled
                 # before this connection started
                 pass
+        elif self.ib.tradeArchive and \
+                self.ib.tradeArchive.updateCommissionReport(commissionReport):
+            self._logger.info(
+                f'commissionReport: Archived fill {commissionReport.execId}')
         else:
             # commission report is not for this client
             pass
@@ -427,6 +607,12 @@ class Wrapper:
 
     def contractDetails(self, reqId, contractDetails):
         self._results[reqId].append(contractDetails)
+        cd = contractDetails
+        if cd.contract and cd.marketRuleIds:
+            self.conId2MarketRuleIds[cd.contract.conId] = {
+                exchange: int(ruleId) for exchange, ruleId in zip(
+                    cd.validExchanges.split(','), cd.marketRuleIds.split(','))
+                if ruleId}
 
     bondContractDetails = contractDetails
 
@@ -440,6 +626,7 @@ class Wrapper:
         result = [
             PriceIncrement(pi.lowEdge, pi.increment)
             for pi in priceIncrements]
+        self.marketRules[marketRuleId] = result
         self._endReq(f'marketRule-{marketRuleId}', result)
 
     def realtimeBar(
@@ -456,6 +643,28 @@ class Wrapper:
         bar.date = util.parseIBDatetime(bar.date)
         self._results[reqId].append(bar)
 
+    def isColumnar(self, reqId):
+        return isinstance(
+            self._results.get(reqId), (BarDataColumns, HistoricalTickColumns))
+
+    def historicalDataColumns(self, reqId, fields):
+        """
+        Fill the columns of a columnar request directly from the
+        flat run of bar fields, without creating a BarData per bar.
+        """
+        import numpy as np
+        bars = self._results[reqId]
+        bars.date = util.parseIBDatetimes(fields[0::8]).view('i8')
+        for i, col in enumerate(bars.columns[1:], 1):
+            setattr(bars, col, np.array(
+                fields[i::8], getattr(bars, col).dtype))
+
+    def isStreaming(self, reqId):
+        return isinstance(self._results.get(reqId), RequestStream)
+
+    def historicalDataStream(self, reqId, fields):
+        self._results[reqId].appendBarFields(fields)
+
     def historicalDataEnd(self, reqId, _start, _end):
         self._endReq(reqId)
 
@@ -510,6 +719,22 @@ class Wrapper:
         if done:
             self._endReq(reqId)
 
+    def historicalTicksColumns(self, reqId, fields, done):
+        """
+        Append to the columns of a columnar request directly from the
+        flat run of tick fields, without creating a tick object per tick.
+        """
+        import numpy as np
+        ticks = self._results[reqId]
+        layout = ticks.layouts[ticks.whatToShow]
+        for i, col in enumerate(layout):
+            if col:
+                arr = np.array(fields[i::len(layout)], ticks.dtypes[col])
+                ticks.data[col] = np.concatenate((ticks.data[col], arr)) \
+                    if len(ticks.data[col]) else arr
+        if done:
+            self._endReq(reqId)
+
     # additional wrapper method provided by Client
     def priceSizeTick(self, reqId, tickType, price, size):
         ticker = self.reqId2Ticker.get(reqId)
@@ -846,6 +1071,7 @@ class Wrapper:
                 ticker.lastGreeks = comp
             elif tickType in (13, 83):
                 ticker.modelGreeks = comp
+            self.pendingTickers.add(ticker)
         elif reqId in self._futures:
             # reply from calculateImpliedVolatility or calculateOptionPrice
             self._endReq(reqId, comp)
@@ -963,6 +1189,7 @@ class Wrapper:
                 trade = self.trades[(self.clientId, reqId)]
                 if not trade.isDone():
                     status = trade.orderStatus.status = OrderStatus.Cancelled
+                    self.indexTrade(trade)
                     logEntry = TradeLogEntry(self.lastTime, status, msg)
                     trade.log.append(logEntry)
                     self._logger.warning(f'Canceled order: {trade}')
@@ -0,0 +1,59 @@
+import datetime
+import os
+
+from ib_insync.barcache import BarCache
+from ib_insync.objects import BarData
+
+
+def makeBars(n, volume=1.5):
+    t0 = datetime.datetime(2020, 3, 16, 14, 30, tzinfo=datetime.timezone.utc)
+    return [
+        BarData(
+            t0 + datetime.timedelta(minutes=i), 10.0, 11.0, 9.0, 10.5,
+            volume + i, 10.25, 3)
+        for i in range(n)]
+
+
+def test_roundtrip(tmp_path):
+    cache = BarCache(str(tmp_path))
+    key = (1, 'TRADES', '1 min', True, '20200316')
+    assert cache.get(key) is None
+    bars = makeBars(3, volume=0.25)
+    cache.put(key, bars)
+    assert cache.get(key) == bars
+    assert cache.get(key)[0].volume == 0.25
+
+    days = [
+        BarData(datetime.date(2020, 3, 16 + i), 1.0, 2.0, 0.5, 1.5, 100.0,
+                1.25, 7)
+        for i in range(2)]
+    cache.put((1, 'TRADES', '1 day', True, '2020'), days)
+    assert cache.get((1, 'TRADES', '1 day', True, '2020')) == days
+
+
+def test_tmp_files(tmp_path):
+    cache = BarCache(str(tmp_path))
+    key = (1, 'TRADES', '1 min', True, '20200316')
+    cache.put(key, makeBars(3))
+    tmpName = cache._fileName(key) + '.tmp.npz'
+    with open(tmpName, 'wb') as f:
+        f.write(b'partial')
+
+    cache = BarCache(str(tmp_path))
+    assert len(cache) == 1
+    assert cache.size() == os.path.getsize(cache._fileName(key))
+    assert not os.path.exists(tmpName)
+
+
+def test_eviction(tmp_path):
+    cache = BarCache(str(tmp_path), maxSize=0)
+    keys = [(1, 'TRADES', '1 min', True, str(i)) for i in range(3)]
+    for key in keys:
+        cache.put(key, makeBars(10))
+    cache.maxSize = cache.size() - 1
+    cache.get(keys[0])
+    cache.put(keys[2], makeBars(10))
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[2]) is not None
+    assert len(cache) == 2
@@ -0,0 +1,101 @@
+import pytest
+
+from ib_insync import IB, LimitOrder, Stock
+from ib_insync.client import Client
+
+
+class FakeConn:
+
+    def __init__(self):
+        self.writes = []  # list of messages per write
+        self.numBytesSent = 0
+        self.numMsgSent = 0
+
+    def sendMsg(self, msg):
+        self.writes.append([msg])
+
+    def sendMsgs(self, msgs):
+        self.writes.append(list(msgs))
+
+    def disconnect(self):
+        pass
+
+
+def connectedIB():
+    ib = IB()
+    client = ib.client
+    client.conn = FakeConn()
+    client.connState = Client.CONNECTED
+    client._serverVersion = 152
+    client._readyEvent.set()
+    client._reqIdSeq = 1
+    ib.wrapper.clientId = 1
+    return ib
+
+
+contract = Stock('X', 'SMART', 'USD', conId=1)
+
+
+def test_placeOrders_one_write():
+    ib = connectedIB()
+    bracket = ib.bracketOrder('BUY', 100, 10.0, 11.0, 9.0)
+    orders = [(contract, o) for o in bracket]
+    orders.append((contract, LimitOrder('SELL', 10, 12.0)))
+    trades = ib.placeOrders(orders)
+    assert [t.order for t in trades] == [o for _, o in orders]
+    assert [len(msgs) for msgs in ib.client.conn.writes] == [4]
+    assert ib.client._numMsgQueued == ib.client._numMsgWritten == 4
+
+
+def test_group_not_split_by_throttling():
+    ib = connectedIB()
+    client = ib.client
+    client.MaxRequests = 3
+    client.reqCurrentTime()
+    client.reqCurrentTime()
+    ib.placeOrders([
+        (contract, o) for o in ib.bracketOrder('BUY', 100, 10.0, 11.0, 9.0)])
+    assert [len(msgs) for msgs in client.conn.writes] == [1, 1]
+    client._timeQ.clear()
+    client.sendMsg(None)
+    assert [len(msgs) for msgs in client.conn.writes] == [1, 1, 3]
+
+
+def test_batch_exception():
+    ib = connectedIB()
+    client = ib.client
+    with pytest.raises(ValueError):
+        with client.batch():
+            with client.group():
+                client.placeOrder(1, contract, LimitOrder('BUY', 1, 10.0))
+            client.placeOrder(2, contract, LimitOrder('BUY', 1, 10.0))
+            raise ValueError
+    assert client.conn.writes == []
+    assert client._numMsgQueued == 0
+
+
+def placed(ib, orderId, order):
+    ib.client.placeOrder(orderId, contract, order)
+    return ib.client.conn.writes[-1][0]
+
+
+def test_order_template():
+    ib = connectedIB()
+    order = LimitOrder('BUY', 100, 10.0)
+    placed(ib, 1, order)
+    assert len(ib.client._orderTemplates) == 1
+    template, = ib.client._orderTemplates.values()
+
+    # the open fields are patched into the template
+    modified = LimitOrder('SELL', 200, 10.5)
+    msg = placed(ib, 2, modified)
+    assert msg == placed(connectedIB(), 2, modified)
+    assert ib.client._orderTemplates[
+        (contract.conId, 'LMT', 152)] is template
+
+    # another field takes the full path and makes a new template
+    other = LimitOrder('BUY', 100, 10.0, tif='GTC')
+    msg = placed(ib, 3, other)
+    assert msg == placed(connectedIB(), 3, other)
+    assert ib.client._orderTemplates[
+        (contract.conId, 'LMT', 152)] is not template
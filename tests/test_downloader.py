@@ -0,0 +1,84 @@
+import asyncio
+import datetime
+
+import pytest
+
+from ib_insync import IB, BarCache, HistoricalDownloader, Stock
+from ib_insync.objects import BarData, BarDataList
+
+utc = datetime.timezone.utc
+start = datetime.datetime(2020, 3, 16, 6, tzinfo=utc)
+end = datetime.datetime(2020, 3, 18, tzinfo=utc)
+contract = Stock('X', 'SMART', 'USD', conId=1)
+
+
+class FakeIB(IB):
+
+    def __init__(self, hang=False, numViolations=0):
+        IB.__init__(self)
+        self.hang = hang
+        self.numViolations = numViolations
+        self.requests = []
+        self.canceled = []
+        self.client.cancelHistoricalData = self.canceled.append
+
+    def reqHistoricalDataAsync(
+            self, contract, endDateTime, durationStr, barSizeSetting,
+            whatToShow, useRTH, formatDate=1, keepUpToDate=False,
+            chartOptions=None, useCache=True):
+        reqId = len(self.requests) + 1
+        self.requests.append(endDateTime)
+        bars = BarDataList()
+        bars.reqId = reqId
+        # hourly bars that overlap with the next window by one bar
+        endTs = endDateTime.timestamp()
+        bars += [
+            BarData(
+                datetime.datetime.fromtimestamp(endTs - h * 3600, utc),
+                1.0, 2.0, 0.5, 1.5, 10.0, 1.25, 5)
+            for h in range(24, -1, -1)]
+        future = self.wrapper.startReq(reqId, contract)
+        if not self.hang:
+            if self.numViolations:
+                self.numViolations -= 1
+                self.errorEvent.emit(
+                    reqId, 162, 'Historical Market Data Service error '
+                    'message:API historical data query cancelled: '
+                    'Pacing violation', contract)
+            loop = asyncio.get_event_loop()
+            loop.call_soon(self.wrapper._endReq, reqId, bars)
+        return future
+
+
+def test_download_and_cache(tmp_path):
+    ib = FakeIB()
+    downloader = HistoricalDownloader(ib, cache=BarCache(str(tmp_path)))
+    bars = downloader.download(contract, start, end, '1 min', 'TRADES', True)
+    assert len(ib.requests) == 2
+    assert len(bars) == 18 + 24 + 1
+    assert bars[0].date == start and bars[-1].date == end
+    assert len({bar.date for bar in bars}) == len(bars)
+    assert len(downloader.cache) == 2
+
+    again = downloader.download(contract, start, end, '1 min', 'TRADES', True)
+    assert len(ib.requests) == 2
+    assert list(again) == list(bars)
+
+
+def test_pacing_violation():
+    ib = FakeIB(numViolations=1)
+    downloader = HistoricalDownloader(ib, maxConcurrent=1)
+    downloader.RetryDelay = 0
+    bars = downloader.download(contract, start, end, '1 min', 'TRADES', True)
+    assert len(ib.requests) == 3
+    assert len(bars) == 43
+
+
+def test_timeout():
+    ib = FakeIB(hang=True)
+    downloader = HistoricalDownloader(ib, timeout=0.01, retries=1)
+    downloader.RetryDelay = 0
+    with pytest.raises(RuntimeError):
+        downloader.download(contract, start, end, '1 min', 'TRADES', True)
+    assert sorted(ib.canceled) == [1, 2, 3, 4]
+    assert not ib.wrapper._futures
@@ -0,0 +1,70 @@
+import datetime
+
+import numpy as np
+
+from ib_insync import IB, Stock, util
+from ib_insync.objects import HistoricalTickColumns
+
+t0 = 1584369000  # 2020-03-16 14:30:00 UTC
+times = np.array([0, 0, 1, 1, 1, 2, 3, 3, 4]) + t0
+
+
+class FakeIB(IB):
+
+    def __init__(self):
+        IB.__init__(self)
+        self.requests = []
+
+    async def reqHistoricalTicksAsync(
+            self, contract, startDateTime, endDateTime, numberOfTicks,
+            whatToShow, useRth, ignoreSize=False, miscOptions=[],
+            columnar=False):
+        self.requests.append(startDateTime)
+        start = int(times.searchsorted(startDateTime.timestamp()))
+        stop = start + numberOfTicks
+        ticks = HistoricalTickColumns('MIDPOINT')
+        ticks.reqId = len(self.requests)
+        ticks.contract = contract
+        ticks.data['time'] = times[start:stop]
+        ticks.data['price'] = np.arange(len(times), dtype='f8')[start:stop]
+        ticks.data['size'] = np.ones(len(times), 'i8')[start:stop]
+        return ticks
+
+
+def collect(ib, end='', close=None):
+    async def run():
+        start = datetime.datetime.fromtimestamp(t0, datetime.timezone.utc)
+        stream = ib.streamHistoricalTicksAsync(
+            Stock('S', 'SMART', 'USD', conId=1), start, end, 'MIDPOINT',
+            False, numberOfTicks=4)
+        prices = []
+        async for ticks in stream:
+            prices += ticks['price'].tolist()
+            if close and len(prices) >= close:
+                await stream.aclose()
+                break
+        return prices
+
+    return util.run(run())
+
+
+def test_pages():
+    ib = FakeIB()
+    assert collect(ib) == list(range(len(times)))
+    assert len(ib.requests) == 4
+    downloader = ib._getDownloader()
+    assert len(downloader._times) == 4
+    assert len(downloader._contractTimes[(1, 'SMART', 'MIDPOINT')]) == 4
+
+
+def test_end():
+    ib = FakeIB()
+    end = datetime.datetime.fromtimestamp(t0 + 2, datetime.timezone.utc)
+    assert collect(ib, end) == [0, 1, 2, 3, 4, 5]
+    assert len(ib.requests) == 3
+
+
+def test_close():
+    ib = FakeIB()
+    assert collect(ib, close=1) == [0, 1, 2, 3]
+    assert len(ib.requests) == 1
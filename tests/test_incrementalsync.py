@@ -0,0 +1,95 @@
+import datetime
+
+from ib_insync import (
+    IB, Execution, Fill, Order, OrderStatus, Stock, Trade, util)
+from ib_insync.objects import CommissionReport
+
+t0 = datetime.datetime(2020, 3, 16, 14, 30, tzinfo=datetime.timezone.utc)
+
+
+class FakeIB(IB):
+
+    IncrementalSync = True
+
+    def __init__(self):
+        IB.__init__(self)
+        self.log = []
+        self.client.connectAsync = self._connect
+        self.client.serverVersion = lambda: 157
+        self.client.getAccounts = lambda: ['DU1']
+
+    async def _connect(self, host, port, clientId, timeout):
+        pass
+
+    async def reqAccountUpdatesAsync(self, account):
+        pass
+
+    async def reqAccountUpdatesMultiAsync(self, account, modelCode=''):
+        pass
+
+    async def reqPositionsAsync(self):
+        pass
+
+    async def reqAllOpenOrdersAsync(self):
+        self.log.append('openOrders')
+        return []
+
+    async def reqCompletedOrdersAsync(self, apiOnly):
+        self.log.append('completedOrders')
+
+    async def reqExecutionsAsync(self, execFilter=None):
+        self.log.append(execFilter and execFilter.time)
+
+
+class FakeArchive:
+
+    def lastFillTime(self):
+        return t0
+
+
+def test_full_sync():
+    ib = FakeIB()
+    util.run(ib.connectAsync(readonly=True))
+    assert ib.log == [None]
+
+
+def test_watermark():
+    ib = FakeIB()
+    ib.wrapper.execWatermark = t0
+    util.run(ib.connectAsync(readonly=True))
+    assert ib.log == ['20200316-14:29:00']
+
+    ib = FakeIB()
+    ib.tradeArchive = FakeArchive()
+    util.run(ib.connectAsync(readonly=True))
+    assert ib.log == ['20200316-14:29:00']
+
+
+def makeTrade(ib, filled):
+    contract = Stock('S', 'SMART', 'USD', conId=1)
+    order = Order(
+        orderId=1, clientId=1, permId=5, action='BUY', totalQuantity=100)
+    trade = Trade(
+        contract, order,
+        OrderStatus(orderId=1, status=OrderStatus.Submitted), [], [])
+    trade.fills.append(Fill(
+        contract, Execution(shares=filled), CommissionReport(), t0))
+    ib.wrapper.trades[(1, 1)] = trade
+    ib.wrapper.indexTrade(trade)
+    ib.wrapper.execWatermark = t0
+    return trade
+
+
+def test_vanished_trade():
+    ib = FakeIB()
+    trade = makeTrade(ib, 100)
+    util.run(ib.connectAsync(clientId=1))
+    assert ib.log == ['openOrders', 'completedOrders', '20200316-14:29:00']
+    assert trade.orderStatus.status == OrderStatus.Filled
+
+    ib = FakeIB()
+    trade = makeTrade(ib, 40)
+    util.run(ib.connectAsync(clientId=1, readonly=True))
+    assert ib.log == ['openOrders', '20200316-14:29:00']
+    assert trade.orderStatus.status == OrderStatus.Cancelled
+    assert trade.orderStatus.filled == 40
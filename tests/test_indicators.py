@@ -0,0 +1,56 @@
+import math
+import random
+
+import pytest
+
+from ib_insync.indicators import SMA, VWAP, Indicator, RollingVariance
+from ib_insync.objects import BarList
+from ib_insync.ticker import Bar
+
+nan = float('nan')
+
+
+def feed(bars, closes):
+    for t, c in enumerate(closes):
+        n = 0 if c != c else 1
+        bars.append(Bar(t, c, c, c, c, n, n))
+        bars.updateEvent.emit(bars, True)
+
+
+def test_sma():
+    bars = BarList()
+    sma = SMA(3, bars)
+    feed(bars, [1, 2, 3, 4, 5])
+    assert sma.value == 4
+
+
+def test_skip_empty_bars():
+    bars = BarList()
+    sma = SMA(3, bars)
+    var = RollingVariance(3, bars)
+    vwap = VWAP(bars)
+    feed(bars, [1, nan, 2, nan, 3, 4, nan])
+    # the last bar is empty and keeps the previous values
+    assert sma.value == 3
+    assert var.value == 1
+    assert vwap.value == 2.5
+
+
+def test_resum():
+    random.seed(1)
+    closes = [1e6 + random.random() for _ in range(100000)]
+    sma = SMA(10)
+    var = RollingVariance(10)
+    for t, c in enumerate(closes):
+        sma.on_source(t, c)
+        var.on_source(t, c)
+    window = closes[-10:]
+    mean = math.fsum(window) / 10
+    assert sma.value == pytest.approx(mean, rel=1e-15)
+    assert var.value == pytest.approx(
+        math.fsum((x - mean) ** 2 for x in window) / 9, rel=1e-9)
+
+
+def test_indicator_is_abstract():
+    with pytest.raises(TypeError):
+        Indicator()
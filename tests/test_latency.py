@@ -0,0 +1,78 @@
+import math
+import time
+
+import pytest
+
+from ib_insync import IB, LatencyHistogram, LatencyTracer, Order, Stock, Trade
+from ib_insync.order import OrderStatus
+
+
+def test_histogram():
+    h = LatencyHistogram()
+    assert math.isnan(h.quantile(0.5))
+    for latency in [0.001] * 98 + [0.1, 0.2]:
+        h.add(latency)
+    assert h.count == 100 and h.max == 0.2
+    assert h.mean() == pytest.approx(0.00398)
+    assert h.quantile(0.5) == pytest.approx(0.001, rel=0.12)
+    assert h.quantile(0.99) == pytest.approx(0.1, rel=0.12)
+    assert h.quantile(1) == 0.2
+
+
+def makeTrade(orderId):
+    order = Order(orderId=orderId, clientId=1, action='BUY')
+    return Trade(
+        Stock('X', 'SMART', 'USD'), order,
+        OrderStatus(orderId=orderId, status=OrderStatus.PendingSubmit),
+        [], [])
+
+
+def test_tracer():
+    ib = IB()
+    tracer = LatencyTracer(ib)
+    tracer.start()
+    client = ib.client
+    trade = makeTrade(1)
+
+    # queued message, written later
+    client._numMsgQueued = 1
+    timings = tracer.track(trade, time.perf_counter())
+    assert timings.action == 'place'
+    assert math.isnan(timings.write)
+    client._numMsgWritten = 1
+    client.apiWrite.emit(1)
+    assert timings.write >= timings.call
+
+    ib.orderStatusEvent.emit(trade)
+    assert math.isnan(timings.status)
+    trade.orderStatus.status = OrderStatus.Submitted
+    ib.orderStatusEvent.emit(trade)
+    ib.orderStatusEvent.emit(trade)
+    assert set(timings.latencies()) == {'write', 'status'}
+
+    # cancel acknowledged by the Cancelled status only
+    cancel = tracer.track(trade, time.perf_counter(), 'cancel', 1)
+    assert not math.isnan(cancel.write)
+    ib.orderStatusEvent.emit(trade)
+    assert math.isnan(cancel.status)
+    trade.orderStatus.status = OrderStatus.Cancelled
+    ib.orderStatusEvent.emit(trade)
+    assert not math.isnan(cancel.status)
+
+    assert tracer.timings(trade) == [timings, cancel]
+    stats = {(s.action, s.stage): s.count for s in tracer.stats()}
+    assert stats == {
+        ('place', 'write'): 1, ('place', 'status'): 1,
+        ('cancel', 'write'): 1, ('cancel', 'status'): 1}
+    tracer.stop()
+    assert ib.latencyTracer is None
+
+
+def test_maxTrades():
+    ib = IB()
+    tracer = LatencyTracer(ib, maxTrades=2)
+    trades = [makeTrade(i) for i in range(1, 4)]
+    for trade in trades:
+        tracer.track(trade, time.perf_counter())
+    assert not tracer.timings(trades[0])
+    assert tracer.timings(trades[2])
@@ -0,0 +1,73 @@
+from eventkit import Event
+
+from ib_insync import LineManager, Stock
+
+
+class FakeIB:
+
+    def __init__(self):
+        self.connectedEvent = Event('connectedEvent')
+        self.log = []
+
+        class Wrapper:
+            tickers = {}
+        self.wrapper = Wrapper()
+
+    def isConnected(self):
+        return True
+
+    def ticker(self, contract):
+        return None
+
+    def reqMktData(self, contract, genericTickList=''):
+        self.log.append(('req', contract.conId))
+
+    def cancelMktData(self, contract):
+        self.log.append(('cancel', contract.conId))
+
+
+def test_share_and_suspend():
+    ib = FakeIB()
+    lm = LineManager(ib, maxLines=2)
+    a, b, c = (Stock('S', conId=i) for i in (1, 2, 3))
+    ticker = lm.subscribe(a, pinned=True)
+    lm.subscribe(b)
+    assert lm.subscribe(Stock('S', conId=1)) is ticker
+    lm.subscribe(c)
+    assert not lm.isActive(b)
+    assert lm.stats().numSubscriptions == 4
+    lm.unsubscribe(c)
+    assert lm.isActive(b)
+    assert ib.log == [
+        ('req', 1), ('req', 2), ('cancel', 2), ('req', 3),
+        ('cancel', 3), ('req', 2)]
+
+
+def test_refcount_by_conId():
+    ib = FakeIB()
+    lm = LineManager(ib, maxLines=2)
+    lm.subscribe(Stock('S', conId=1))
+    lm.subscribe(Stock('S', conId=1))
+    # other contract objects release the same line
+    lm.unsubscribe(Stock('S', conId=1))
+    assert lm.isActive(Stock('S', conId=1))
+    lm.unsubscribe(Stock('S', conId=1))
+    assert lm.ticker(Stock('S', conId=1)) is None
+    for i in range(100):
+        # new contract objects must not find a stale line
+        contract = Stock('S', conId=2)
+        assert lm.ticker(contract) is None
+        lm.subscribe(contract)
+        lm.unsubscribe(contract)
+    assert lm.stats().numSubscriptions == 0
+
+
+def test_qualified_after_subscribe():
+    ib = FakeIB()
+    lm = LineManager(ib)
+    contract = Stock('S', 'SMART', 'USD')
+    lm.subscribe(contract)
+    contract.conId = 5
+    assert lm.isActive(contract)
+    lm.unsubscribe(contract)
+    assert lm.stats().numActive == 0
@@ -0,0 +1,56 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from ib_insync import OptionModel, Option, Stock, Ticker
+from ib_insync.objects import OptionComputation
+
+now = datetime.datetime(2020, 6, 1)
+
+
+def optionTicker():
+    return Ticker(
+        contract=Option('X', '20201218', 100, 'C', 'SMART'),
+        bid=5.0, ask=5.2, bidSize=1, askSize=1)
+
+
+def test_impliedVol_roundtrip():
+    model = OptionModel(rate=0.01)
+    strike = np.array([80, 100, 120, 100.0])
+    isCall = np.array([True, True, False, False])
+    vol = np.array([0.3, 0.2, 0.25, 0.4])
+    price = model.price(100, strike, 0.5, vol, isCall)
+    assert model.impliedVol(price, 100, strike, 0.5, isCall) == \
+        pytest.approx(vol, abs=1e-6)
+
+
+def test_updateTickers_refreshes_local_greeks():
+    model = OptionModel(rate=0.01)
+    ticker = optionTicker()
+    model.updateTickers([ticker], 100, now)
+    delta = ticker.modelGreeks.delta
+    ticker.bid, ticker.ask = 12.0, 12.2
+    model.updateTickers([ticker], 110, now)
+    assert ticker.modelGreeks.undPrice == 110
+    assert ticker.modelGreeks.delta > delta
+
+
+def test_updateTickers_keeps_tws_greeks():
+    model = OptionModel(rate=0.01)
+    ticker = optionTicker()
+    model.updateTickers([ticker], 100, now)
+    greeks = ticker.modelGreeks = OptionComputation(
+        0.2, 0.5, 5.1, 0, 0.03, 0.3, -0.01, 101)
+    assert model.updateTickers([ticker], 110, now) == []
+    assert ticker.modelGreeks is greeks
+
+
+def test_updateTickers_underlying_ticker():
+    model = OptionModel(rate=0.01)
+    und = Ticker(
+        contract=Stock('X'), bid=101, ask=101.2, bidSize=1, askSize=1)
+    ticker, = model.updateTickers([optionTicker()], und, now)
+    assert ticker.modelGreeks.undPrice == pytest.approx(101.1)
+    with pytest.raises(ValueError):
+        model.updateTickers([optionTicker()], Ticker(), now)
@@ -0,0 +1,82 @@
+from eventkit import Event
+
+from ib_insync import Option, PortfolioEngine, Stock, Ticker
+from ib_insync.objects import OptionComputation, Position
+
+
+class FakeIB:
+
+    def __init__(self, positions):
+        self.positionEvent = Event('positionEvent')
+        self.pendingTickersEvent = Event('pendingTickersEvent')
+        self._positions = positions
+        self.tickers = {}
+
+    def positions(self):
+        return list(self._positions)
+
+    def isConnected(self):
+        return True
+
+    def reqMktData(self, contract):
+        ticker = self.tickers[contract.conId] = Ticker(contract=contract)
+        return ticker
+
+    def cancelMktData(self, contract):
+        del self.tickers[contract.conId]
+
+
+stock = Stock('X', 'SMART', 'USD', conId=1)
+option = Option(
+    'X', '20201218', 100, 'C', 'SMART', multiplier='100', conId=2)
+
+
+def test_pnl_and_greeks():
+    ib = FakeIB([
+        Position('A', stock, 10, 95.0),
+        Position('B', stock, -5, 102.0),
+        Position('A', option, 2, 400.0)])
+    engine = PortfolioEngine(ib)
+    engine.start()
+    assert engine.total().marketValue == 0
+    updates = []
+    engine.updateEvent += updates.append
+
+    s, o = ib.tickers[1], ib.tickers[2]
+    s.bid, s.ask, s.bidSize, s.askSize = 99.9, 100.1, 1, 1
+    s.last, s.close = 100.0, 98.0
+    o.bid, o.ask, o.bidSize, o.askSize = 4.9, 5.1, 1, 1
+    o.last, o.close = 5.0, 4.0
+    o.modelGreeks = OptionComputation(
+        0.2, 0.6, 5.0, 0, 0.01, 0.3, -0.01, 100)
+    ib.pendingTickersEvent.emit([s, o])
+    assert len(updates) == 1
+
+    total = engine.total()
+    assert total.marketValue == 500 + 1000
+    assert total.unrealizedPnL == 50 + 10 + 200
+    assert total.dailyPnL == 10 + 200
+    assert total.delta == 5 + 0.6 * 200
+    assert total.vega == 0.3 * 200
+
+    byAccount = engine.byAccount()
+    assert byAccount['A'].unrealizedPnL == 50 + 200
+    assert byAccount['B'].unrealizedPnL == 10
+    engine.setStrategy(option, 'calls')
+    byStrategy = engine.byStrategy()
+    assert byStrategy['calls'].delta == 120
+    assert byStrategy[''].delta == 5
+
+
+def test_position_change():
+    ib = FakeIB([Position('A', stock, 10, 95.0)])
+    engine = PortfolioEngine(ib)
+    engine.start()
+    ib._positions.append(Position('A', option, 1, 400.0))
+    ib.positionEvent.emit(ib._positions[-1])
+    assert set(ib.tickers) == {1, 2}
+    ib._positions.pop(0)
+    ib.positionEvent.emit(ib._positions[0])
+    assert set(ib.tickers) == {2}
+    engine.stop()
+    assert not ib.tickers
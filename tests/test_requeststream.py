@@ -0,0 +1,58 @@
+import datetime
+
+from ib_insync.wrapper import RequestStream
+
+
+class FakeConn:
+
+    def __init__(self):
+        self.log = []
+
+    def pauseReading(self):
+        self.log.append('pause')
+
+    def resumeReading(self):
+        self.log.append('resume')
+
+
+def barFields(n, day=16):
+    fields = []
+    for i in range(n):
+        fields += [
+            f'202003{day}  09:{30 + i}:00', '1.0', '2.0', '0.5', '1.5',
+            '100', '1.25', '7']
+    return fields
+
+
+def test_bars_in_chunks():
+    stream = RequestStream(FakeConn(), 100)
+    stream.appendBarFields(barFields(3))
+    stream.appendBarFields([])
+    stream.appendBarFields(barFields(2, 17))
+    assert len(stream) == 5 and stream.event.is_set()
+    chunk = stream.take(4)
+    assert [bar.date for bar in chunk] == [
+        datetime.datetime(2020, 3, 16, 9, 30),
+        datetime.datetime(2020, 3, 16, 9, 31),
+        datetime.datetime(2020, 3, 16, 9, 32),
+        datetime.datetime(2020, 3, 17, 9, 30)]
+    assert chunk[0].volume == 100 and chunk[0].barCount == 7
+    assert len(stream.take(4)) == 1
+    assert len(stream) == 0 and not stream.event.is_set()
+
+
+def test_backpressure():
+    conn = FakeConn()
+    stream = RequestStream(conn, 4)
+    for i in range(3):
+        stream.append(i)
+    assert conn.log == []
+    stream.append(3)
+    stream.append(4)
+    assert conn.log == ['pause']
+    assert stream.take(2) == [0, 1]
+    assert conn.log == ['pause']
+    assert stream.take(1) == [2]
+    assert conn.log == ['pause', 'resume']
+    stream.close()
+    assert conn.log == ['pause', 'resume']
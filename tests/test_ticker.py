@@ -0,0 +1,94 @@
+import datetime
+
+import pytest
+
+from ib_insync.objects import BarList
+from ib_insync.ticker import (
+    AggregateBars, Bar, CascadeBars, RangeBars, VolumeBars)
+
+nan = float('nan')
+t0 = datetime.datetime(2020, 1, 2, 9, 30)
+
+
+def minuteBars(closes):
+    bars = BarList()
+    for i, c in enumerate(closes):
+        n = 0 if c != c else 1
+        bars.append(Bar(
+            t0 + datetime.timedelta(minutes=i), c, c, c, c, n, n))
+    return bars
+
+
+def test_cascade_history():
+    source = minuteBars(range(20))
+    cascade = CascadeBars(source, (300,))
+    assert [(b.time, b.open, b.close, b.volume)
+            for b in cascade.bars[300]] == [
+        (t0 + datetime.timedelta(minutes=5 * i), 5 * i, 5 * i + 4, 5)
+        for i in range(4)]
+
+    completed = []
+    cascade.connect(lambda secs, bar: completed.append(bar.time))
+    source.append(Bar(t0 + datetime.timedelta(minutes=20), 20, 20, 20, 20))
+    source.updateEvent.emit(source, True)
+    assert len(cascade.bars[300]) == 5
+    assert completed == [t0 + datetime.timedelta(minutes=15)]
+
+
+def test_cascade_live():
+    source = BarList()
+    cascade = CascadeBars(source, (120,))
+    for bar in minuteBars([1, 2, 3]):
+        source.append(bar)
+        source.updateEvent.emit(source, True)
+    bars = cascade.bars[120]
+    assert [(b.open, b.close) for b in bars] == [(1, 2), (3, 3)]
+    # revision of the still-forming first bar of a period
+    source[-1].open = source[-1].close = 5
+    source.updateEvent.emit(source, False)
+    assert (bars[-1].open, bars[-1].close) == (5, 5)
+
+
+def test_cascade_empty_bars():
+    source = BarList()
+    cascade = CascadeBars(source, (120,))
+    for bar in minuteBars([nan, 10, 12, nan, nan]):
+        source.append(bar)
+        source.updateEvent.emit(source, True)
+    bars = cascade.bars[120]
+    assert [(b.open, b.high, b.low, b.close) for b in bars] == [
+        (10, 10, 10, 10), (12, 12, 12, 12)]
+
+
+def test_cascade_weekly():
+    source = BarList()
+    start = datetime.datetime(2020, 3, 11, 10)  # Wednesday
+    for i in range(0, 24 * 14, 6):
+        source.append(Bar(
+            start + datetime.timedelta(hours=i), i, i, i, i, 1, 1))
+    cascade = CascadeBars(source, (7 * 86400,))
+    assert [b.time for b in cascade.bars[7 * 86400]] == [
+        datetime.datetime(2020, 3, 9), datetime.datetime(2020, 3, 16),
+        datetime.datetime(2020, 3, 23)]
+
+
+def test_volumebars():
+    bars = VolumeBars(100)
+    for t, (price, size) in enumerate(
+            [(10, 40), (11, 50), (9, 20), (12, 100), (13, 10)]):
+        bars.on_source(t, price, size)
+    assert [b.tuple() for b in bars.bars] == [
+        (0, 10, 11, 9, 9, 110, 3), (3, 12, 12, 12, 12, 100, 1)]
+
+
+def test_rangebars():
+    bars = RangeBars(2)
+    for t, price in enumerate([10, 11, 9, 10, 12]):
+        bars.on_source(t, price, 1)
+    assert [b.tuple() for b in bars.bars] == [
+        (0, 10, 11, 9, 9, 3, 3), (3, 10, 12, 10, 12, 2, 2)]
+
+
+def test_aggregatebars_is_abstract():
+    with pytest.raises(TypeError):
+        AggregateBars()
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from ib_insync import util
+from ib_insync.timerwheel import TimerWheel
+
+
+def test_periodic():
+    wheel = TimerWheel()
+    fast = wheel.periodic(0.05)
+    assert wheel.periodic(0.05) is fast
+    slow = wheel.periodic(0.1)
+    assert len(wheel) == 2
+    times = {0.05: [], 0.1: []}
+    fast += times[0.05].append
+    slow += times[0.1].append
+    util.run(asyncio.sleep(0.33))
+    for step, ts in times.items():
+        assert 2 <= len(ts) <= 7
+        for t in ts:
+            n = t.timestamp() / step
+            assert n == pytest.approx(round(n), abs=1e-3)
+    # every slow boundary is also a fast boundary
+    assert set(times[0.1]) <= set(times[0.05])
+
+    wheel.stop(0.05)
+    wheel.stop(0.1)
+    assert fast.done() and slow.done()
+    assert len(wheel) == 0 and wheel._handle is None
+
+
+def test_periodic_step():
+    wheel = TimerWheel()
+    with pytest.raises(ValueError):
+        wheel.periodic(0)
@@ -0,0 +1,68 @@
+import datetime
+
+from ib_insync import (
+    IB, Execution, Fill, Order, OrderStatus, Stock, Trade, TradeArchive,
+    TradeLogEntry)
+from ib_insync.objects import CommissionReport
+
+t0 = datetime.datetime(2020, 3, 16, 14, 30, tzinfo=datetime.timezone.utc)
+
+
+def addTrade(ib, orderId, status, time):
+    w = ib.wrapper
+    contract = Stock('X', 'SMART', 'USD', conId=orderId)
+    order = Order(
+        orderId=orderId, clientId=1, permId=orderId, orderRef='ref',
+        action='BUY', totalQuantity=100)
+    trade = Trade(
+        contract, order, OrderStatus(orderId=orderId, status=status),
+        [], [TradeLogEntry(time, status, '')])
+    execution = Execution(
+        execId=f'exec{orderId}', permId=orderId, shares=100, time=time)
+    fill = Fill(contract, execution, CommissionReport(), time)
+    trade.fills.append(fill)
+    w.trades[(1, orderId)] = trade
+    w.permId2Trade[orderId] = trade
+    w.indexTrade(trade)
+    w.fills[execution.execId] = fill
+    w.conId2Fills[contract.conId][execution.execId] = fill
+    return trade
+
+
+def test_archive():
+    ib = IB()
+    archive = TradeArchive(ib, ':memory:', retention=60)
+    archive.start()
+    old = addTrade(ib, 1, OrderStatus.Filled, t0)
+    recent = addTrade(ib, 2, OrderStatus.Filled, t0 + datetime.timedelta(
+        seconds=90))
+    active = addTrade(ib, 3, OrderStatus.Submitted, t0)
+
+    now = t0 + datetime.timedelta(seconds=120)
+    assert archive.archive(now) == (1, 1)
+    assert archive.archive(now) == (0, 0)
+    assert list(ib.wrapper.trades.values()) == [recent, active]
+    assert 'exec1' not in ib.wrapper.fills
+    assert old.contract.conId not in ib.wrapper.conId2Fills
+    assert archive.hasTrade(1) and not archive.hasTrade(2)
+    assert archive.hasFill('exec1')
+    assert archive.lastFillTime() == t0
+
+    trades = ib.trades()
+    assert [t.order.permId for t in trades] == [1, 2, 3]
+    assert trades[0].fills[0].execution.execId == 'exec1'
+    assert [t.order.permId for t in ib.trades(
+        status=OrderStatus.Filled)] == [1, 2]
+    assert [t.order.permId for t in ib.trades(
+        contract=old.contract)] == [1]
+    assert [f.execution.execId for f in ib.fills()] == [
+        'exec1', 'exec2', 'exec3']
+
+    report = CommissionReport(execId='exec1', commission=1.5)
+    assert archive.updateCommissionReport(report)
+    assert not archive.updateCommissionReport(
+        CommissionReport(execId='exec9'))
+    assert archive.fills()[0].commissionReport.commission == 1.5
+
+    archive.stop()
+    assert ib.tradeArchive is None
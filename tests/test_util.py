@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from ib_insync import util
+
+
+def test_parseIBDatetimes():
+    dt = util.parseIBDatetimes(['20200315  09:30:05', '20200316  10:00:00'])
+    assert dt.tolist() == np.array(
+        ['2020-03-15T09:30:05', '2020-03-16T10:00:00'],
+        'datetime64[s]').tolist()
+    dt = util.parseIBDatetimes(['20200315', '20200101'])
+    assert dt.tolist() == np.array(
+        ['2020-03-15', '2020-01-01'], 'datetime64[s]').tolist()
+    dt = util.parseIBDatetimes(['1584264605'])
+    assert dt[0] == np.datetime64('2020-03-15T09:30:05')
+
+
+def test_parseIBDatetimes_suffix():
+    dt = util.parseIBDatetimes(
+        ['20200315 09:30:05 US/Eastern', '20200315 09:30:06 US/Eastern'])
+    assert dt[0] == np.datetime64('2020-03-15T09:30:05')
+    assert dt[1] == np.datetime64('2020-03-15T09:30:06')
+
+
+def test_parseIBDatetimes_single_space():
+    dt = util.parseIBDatetimes(['20200315 09:30:05'])
+    assert dt[0] == np.datetime64('2020-03-15T09:30:05')
+
+
+def test_parseIBDatetimes_unknown():
+    with pytest.raises(ValueError):
+        util.parseIBDatetimes(['2020-03-15'])
+    with pytest.raises(ValueError):
+        util.parseIBDatetimes(['20200315  09:30:05', '20200315'])
@@ -0,0 +1,64 @@
+import datetime
+
+import pytest
+
+from ib_insync import (
+    Option, OptionChainTable, OptionModel, Ticker, VolSurface)
+from ib_insync.objects import OptionComputation
+
+now = datetime.datetime(2020, 6, 1, 21)
+
+
+def makeTable():
+    contracts = [
+        Option('X', expiry, strike, right, 'SMART', conId=i)
+        for i, (expiry, strike, right) in enumerate(
+            (e, s, r) for e in ('20200701', '20200801')
+            for s in (90.0, 100.0, 110.0) for r in 'CP')]
+    return OptionChainTable(contracts)
+
+
+def tickers(table, vols):
+    # vols: conId -> implied volatility
+    result = []
+    for c in table.contracts:
+        if c.conId in vols:
+            greeks = OptionComputation(
+                vols[c.conId], 0.5, 1.0, 0, 0.01, 0.1, -0.01, 100)
+            result.append(Ticker(contract=c, modelGreeks=greeks))
+    return result
+
+
+def test_fit_and_interpolate():
+    table = makeTable()
+    surface = VolSurface(table)
+    # near expiry: calls and puts of 90 and 110 (id 0, 1, 4, 5);
+    # far expiry: only the call of 100 (id 8)
+    table.update(tickers(table, {0: 0.3, 1: 0.2, 4: 0.2, 5: 0.2, 8: 0.1}))
+    t0, t1 = OptionModel.timeToExpiry(surface.expiries, now)
+    assert surface.vol(90, t0, now) == pytest.approx(0.25)
+    # the missing strike is interpolated
+    assert surface.vol(100, t0, now) == pytest.approx(0.225)
+    # flat across the strikes of a slice with one quote
+    assert surface.vol(80, t1, now) == pytest.approx(0.1)
+    # linear in total variance across the expiries
+    t = (t0 + t1) / 2
+    variance = (0.2 ** 2 * t0 + 0.1 ** 2 * t1) / 2
+    assert surface.vol(110, t, now) == pytest.approx((variance / t) ** 0.5)
+
+
+def test_refit_changed():
+    table = makeTable()
+    surface = VolSurface(table)
+    table.update(tickers(table, {0: 0.3, 6: 0.2}))
+    surface.refit()
+    refits = []
+    surface.updateEvent += lambda s, changed: refits.append(changed.tolist())
+    table.update(tickers(table, {7: 0.4}))
+    surface.refit()
+    surface.refit()
+    assert refits == [[1]]
+    assert surface.vols[1].tolist() == pytest.approx([0.3, 0.3, 0.3])
+    surface.close()
+    table.update(tickers(table, {0: 0.5}))
+    assert not surface._changed.any()